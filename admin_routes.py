@@ -1,7 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List
-import os
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Optional
+import re
 from datetime import datetime
 
 from models import (
@@ -20,14 +19,19 @@ from models import (
     AdminUser
 )
 from auth import get_current_user
+from resource_facets import facet_index
+from project_similarity import similarity_index
+from indexes import explain_find
+from file_delivery import precompute_hash
+from public_cache import public_cache
+from retention import run_retention
 
-# MongoDB connection
-mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'test_database')]
+# Shared database handle (MongoDB or the in-memory backend), on the primary
+from storage import primary_db as db, causal_request_session
 
-# Create admin router
-admin_router = APIRouter(prefix="/admin", tags=["admin"])
+# Create admin router; each request's writes advance the causal clock that
+# public reads wait for
+admin_router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(causal_request_session)])
 
 
 # ================== PERSONAL INFO ROUTES ==================
@@ -54,6 +58,7 @@ async def create_personal_info(
     personal_dict = personal_input.dict()
     personal_obj = PersonalInfo(**personal_dict)
     await db.personal_info.insert_one(personal_obj.dict())
+    public_cache.invalidate("personal_info")
     return personal_obj
 
 @admin_router.put("/personal", response_model=PersonalInfo)
@@ -75,6 +80,7 @@ async def update_personal_info(
     )
     
     updated_personal = await db.personal_info.find_one({"id": existing["id"]})
+    public_cache.invalidate("personal_info")
     return PersonalInfo(**updated_personal)
 
 
@@ -108,6 +114,7 @@ async def create_skill_category(
     skill_dict = skill_input.dict()
     skill_obj = SkillCategory(**skill_dict)
     await db.skill_categories.insert_one(skill_obj.dict())
+    public_cache.invalidate("skill_categories")
     return skill_obj
 
 @admin_router.put("/skills/{skill_id}", response_model=SkillCategory)
@@ -129,6 +136,7 @@ async def update_skill_category(
         raise HTTPException(status_code=404, detail="Skill category not found")
     
     updated_skill = await db.skill_categories.find_one({"id": skill_id})
+    public_cache.invalidate("skill_categories")
     return SkillCategory(**updated_skill)
 
 @admin_router.delete("/skills/{skill_id}")
@@ -140,6 +148,7 @@ async def delete_skill_category(
     result = await db.skill_categories.delete_one({"id": skill_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Skill category not found")
+    public_cache.invalidate("skill_categories")
     return {"message": "Skill category deleted successfully"}
 
 
@@ -160,6 +169,7 @@ async def create_technology(
     tech_dict = tech_input.dict()
     tech_obj = Technology(**tech_dict)
     await db.technologies.insert_one(tech_obj.dict())
+    public_cache.invalidate("technologies")
     return tech_obj
 
 @admin_router.put("/technologies/{tech_id}", response_model=Technology)
@@ -181,6 +191,7 @@ async def update_technology(
         raise HTTPException(status_code=404, detail="Technology not found")
     
     updated_tech = await db.technologies.find_one({"id": tech_id})
+    public_cache.invalidate("technologies")
     return Technology(**updated_tech)
 
 @admin_router.delete("/technologies/{tech_id}")
@@ -192,6 +203,7 @@ async def delete_technology(
     result = await db.technologies.delete_one({"id": tech_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Technology not found")
+    public_cache.invalidate("technologies")
     return {"message": "Technology deleted successfully"}
 
 
@@ -220,6 +232,8 @@ async def create_project(
     project_dict = project_input.dict()
     project_obj = Project(**project_dict)
     await db.projects.insert_one(project_obj.dict())
+    similarity_index.upsert(project_obj.dict())
+    public_cache.invalidate("projects")
     return project_obj
 
 @admin_router.put("/projects/{project_id}", response_model=Project)
@@ -241,6 +255,8 @@ async def update_project(
         raise HTTPException(status_code=404, detail="Project not found")
     
     updated_project = await db.projects.find_one({"id": project_id})
+    similarity_index.upsert(updated_project)
+    public_cache.invalidate("projects")
     return Project(**updated_project)
 
 @admin_router.delete("/projects/{project_id}")
@@ -252,6 +268,8 @@ async def delete_project(
     result = await db.projects.delete_one({"id": project_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Project not found")
+    similarity_index.remove(project_id)
+    public_cache.invalidate("projects")
     return {"message": "Project deleted successfully"}
 
 
@@ -277,6 +295,7 @@ async def create_service(service_input: ServiceCreate, current_user: AdminUser =
     service_dict = service_input.dict()
     service_obj = Service(**service_dict)
     await db.services.insert_one(service_obj.dict())
+    public_cache.invalidate("services")
     return service_obj
 
 @admin_router.put("/services/{service_id}", response_model=Service)
@@ -294,6 +313,7 @@ async def update_service(service_id: str, service_input: ServiceUpdate, current_
         raise HTTPException(status_code=404, detail="Service not found")
     
     updated_service = await db.services.find_one({"id": service_id})
+    public_cache.invalidate("services")
     return Service(**updated_service)
 
 @admin_router.delete("/services/{service_id}")
@@ -302,6 +322,7 @@ async def delete_service(service_id: str, current_user: AdminUser = Depends(get_
     result = await db.services.delete_one({"id": service_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Service not found")
+    public_cache.invalidate("services")
     return {"message": "Service deleted successfully"}
 
 
@@ -340,6 +361,7 @@ async def approve_testimonial(testimonial_id: str, current_user: AdminUser = Dep
         {"$set": {"status": "approved", "reviewed_at": datetime.utcnow()}}
     )
     
+    public_cache.invalidate("testimonials", "pending_testimonials")
     return {"message": "Testimonial approved and added"}
 
 @admin_router.put("/testimonials/pending/{testimonial_id}/reject")
@@ -353,6 +375,7 @@ async def reject_testimonial(testimonial_id: str, current_user: AdminUser = Depe
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Pending testimonial not found")
     
+    public_cache.invalidate("pending_testimonials")
     return {"message": "Testimonial rejected"}
 
 @admin_router.get("/testimonials", response_model=List[Testimonial])
@@ -375,6 +398,7 @@ async def create_testimonial(testimonial_input: TestimonialCreate, current_user:
     testimonial_dict = testimonial_input.dict()
     testimonial_obj = Testimonial(**testimonial_dict)
     await db.testimonials.insert_one(testimonial_obj.dict())
+    public_cache.invalidate("testimonials")
     return testimonial_obj
 
 @admin_router.put("/testimonials/{testimonial_id}", response_model=Testimonial)
@@ -392,6 +416,7 @@ async def update_testimonial(testimonial_id: str, testimonial_input: Testimonial
         raise HTTPException(status_code=404, detail="Testimonial not found")
     
     updated_testimonial = await db.testimonials.find_one({"id": testimonial_id})
+    public_cache.invalidate("testimonials")
     return Testimonial(**updated_testimonial)
 
 @admin_router.delete("/testimonials/{testimonial_id}")
@@ -400,6 +425,7 @@ async def delete_testimonial(testimonial_id: str, current_user: AdminUser = Depe
     result = await db.testimonials.delete_one({"id": testimonial_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Testimonial not found")
+    public_cache.invalidate("testimonials")
     return {"message": "Testimonial deleted successfully"}
 
 
@@ -417,6 +443,7 @@ async def create_statistic(stat_input: StatisticCreate, current_user: AdminUser
     stat_dict = stat_input.dict()
     stat_obj = Statistic(**stat_dict)
     await db.statistics.insert_one(stat_obj.dict())
+    public_cache.invalidate("statistics")
     return stat_obj
 
 @admin_router.put("/statistics/{stat_id}", response_model=Statistic)
@@ -434,6 +461,7 @@ async def update_statistic(stat_id: str, stat_input: StatisticUpdate, current_us
         raise HTTPException(status_code=404, detail="Statistic not found")
     
     updated_stat = await db.statistics.find_one({"id": stat_id})
+    public_cache.invalidate("statistics")
     return Statistic(**updated_stat)
 
 @admin_router.delete("/statistics/{stat_id}")
@@ -442,6 +470,7 @@ async def delete_statistic(stat_id: str, current_user: AdminUser = Depends(get_c
     result = await db.statistics.delete_one({"id": stat_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Statistic not found")
+    public_cache.invalidate("statistics")
     return {"message": "Statistic deleted successfully"}
 
 
@@ -459,6 +488,7 @@ async def create_social_link(link_input: SocialLinkCreate, current_user: AdminUs
     link_dict = link_input.dict()
     link_obj = SocialLink(**link_dict)
     await db.social_links.insert_one(link_obj.dict())
+    public_cache.invalidate("social_links")
     return link_obj
 
 @admin_router.put("/social-links/{link_id}", response_model=SocialLink)
@@ -476,6 +506,7 @@ async def update_social_link(link_id: str, link_input: SocialLinkUpdate, current
         raise HTTPException(status_code=404, detail="Social link not found")
     
     updated_link = await db.social_links.find_one({"id": link_id})
+    public_cache.invalidate("social_links")
     return SocialLink(**updated_link)
 
 @admin_router.delete("/social-links/{link_id}")
@@ -484,6 +515,7 @@ async def delete_social_link(link_id: str, current_user: AdminUser = Depends(get
     result = await db.social_links.delete_one({"id": link_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Social link not found")
+    public_cache.invalidate("social_links")
     return {"message": "Social link deleted successfully"}
 
 
@@ -501,6 +533,7 @@ async def create_process_step(step_input: ProcessStepCreate, current_user: Admin
     step_dict = step_input.dict()
     step_obj = ProcessStep(**step_dict)
     await db.process_steps.insert_one(step_obj.dict())
+    public_cache.invalidate("process_steps")
     return step_obj
 
 @admin_router.put("/process-steps/{step_id}", response_model=ProcessStep)
@@ -518,6 +551,7 @@ async def update_process_step(step_id: str, step_input: ProcessStepUpdate, curre
         raise HTTPException(status_code=404, detail="Process step not found")
     
     updated_step = await db.process_steps.find_one({"id": step_id})
+    public_cache.invalidate("process_steps")
     return ProcessStep(**updated_step)
 
 @admin_router.delete("/process-steps/{step_id}")
@@ -526,6 +560,7 @@ async def delete_process_step(step_id: str, current_user: AdminUser = Depends(ge
     result = await db.process_steps.delete_one({"id": step_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Process step not found")
+    public_cache.invalidate("process_steps")
     return {"message": "Process step deleted successfully"}
 
 
@@ -551,6 +586,9 @@ async def create_resource(resource_input: ResourceCreate, current_user: AdminUse
     resource_dict = resource_input.dict()
     resource_obj = Resource(**resource_dict)
     await db.resources.insert_one(resource_obj.dict())
+    facet_index.upsert(resource_obj.dict())
+    await precompute_hash(resource_obj.file_path)
+    public_cache.invalidate("resources")
     return resource_obj
 
 @admin_router.put("/resources/{resource_id}", response_model=Resource)
@@ -568,6 +606,9 @@ async def update_resource(resource_id: str, resource_input: ResourceUpdate, curr
         raise HTTPException(status_code=404, detail="Resource not found")
     
     updated_resource = await db.resources.find_one({"id": resource_id})
+    facet_index.upsert(updated_resource)
+    await precompute_hash(updated_resource.get("file_path"))
+    public_cache.invalidate("resources")
     return Resource(**updated_resource)
 
 @admin_router.delete("/resources/{resource_id}")
@@ -576,6 +617,8 @@ async def delete_resource(resource_id: str, current_user: AdminUser = Depends(ge
     result = await db.resources.delete_one({"id": resource_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Resource not found")
+    facet_index.remove(resource_id)
+    public_cache.invalidate("resources")
     return {"message": "Resource deleted successfully"}
 
 
@@ -605,6 +648,7 @@ async def create_blog_post(post_input: BlogPostCreate, current_user: AdminUser =
     
     post_obj = BlogPost(**post_dict)
     await db.blog_posts.insert_one(post_obj.dict())
+    public_cache.invalidate("blog_posts")
     return post_obj
 
 @admin_router.put("/blog/{post_id}", response_model=BlogPost)
@@ -628,6 +672,7 @@ async def update_blog_post(post_id: str, post_input: BlogPostUpdate, current_use
         raise HTTPException(status_code=404, detail="Blog post not found")
     
     updated_post = await db.blog_posts.find_one({"id": post_id})
+    public_cache.invalidate("blog_posts")
     return BlogPost(**updated_post)
 
 @admin_router.delete("/blog/{post_id}")
@@ -636,5 +681,84 @@ async def delete_blog_post(post_id: str, current_user: AdminUser = Depends(get_c
     result = await db.blog_posts.delete_one({"id": post_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Blog post not found")
+    public_cache.invalidate("blog_posts")
     return {"message": "Blog post deleted successfully"}
 
+
+# ================== QUOTE & BOOKING SEARCH ROUTES ==================
+
+def build_search_filter(
+    equals: dict,
+    company: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime]
+) -> dict:
+    """Build a filter served by the (field, created_at) compound indexes"""
+    query = {field: value for field, value in equals.items() if value is not None}
+    if company:
+        # Anchored, case-sensitive prefix: still an index range scan
+        query["contact_info.company"] = {"$regex": f"^{re.escape(company)}"}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    return query
+
+async def run_search(collection: str, query: dict, skip: int, limit: int) -> dict:
+    sort = [("created_at", -1)]
+    documents = await db[collection].find(query, {"_id": 0}).sort(sort).skip(skip).limit(limit).to_list(limit)
+    plan = await explain_find(db, collection, query, sort, skip, limit)
+    return {"count": len(documents), "skip": skip, "limit": limit, "results": documents, "query_plan": plan}
+
+@admin_router.get("/quotes/search")
+async def search_quotes(
+    status: Optional[str] = None,
+    email: Optional[str] = None,
+    company: Optional[str] = None,
+    project_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: AdminUser = Depends(get_current_user)
+):
+    """Search quotes by status, client, project type and creation date (requires authentication)"""
+    query = build_search_filter(
+        {"status": status, "contact_info.email": email, "quote_data.project_type": project_type},
+        company, start, end
+    )
+    return await run_search("quotes", query, skip, limit)
+
+@admin_router.get("/bookings/search")
+async def search_bookings(
+    status: Optional[str] = None,
+    email: Optional[str] = None,
+    company: Optional[str] = None,
+    service_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: AdminUser = Depends(get_current_user)
+):
+    """Search bookings by status, client, service and creation date (requires authentication)"""
+    query = build_search_filter(
+        {"status": status, "contact_info.email": email, "booking_data.service_id": service_id},
+        company, start, end
+    )
+    return await run_search("bookings", query, skip, limit)
+
+
+# ================== RETENTION ROUTES ==================
+
+@admin_router.post("/retention/run")
+async def run_retention_policies(
+    dry_run: bool = True,
+    collection: Optional[List[str]] = Query(None),
+    current_user: AdminUser = Depends(get_current_user)
+):
+    """Apply retention policies, dry run by default (requires authentication)"""
+    reports = await run_retention(db, dry_run=dry_run, collections=collection)
+    return {"dry_run": dry_run, "policies": reports}
@@ -1,22 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Dict, Any, Optional, Literal
 import os
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime, timedelta, date
 from collections import Counter
 import asyncio
 
-from models import AdminUser
+from models import AdminUser, ReportRequest
 from auth import get_current_user
+from rollups import ROLLUP_METRICS, get_timeseries
+from funnel_analytics import quote_funnel, load_funnel_frames
+from report_jobs import report_runner, REPORT_FORMATS, xlsx_available
+from metrics import record_cache
+from single_flight import SingleFlight
 
-# MongoDB connection
-mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'test_database')]
+# Shared database handle (MongoDB or the in-memory backend), read from secondaries
+from storage import secondary_db as db, primary_db
 
 # Create analytics router
 analytics_router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+# Intervalle de rafraîchissement du snapshot du tableau de bord (secondes)
+ANALYTICS_REFRESH_SECONDS = int(os.environ.get("ANALYTICS_REFRESH_SECONDS", "300"))
+
+logger = logging.getLogger(__name__)
+
+
+def read_source(refresh: bool):
+    """Base lue par un calcul : le primaire quand l'admin force un rafraîchissement.
+
+    Il doit refléter les écritures de l'admin qui le demande, que les
+    secondaires n'ont pas forcément encore répliquées.
+    """
+    return primary_db if refresh else db
+
 
 class AutoStatistic:
     def __init__(self, title: str, value: Any, suffix: str = "", description: str = "", 
@@ -41,41 +58,187 @@ class AIRecommendation:
         self.category = category
 
 
+class DashboardSnapshot:
+    """Dernier tableau de bord calculé, rafraîchi en tâche de fond.
+
+    Les requêtes sont servies immédiatement depuis le snapshot ; s'il est plus
+    vieux que l'intervalle, un rafraîchissement est lancé en arrière-plan
+    (stale-while-revalidate). Les rafraîchissements concurrents partagent le
+    même calcul (single-flight).
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.data: Optional[Dict[str, Any]] = None
+        self.computed_at: Optional[datetime] = None
+        self._flights = SingleFlight("dashboard")
+        # Incrémentée par chaque demande forcée : un calcul commencé avant elle
+        # (donc avant une éventuelle écriture de l'admin) n'est pas rejoint
+        self._generation = 0
+        self._stored_generation = 0
+        self._loop_task: Optional[asyncio.Task] = None
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        if self.computed_at is None:
+            return None
+        return (datetime.utcnow() - self.computed_at).total_seconds()
+
+    async def refresh(self, force: bool = False) -> Dict[str, Any]:
+        """Recalcule le snapshot (un seul calcul à la fois par génération)"""
+        if force:
+            self._generation += 1
+        generation = self._generation
+        source = read_source(force)
+        return await self._flights.do(("snapshot", generation), lambda: self._compute(generation, source))
+
+    async def get(self, force: bool = False) -> Dict[str, Any]:
+        """Retourne le snapshot, en le recalculant si demandé ou absent"""
+        if force or self.data is None:
+            record_cache("dashboard", False)
+            return await self.refresh(force)
+        record_cache("dashboard", True)
+        if self.age_seconds > self.interval and not self._flights.in_flight():
+            self._start_refresh()
+        return self.data
+
+    def start(self):
+        """Démarre la boucle de rafraîchissement périodique"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Arrête la boucle de rafraîchissement"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+
+    def _start_refresh(self) -> asyncio.Task:
+        task = asyncio.create_task(self.refresh())
+        task.add_done_callback(_log_refresh_failure)
+        return task
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                pass  # déjà journalisé par _log_refresh_failure
+            await asyncio.sleep(self.interval)
+
+    async def _compute(self, generation: int, source) -> Dict[str, Any]:
+        data = await compute_dashboard(source)
+        data["insights"] = await generate_insights(data["statistics"])
+        # Un calcul plus ancien qui finit après un plus récent ne l'écrase pas
+        if generation >= self._stored_generation:
+            self._stored_generation = generation
+            self.data = data
+            self.computed_at = datetime.utcnow()
+        return data
+
+
+def _log_refresh_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Échec du rafraîchissement du tableau de bord: %s", task.exception())
+
+
+async def compute_dashboard(source=db) -> Dict[str, Any]:
+    """Calcule toutes les statistiques et les recommandations IA"""
+    # Calculer toutes les statistiques en parallèle
+    stats_data = await asyncio.gather(
+        calculate_content_stats(source),
+        calculate_engagement_stats(source),
+        calculate_technical_stats(source),
+        calculate_business_stats(source),
+        return_exceptions=True
+    )
+    
+    # Combiner toutes les statistiques
+    all_statistics = []
+    for stat_group in stats_data:
+        if not isinstance(stat_group, Exception):
+            all_statistics.extend(stat_group)
+    
+    # Générer des recommandations IA
+    recommendations = await generate_ai_recommendations(all_statistics)
+    
+    return {
+        "statistics": [stat.__dict__ for stat in all_statistics],
+        "recommendations": [rec.__dict__ for rec in recommendations],
+        "last_updated": datetime.utcnow().isoformat(),
+        "total_stats": len(all_statistics)
+    }
+
+
+dashboard_snapshot = DashboardSnapshot(ANALYTICS_REFRESH_SECONDS)
+
+# Lectures analytiques coûteuses : les requêtes identiques simultanées
+# partagent le même calcul
+analytics_flights = SingleFlight("analytics")
+
+
 @analytics_router.get("/dashboard")
-async def get_analytics_dashboard(current_user: AdminUser = Depends(get_current_user)):
+async def get_analytics_dashboard(refresh: bool = False, current_user: AdminUser = Depends(get_current_user)):
     """Get comprehensive analytics dashboard with auto-calculated statistics"""
     
     try:
-        # Calculer toutes les statistiques en parallèle
-        stats_data = await asyncio.gather(
-            calculate_content_stats(),
-            calculate_engagement_stats(),
-            calculate_technical_stats(),
-            calculate_business_stats(),
-            return_exceptions=True
-        )
-        
-        # Combiner toutes les statistiques
-        all_statistics = []
-        for stat_group in stats_data:
-            if not isinstance(stat_group, Exception):
-                all_statistics.extend(stat_group)
-        
-        # Générer des recommandations IA
-        recommendations = await generate_ai_recommendations(all_statistics)
-        
-        return {
-            "statistics": [stat.__dict__ for stat in all_statistics],
-            "recommendations": [rec.__dict__ for rec in recommendations],
-            "last_updated": datetime.utcnow().isoformat(),
-            "total_stats": len(all_statistics)
-        }
-        
+        data = await dashboard_snapshot.get(force=refresh)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des statistiques: {str(e)}")
+    
+    return {
+        "statistics": data["statistics"],
+        "recommendations": data["recommendations"],
+        "last_updated": data["last_updated"],
+        "total_stats": data["total_stats"],
+        "snapshot_age_seconds": round(dashboard_snapshot.age_seconds, 1)
+    }
+
+
+@analytics_router.get("/timeseries")
+async def get_analytics_timeseries(
+    metric: List[str] = Query(list(ROLLUP_METRICS)),
+    granularity: Literal["day", "week", "month"] = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: AdminUser = Depends(get_current_user)
+):
+    """Séries temporelles lues depuis les agrégats (fin exclue)"""
+    unknown = [m for m in metric if m not in ROLLUP_METRICS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Métriques inconnues: {', '.join(unknown)}")
+    
+    tomorrow = datetime.combine(datetime.utcnow().date(), datetime.min.time()) + timedelta(days=1)
+    end_at = datetime.combine(end, datetime.min.time()) if end else tomorrow
+    start_at = datetime.combine(start, datetime.min.time()) if start else end_at - timedelta(days=30)
+    if start_at >= end_at:
+        raise HTTPException(status_code=400, detail="start doit précéder end")
+    
+    series = await analytics_flights.do(
+        ("timeseries", tuple(metric), granularity, start_at, end_at),
+        lambda: get_timeseries(db, metric, granularity, start_at, end_at)
+    )
+    return {
+        "granularity": granularity,
+        "start": start_at.date().isoformat(),
+        "end": end_at.date().isoformat(),
+        "series": series
+    }
+
+
+@analytics_router.get("/funnel")
+async def get_quote_funnel(current_user: AdminUser = Depends(get_current_user)):
+    """Entonnoir devis → acceptation → réservation, conversions et revenus"""
+    funnel = await analytics_flights.do(("funnel",), lambda: quote_funnel(db))
+    # Résultat partagé entre requêtes : ne pas le modifier
+    return {**funnel, "generated_at": datetime.utcnow().isoformat()}
 
 
-async def calculate_content_stats() -> List[AutoStatistic]:
+async def calculate_content_stats(db=db) -> List[AutoStatistic]:
     """Calcule les statistiques de contenu"""
     stats = []
     
@@ -128,7 +291,7 @@ async def calculate_content_stats() -> List[AutoStatistic]:
     return stats
 
 
-async def calculate_engagement_stats() -> List[AutoStatistic]:
+async def calculate_engagement_stats(db=db) -> List[AutoStatistic]:
     """Calcule les statistiques d'engagement"""
     stats = []
     
@@ -187,7 +350,7 @@ async def calculate_engagement_stats() -> List[AutoStatistic]:
     return stats
 
 
-async def calculate_technical_stats() -> List[AutoStatistic]:
+async def calculate_technical_stats(db=db) -> List[AutoStatistic]:
     """Calcule les statistiques techniques"""
     stats = []
     
@@ -231,7 +394,7 @@ async def calculate_technical_stats() -> List[AutoStatistic]:
     return stats
 
 
-async def calculate_business_stats() -> List[AutoStatistic]:
+async def calculate_business_stats(db=db) -> List[AutoStatistic]:
     """Calcule les statistiques business"""
     stats = []
     
@@ -395,14 +558,18 @@ async def generate_ai_recommendations(statistics: List[AutoStatistic]) -> List[A
 
 
 @analytics_router.get("/export")
-async def export_analytics_report(current_user: AdminUser = Depends(get_current_user)):
+async def export_analytics_report(refresh: bool = False, current_user: AdminUser = Depends(get_current_user)):
     """Exporte un rapport d'analyse complet"""
     
-    dashboard_data = await get_analytics_dashboard(current_user)
+    try:
+        dashboard_data = await dashboard_snapshot.get(force=refresh)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des statistiques: {str(e)}")
     
     # Calculer des métriques supplémentaires pour le rapport
     report = {
         "generated_at": datetime.utcnow().isoformat(),
+        "data_as_of": dashboard_data["last_updated"],
         "summary": {
             "total_statistics": len(dashboard_data["statistics"]),
             "total_recommendations": len(dashboard_data["recommendations"]),
@@ -410,7 +577,7 @@ async def export_analytics_report(current_user: AdminUser = Depends(get_current_
         },
         "statistics": dashboard_data["statistics"],
         "recommendations": dashboard_data["recommendations"],
-        "insights": await generate_insights(dashboard_data["statistics"])
+        "insights": dashboard_data["insights"]
     }
     
     return report
@@ -427,12 +594,12 @@ async def generate_insights(statistics: List[Dict]) -> Dict[str, Any]:
     
     # Analyser les forces
     for stat in statistics:
-        if stat.get("trend") == "positive" and int(stat["value"]) > 5:
+        if stat.get("trend") == "positive" and float(stat["value"]) > 5:
             insights["strengths"].append(f"Excellent {stat['title'].lower()}: {stat['value']}{stat.get('suffix', '')}")
     
     # Analyser les zones d'amélioration
     for stat in statistics:
-        if stat.get("trend") == "negative" or (stat.get("trend") == "neutral" and int(stat["value"]) < 3):
+        if stat.get("trend") == "negative" or (stat.get("trend") == "neutral" and float(stat["value"]) < 3):
             insights["areas_for_improvement"].append(f"{stat['title']}: {stat['description']}")
     
     # Opportunités de croissance
@@ -443,4 +610,74 @@ async def generate_insights(statistics: List[Dict]) -> Dict[str, Any]:
         "Automatiser le processus de génération de leads"
     ]
     
-    return insights
\ No newline at end of file
+    return insights
+
+
+# ================== RAPPORTS ASYNCHRONES ==================
+
+async def collect_analytics_report(refresh: bool):
+    return await dashboard_snapshot.get(force=refresh)
+
+
+async def collect_funnel_report(refresh: bool):
+    return await load_funnel_frames(read_source(refresh))
+
+
+async def collect_quotes_report(refresh: bool):
+    return await read_source(refresh).quotes.find({}, {"_id": 0}).sort("created_at", -1).to_list(None)
+
+
+REPORT_COLLECTORS = {
+    "analytics": collect_analytics_report,
+    "funnel": collect_funnel_report,
+    "quotes": collect_quotes_report,
+}
+
+
+@analytics_router.post("/reports")
+async def submit_report(request: ReportRequest, current_user: AdminUser = Depends(get_current_user)):
+    """Lance la génération d'un rapport et retourne l'identifiant du job"""
+    if request.report not in REPORT_COLLECTORS:
+        raise HTTPException(status_code=400, detail=f"Rapport inconnu: {request.report}")
+    if request.format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format inconnu: {request.format}")
+    if request.format == "xlsx" and not xlsx_available():
+        raise HTTPException(status_code=400, detail="Export xlsx indisponible (openpyxl non installé)")
+    
+    job = report_runner.submit(
+        request.report,
+        request.format,
+        lambda: REPORT_COLLECTORS[request.report](request.refresh),
+        refresh=request.refresh
+    )
+    return job.to_dict()
+
+
+@analytics_router.get("/reports/{job_id}")
+async def get_report_status(job_id: str, current_user: AdminUser = Depends(get_current_user)):
+    """Statut d'un job de rapport"""
+    job = report_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de rapport introuvable")
+    return job.to_dict()
+
+
+@analytics_router.get("/reports/{job_id}/download")
+async def download_report(job_id: str, current_user: AdminUser = Depends(get_current_user)):
+    """Télécharge le rapport généré"""
+    job = report_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de rapport introuvable")
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Rapport non disponible (statut: {job.status})")
+    
+    artifact = report_runner.artifact(job)
+    if artifact is None:
+        raise HTTPException(status_code=410, detail="Rapport expiré, relancez la génération")
+    
+    content, media_type, filename = artifact
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -7,6 +7,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
 
 from models import AdminUser, Token, TokenData
+from storage import primary_db as db
 
 # Security configuration
 SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-change-in-production")
@@ -65,13 +66,6 @@ def verify_token(token: str) -> TokenData:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AdminUser:
     """Get the current authenticated user from JWT token"""
-    from motor.motor_asyncio import AsyncIOMotorClient
-    
-    # MongoDB connection
-    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ.get('DB_NAME', 'test_database')]
-    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -96,63 +90,39 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         
     except JWTError:
         raise credentials_exception
-    finally:
-        client.close()
 
 
 async def authenticate_user(username: str, password: str) -> Optional[AdminUser]:
     """Authenticate a user with username and password"""
-    from motor.motor_asyncio import AsyncIOMotorClient
-    
-    # MongoDB connection
-    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ.get('DB_NAME', 'test_database')]
-    
-    try:
-        user = await db.admin_users.find_one({"username": username})
-        if not user:
-            return None
-            
-        admin_user = AdminUser(**user)
-        if not verify_password(password, admin_user.hashed_password):
-            return None
-            
-        return admin_user
+    user = await db.admin_users.find_one({"username": username})
+    if not user:
+        return None
+        
+    admin_user = AdminUser(**user)
+    if not verify_password(password, admin_user.hashed_password):
+        return None
         
-    finally:
-        client.close()
+    return admin_user
 
 
 async def create_default_admin_user():
     """Create a default admin user if none exists"""
-    from motor.motor_asyncio import AsyncIOMotorClient
+    # Check if any admin user exists
+    existing_admin = await db.admin_users.find_one()
+    if existing_admin:
+        print("ℹ️ Admin user already exists")
+        return
     
-    # MongoDB connection
-    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ.get('DB_NAME', 'test_database')]
+    # Create default admin user
+    default_admin = AdminUser(
+        username="admin",
+        email="admin@jeanyves.dev",
+        hashed_password=get_password_hash("admin123"),  # Change this in production!
+        is_active=True
+    )
     
-    try:
-        # Check if any admin user exists
-        existing_admin = await db.admin_users.find_one()
-        if existing_admin:
-            print("ℹ️ Admin user already exists")
-            return
-        
-        # Create default admin user
-        default_admin = AdminUser(
-            username="admin",
-            email="admin@jeanyves.dev",
-            hashed_password=get_password_hash("admin123"),  # Change this in production!
-            is_active=True
-        )
-        
-        await db.admin_users.insert_one(default_admin.dict())
-        print("✅ Default admin user created:")
-        print("   Username: admin")
-        print("   Password: admin123")
-        print("   ⚠️  Please change the password in production!")
-        
-    finally:
-        client.close()
\ No newline at end of file
+    await db.admin_users.insert_one(default_admin.dict())
+    print("✅ Default admin user created:")
+    print("   Username: admin")
+    print("   Password: admin123")
+    print("   ⚠️  Please change the password in production!")
\ No newline at end of file
@@ -0,0 +1,134 @@
+from typing import Awaitable, Callable, Dict, Iterable, List, TypeVar
+import asyncio
+import logging
+import os
+import time
+
+import pymongo
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
+
+from metrics import circuit_breaker_state, circuit_breaker_transitions_total
+
+
+logger = logging.getLogger(__name__)
+
+# Time budget of a guarded read, server selection included
+PUBLIC_QUERY_DEADLINE = float(os.environ.get("PUBLIC_QUERY_DEADLINE_MS", "1000")) / 1000
+# Consecutive failures that open a breaker, and how long it stays open
+CIRCUIT_BREAKER_FAILURES = int(os.environ.get("CIRCUIT_BREAKER_FAILURES", "5"))
+CIRCUIT_BREAKER_RESET = float(os.environ.get("CIRCUIT_BREAKER_RESET", "30"))
+
+# Only an unreachable or slow database trips a breaker; bad queries still raise
+UNAVAILABLE_ERRORS = (asyncio.TimeoutError, ConnectionFailure, ExecutionTimeout)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+T = TypeVar("T")
+
+
+class Unavailable(Exception):
+    """A guarded read was refused by an open breaker or failed its deadline"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stop querying a collection after repeated failures, then probe it again.
+
+    Closed: reads go through and consecutive failures are counted. Open:
+    reads are refused until the reset delay has passed. Half-open: a single
+    read is let through as a probe; it closes the breaker on success and
+    reopens it on failure.
+    """
+
+    def __init__(self, name: str, failures: int = CIRCUIT_BREAKER_FAILURES, reset: float = CIRCUIT_BREAKER_RESET):
+        self.name = name
+        self.max_failures = failures
+        self.reset = reset
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self._set_state(CLOSED)
+
+    def _set_state(self, state: str):
+        if getattr(self, "state", None) not in (None, state):
+            logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state, state)
+            circuit_breaker_transitions_total.inc(breaker=self.name, state=state)
+        self.state = state
+        circuit_breaker_state.set(STATE_VALUES[state], breaker=self.name)
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a read may go through now (claims the probe when half-open)"""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+
+    def release(self):
+        """Give back an admitted read that ended without an outcome (cancelled)"""
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.probing = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.max_failures:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker(collection: str) -> CircuitBreaker:
+    if collection not in breakers:
+        breakers[collection] = CircuitBreaker(collection)
+    return breakers[collection]
+
+
+async def guarded(collections: Iterable[str], compute: Callable[[], Awaitable[T]],
+                  deadline: float = PUBLIC_QUERY_DEADLINE) -> T:
+    """Run a read through the breakers of the collections it depends on, within a deadline"""
+    admitted: List[CircuitBreaker] = []
+    for collection in collections:
+        current = breaker(collection)
+        if not current.allow():
+            for other in admitted:
+                other.release()
+            raise Unavailable(f"circuit open for {collection}", current.retry_after() or 1)
+        admitted.append(current)
+
+    try:
+        # pymongo.timeout bounds server selection and every command (maxTimeMS);
+        # wait_for bounds the whole computation
+        with pymongo.timeout(deadline):
+            result = await asyncio.wait_for(compute(), deadline)
+    except UNAVAILABLE_ERRORS as exc:
+        for current in admitted:
+            current.record_failure()
+        reason = str(exc) or f"no result within {deadline * 1000:.0f} ms"
+        raise Unavailable(f"{type(exc).__name__}: {reason}",
+                          max([1.0] + [current.retry_after() for current in admitted])) from exc
+    except BaseException:
+        for current in admitted:
+            current.release()
+        raise
+    for current in admitted:
+        current.record_success()
+    return result
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Audit des plans d'exécution : rejoue avec explain("executionStats") chaque
+forme de requête enregistrée pendant les tests ou les bancs de charge
+(QUERY_AUDIT_FILE, voir query_shapes.py) sur une base peuplée
+(generate_data.py) et signale scans de collection, tris en mémoire,
+ratios documents examinés / renvoyés et index manquants
+Usage: QUERY_AUDIT_FILE=benchmarks/results/query_shapes.json python load_benchmark.py
+       python explain_audit.py [benchmarks/results/query_shapes.json] [--max-ratio 10]
+                               [--fail-on collscan --fail-on sort --fail-on ratio]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+sys.path.append(str(ROOT_DIR))
+
+from indexes import summarize_plan  # noqa: E402
+from query_shapes import load  # noqa: E402
+from storage import db, close as close_storage  # noqa: E402
+
+RESULTS_DIR = ROOT_DIR / "benchmarks" / "results"
+DEFAULT_SHAPES = RESULTS_DIR / "query_shapes.json"
+
+RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$regex", "$exists")
+
+
+def explain_command(query: Dict[str, Any]) -> Dict[str, Any]:
+    """Command to explain for a recorded query (writes are explained as their find)"""
+    name, collection = query["command"], query["collection"]
+    if name == "aggregate":
+        return {"aggregate": collection, "pipeline": query.get("pipeline", []), "cursor": {}}
+    if name == "count":
+        return {"count": collection, "query": query.get("query", {})}
+    if name == "distinct":
+        return {"distinct": collection, "key": query["key"], "query": query.get("query", {})}
+    command = {"find": collection, "filter": query.get("filter", {})}
+    for key in ("sort", "skip", "limit"):
+        if query.get(key):
+            command[key] = query[key]
+    return command
+
+
+def filter_and_sort(query: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Filter and sort an index could serve (leading $match/$sort of a pipeline)"""
+    if query["command"] == "aggregate":
+        stages = list(query.get("pipeline", []))
+        match = stages.pop(0)["$match"] if stages and "$match" in stages[0] else {}
+        sort = stages[0]["$sort"] if stages and "$sort" in stages[0] else {}
+        return match, dict(sort)
+    return query.get("filter") or query.get("query") or {}, dict(query.get("sort") or {})
+
+
+def suggest_index(query: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """Equality-sort-range index for the query, as ensure_indexes declares them"""
+    filter, sort = filter_and_sort(query)
+    equality, ranges = [], []
+    for field, condition in filter.items():
+        if field.startswith("$") or field == "_id":
+            continue
+        if isinstance(condition, dict) and any(op in condition for op in RANGE_OPERATORS):
+            ranges.append(field)
+        else:
+            equality.append(field)
+    keys = [(field, 1) for field in equality]
+    # $natural orders (capped collections) need no index
+    keys += [(field, direction) for field, direction in sort.items()
+             if field not in equality and not field.startswith("$")]
+    keys += [(field, 1) for field in ranges if field not in sort]
+    return keys
+
+
+def covered(keys: List[Tuple[str, int]], indexes: Dict[str, Any]) -> bool:
+    """Whether an existing index starts with the suggested fields"""
+    fields = [field for field, _ in keys]
+    for index in indexes.values():
+        existing = [field for field, _ in index["key"]]
+        if existing[:len(fields)] == fields:
+            return True
+    return False
+
+
+def plan_parts(explain: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], bool]:
+    """(winning plan, execution stats, blocking $sort stage) from any explain layout"""
+    sort_stage = False
+    if "queryPlanner" not in explain and explain.get("stages"):
+        # Classic aggregation explain: the query runs in the first stage
+        sort_stage = any("$sort" in stage for stage in explain["stages"][1:])
+        explain = explain["stages"][0]["$cursor"]
+    return explain["queryPlanner"]["winningPlan"], explain.get("executionStats", {}), sort_stage
+
+
+async def audit_query(entry: Dict[str, Any], indexes: Dict[str, Any], max_ratio: float) -> Dict[str, Any]:
+    query = entry["example"]
+    report: Dict[str, Any] = {
+        "collection": query["collection"],
+        "command": query.get("write", query["command"]),
+        "count": entry["count"],
+        "shape": entry["shape"],
+    }
+    try:
+        explain = await db.command("explain", explain_command(query), verbosity="executionStats")
+    except Exception as e:
+        report["error"] = str(e)
+        return report
+
+    winning_plan, stats, sort_stage = plan_parts(explain)
+    plan = summarize_plan(winning_plan)
+    returned = stats.get("nReturned", 0)
+    examined = stats.get("totalDocsExamined", 0)
+    ratio = examined / max(returned, 1)
+    issues = []
+    if plan["collection_scan"]:
+        issues.append("collscan")
+    if plan["in_memory_sort"] or sort_stage:
+        issues.append("sort")
+    if ratio > max_ratio:
+        issues.append("ratio")
+
+    report.update({
+        "plan": plan,
+        "returned": returned,
+        "docs_examined": examined,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "ratio": round(ratio, 1),
+        "time_ms": stats.get("executionTimeMillis", 0),
+        "issues": issues,
+        "missing_index": None,
+    })
+    suggestion = suggest_index(query) if issues else []
+    if suggestion and not covered(suggestion, indexes):
+        report["missing_index"] = suggestion
+    return report
+
+
+async def audit(entries: List[Dict[str, Any]], max_ratio: float) -> List[Dict[str, Any]]:
+    indexes: Dict[str, Dict[str, Any]] = {}
+    reports = []
+    for entry in entries:
+        collection = entry["example"]["collection"]
+        if collection not in indexes:
+            indexes[collection] = await db[collection].index_information()
+        reports.append(await audit_query(entry, indexes[collection], max_ratio))
+    return reports
+
+
+def summarize(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    missing = {}
+    for report in reports:
+        if report.get("missing_index"):
+            key = (report["collection"], tuple(map(tuple, report["missing_index"])))
+            missing[key] = missing.get(key, 0) + report["count"]
+    return {
+        "shapes": len(reports),
+        "errors": sum(1 for r in reports if "error" in r),
+        "collection_scans": sum(1 for r in reports if "collscan" in r.get("issues", [])),
+        "in_memory_sorts": sum(1 for r in reports if "sort" in r.get("issues", [])),
+        "high_ratio": sum(1 for r in reports if "ratio" in r.get("issues", [])),
+        "missing_indexes": [{"collection": collection, "keys": [list(k) for k in keys], "queries": count}
+                            for (collection, keys), count in sorted(missing.items(), key=lambda i: -i[1])],
+    }
+
+
+def print_table(reports: List[Dict[str, Any]], summary: Dict[str, Any]):
+    header = (f"{'collection':<22}{'command':<10}{'calls':>7}  {'plan':<34}"
+              f"{'returned':>9}{'examined':>10}{'ratio':>8}  issues")
+    print(header)
+    print("-" * len(header))
+    for r in sorted(reports, key=lambda r: (-len(r.get("issues", [])), -r["count"])):
+        if "error" in r:
+            print(f"{r['collection']:<22}{r['command']:<10}{r['count']:>7}  error: {r['error']}")
+            continue
+        plan = " > ".join(dict.fromkeys(r["plan"]["stages"]))
+        if r["plan"]["indexes"]:
+            plan += f" ({', '.join(r['plan']['indexes'])})"
+        print(f"{r['collection']:<22}{r['command']:<10}{r['count']:>7}  {plan[:33]:<34}"
+              f"{r['returned']:>9}{r['docs_examined']:>10}{r['ratio']:>8.1f}  {', '.join(r['issues']) or '-'}")
+        if r["issues"]:
+            print(f"{'':<41}{json.dumps(r['shape'], ensure_ascii=False)[:120]}")
+    print()
+    print(f"📊 {summary['shapes']} shapes: {summary['collection_scans']} collection scans, "
+          f"{summary['in_memory_sorts']} in-memory sorts, {summary['high_ratio']} high examined/returned ratios, "
+          f"{summary['errors']} errors")
+    for missing in summary["missing_indexes"]:
+        keys = ", ".join(f"(\"{field}\", {direction})" for field, direction in missing["keys"])
+        print(f"💡 Missing index on {missing['collection']}: [{keys}] ({missing['queries']} calls)")
+
+
+async def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Replay recorded query shapes with explain")
+    parser.add_argument("shapes", nargs="*", type=Path, default=[DEFAULT_SHAPES],
+                        help="Files written through QUERY_AUDIT_FILE")
+    parser.add_argument("--max-ratio", type=float, default=10.0,
+                        help="Docs examined per doc returned before a query is flagged")
+    parser.add_argument("--collection", action="append", help="Only audit these collections (repeatable)")
+    parser.add_argument("--fail-on", action="append", choices=["collscan", "sort", "ratio", "missing-index"],
+                        default=[], help="Exit non-zero when a query has this issue (repeatable)")
+    parser.add_argument("--output", type=Path, help="Report file (default: benchmarks/results/explain-<time>.json)")
+    args = parser.parse_args()
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    for path in args.shapes:
+        for entry in load(str(path)):
+            key = json.dumps(entry["shape"], sort_keys=True)
+            if key in entries:
+                entries[key]["count"] += entry["count"]
+            else:
+                entries[key] = entry
+    selected = [entry for entry in entries.values()
+                if not args.collection or entry["example"]["collection"] in args.collection]
+
+    try:
+        reports = await audit(selected, args.max_ratio)
+    finally:
+        close_storage()
+    summary = summarize(reports)
+    print_table(reports, summary)
+
+    output = args.output or RESULTS_DIR / f"explain-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "meta": {"generated_at": datetime.utcnow().isoformat(), "max_ratio": args.max_ratio,
+                 "sources": [str(path) for path in args.shapes]},
+        "summary": summary,
+        "queries": reports,
+    }, indent=2, ensure_ascii=False, default=str))
+    print(f"\n✅ Report written to {output}")
+
+    failures = [r for r in reports
+                if set(args.fail_on) & set(r.get("issues", []))
+                or ("missing-index" in args.fail_on and r.get("missing_index"))]
+    if failures:
+        print(f"❌ {len(failures)} queries fail the audit ({', '.join(args.fail_on)})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
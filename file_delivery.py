@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+import asyncio
+import hashlib
+import os
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from metrics import record_cache
+
+
+# Directory holding the files referenced by Resource.file_path
+RESOURCES_DIR = Path(os.environ.get("RESOURCES_DIR", Path(__file__).parent / "resource_files")).resolve()
+# Concurrent file transfers, and how long a request may wait for a slot
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get("MAX_CONCURRENT_DOWNLOADS", "8"))
+DOWNLOAD_QUEUE_TIMEOUT = float(os.environ.get("DOWNLOAD_QUEUE_TIMEOUT", "2"))
+# Content hashes kept in memory; the least recently used files are forgotten first
+FILE_HASH_CACHE_SIZE = int(os.environ.get("FILE_HASH_CACHE_SIZE", "1024"))
+
+CHUNK_SIZE = 256 * 1024
+
+MEDIA_TYPES = {
+    ".pdf": "application/pdf",
+    ".zip": "application/zip",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+download_slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+# (path, size, mtime_ns) -> sha256 hex digest
+_hash_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+
+
+def resolve_resource_file(file_path: Optional[str]) -> Optional[Path]:
+    """Absolute path of a resource file, refusing anything outside RESOURCES_DIR"""
+    if not file_path:
+        return None
+    path = (RESOURCES_DIR / file_path).resolve()
+    if not path.is_relative_to(RESOURCES_DIR) or not path.is_file():
+        return None
+    return path
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def content_hash(path: Path, stat_result: Optional[os.stat_result] = None) -> str:
+    """SHA-256 of a file, computed once per (size, mtime) in a worker thread"""
+    stat_result = stat_result or path.stat()
+    key = (str(path), stat_result.st_size, stat_result.st_mtime_ns)
+    digest = _hash_cache.get(key)
+    record_cache("file_hash", digest is not None)
+    if digest is None:
+        digest = _hash_cache[key] = await asyncio.to_thread(_sha256, path)
+    _hash_cache.move_to_end(key)
+    while len(_hash_cache) > FILE_HASH_CACHE_SIZE:
+        _hash_cache.popitem(last=False)
+    return digest
+
+
+async def precompute_hash(file_path: Optional[str]):
+    """Hash a resource file ahead of its first download (admin writes, warmup)"""
+    path = resolve_resource_file(file_path)
+    if path is not None:
+        await content_hash(path)
+
+
+async def acquire_download_slot() -> bool:
+    """Wait briefly for a transfer slot; False means the server is saturated"""
+    try:
+        await asyncio.wait_for(download_slots.acquire(), DOWNLOAD_QUEUE_TIMEOUT)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Single byte range as (start, end inclusive); None for the whole file.
+
+    Raises ValueError when the range cannot be satisfied. Multi-range
+    requests are answered with the whole file, which RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class ResourceFileResponse(Response):
+    """File response with Range, ETag/Last-Modified and zero-copy sending.
+
+    When the server advertises the ``http.response.zerocopysend`` ASGI
+    extension the file descriptor is handed over for sendfile(2); otherwise
+    the file is streamed in chunks from a worker thread.
+    """
+
+    def __init__(self, path: Path, stat_result: os.stat_result, etag: str, filename: str,
+                 request_headers, method: str = "GET", on_complete: Optional[Callable[[], None]] = None):
+        super().__init__(status_code=200, media_type=MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream"))
+        self.path = path
+        self.on_complete = on_complete
+        self.send_body = method != "HEAD"
+        self.size = size = stat_result.st_size
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["etag"] = etag
+        self.headers["last-modified"] = last_modified
+        self.headers["content-disposition"] = f'attachment; filename="{filename}"'
+
+        self.range: Optional[Tuple[int, int]] = None
+        if _not_modified(request_headers, etag, stat_result.st_mtime):
+            self.status_code = 304
+            self.send_body = False
+            del self.headers["content-length"]
+            return
+
+        if_range = request_headers.get("if-range")
+        if if_range is None or if_range in (etag, last_modified):
+            try:
+                self.range = parse_range(request_headers.get("range"), size)
+            except ValueError:
+                self.status_code = 416
+                self.send_body = False
+                self.headers["content-range"] = f"bytes */{size}"
+                self.headers["content-length"] = "0"
+                return
+
+        if self.range is not None:
+            start, end = self.range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            self.headers["content-length"] = str(end - start + 1)
+        else:
+            self.headers["content-length"] = str(size)
+
+    @property
+    def is_full_download(self) -> bool:
+        """True when the whole file is sent, in one response or one range covering it"""
+        return self.status_code == 200 or (self.status_code == 206 and self.range == (0, self.size - 1))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if not self.send_body:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+
+            start, end = self.range or (0, int(self.headers["content-length"]) - 1)
+            count = end - start + 1
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                with open(self.path, "rb") as f:
+                    await send({"type": "http.response.zerocopysend", "file": f,
+                                "offset": start, "count": count, "more_body": False})
+                return
+
+            async with await anyio.open_file(self.path, mode="rb") as f:
+                await f.seek(start)
+                remaining = count
+                while remaining > 0:
+                    chunk = await f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break  # file shrank while streaming
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if self.on_complete is not None:
+                self.on_complete()
+
+
+def _not_modified(request_headers, etag: str, mtime: float) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
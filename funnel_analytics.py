@@ -0,0 +1,132 @@
+from typing import TYPE_CHECKING, Any, Dict, List
+import asyncio
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Columns pulled from the quotes collection, flattened server-side
+QUOTE_COLUMNS = [
+    "status", "project_type", "complexity", "timeline",
+    "total_price", "min_price", "max_price", "email",
+    "created_at", "updated_at"
+]
+
+QUOTE_PROJECTION = {
+    "_id": 0,
+    "status": 1,
+    "project_type": "$quote_data.project_type",
+    "complexity": "$quote_data.complexity",
+    "timeline": "$quote_data.timeline",
+    "total_price": "$quote_data.total_price",
+    "min_price": "$quote_data.min_price",
+    "max_price": "$quote_data.max_price",
+    "email": {"$toLower": "$contact_info.email"},
+    "created_at": 1,
+    "updated_at": 1
+}
+
+FUNNEL_DIMENSIONS = ("project_type", "complexity", "timeline")
+PERCENTILES = (50, 75, 90, 95)
+
+
+async def load_funnel_frames(db):
+    """Fetch the quote columns and the set of booking emails (one cursor each)"""
+    # pandas takes a noticeable share of startup: imported on first use only
+    import pandas as pd
+
+    quotes, bookings = await asyncio.gather(
+        db.quotes.aggregate([{"$project": QUOTE_PROJECTION}]).to_list(None),
+        db.bookings.aggregate([
+            {"$group": {"_id": {"$toLower": "$contact_info.email"}}}
+        ]).to_list(None)
+    )
+    frame = pd.DataFrame.from_records(quotes, columns=QUOTE_COLUMNS)
+    booked_emails = pd.Index([b["_id"] for b in bookings if b["_id"]])
+    return frame, booked_emails
+
+
+def compute_funnel(quotes: "pd.DataFrame", booked_emails: "pd.Index") -> Dict[str, Any]:
+    """Funnel, conversion, time-to-accept and revenue figures, all vectorized"""
+    import pandas as pd
+
+    total = len(quotes)
+    if total == 0:
+        return {"total_quotes": 0, "stages": [], "conversion": {}, "time_to_accept_hours": {}, "revenue": {}}
+
+    # Low-cardinality labels as categoricals: comparisons and groupbys then
+    # run on integer codes
+    status = quotes["status"].fillna("draft").astype("category")
+    accepted = status.eq("accepted")
+    sent = status.isin(["sent", "accepted", "rejected"])
+    booked = quotes["email"].isin(booked_emails)
+    flags = pd.DataFrame({"sent": sent, "accepted": accepted, "booked": booked})
+
+    stages = [
+        {"stage": "submitted", "count": total, "rate": 1.0},
+        {"stage": "sent", "count": int(sent.sum()), "rate": float(sent.mean())},
+        {"stage": "accepted", "count": int(accepted.sum()), "rate": float(accepted.mean())},
+        {"stage": "booked", "count": int(booked.sum()), "rate": float(booked.mean())},
+    ]
+
+    conversion = {}
+    for dimension in FUNNEL_DIMENSIONS:
+        labels = quotes[dimension].fillna("unknown").astype("category")
+        grouped = flags.groupby(labels, observed=True, sort=False).agg(
+            quotes=("accepted", "size"),
+            acceptance_rate=("accepted", "mean"),
+            booking_rate=("booked", "mean"),
+        ).sort_values("quotes", ascending=False)
+        conversion[dimension] = _records(grouped.reset_index(names=dimension))
+
+    # Quotes have no accepted_at: the last update of an accepted quote is
+    # the status change that accepted it
+    delays = (quotes["updated_at"] - quotes["created_at"]).dt.total_seconds().to_numpy()[accepted.to_numpy()] / 3600
+    delays = delays[~np.isnan(delays)]
+    time_to_accept = {}
+    if len(delays):
+        values = np.percentile(delays, PERCENTILES)
+        time_to_accept = {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, values)}
+        time_to_accept["mean"] = round(float(delays.mean()), 2)
+
+    prices = quotes[["total_price", "min_price", "max_price"]].astype("float64")
+    total_price = prices["total_price"].dropna().to_numpy()
+    revenue = {}
+    if len(total_price):
+        counts, edges = np.histogram(total_price, bins=10)
+        revenue = {
+            "percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(total_price, PERCENTILES))},
+            "mean": round(float(total_price.mean()), 2),
+            "pipeline_total": round(float(total_price.sum()), 2),
+            "accepted_total": round(float(prices["total_price"][accepted].sum()), 2),
+            "accepted_range": [
+                round(float(prices["min_price"][accepted].sum()), 2),
+                round(float(prices["max_price"][accepted].sum()), 2),
+            ],
+            "mean_spread": round(float((prices["max_price"] - prices["min_price"]).mean()), 2),
+            "histogram": [
+                {"from": round(float(lo), 2), "to": round(float(hi), 2), "count": int(c)}
+                for lo, hi, c in zip(edges[:-1], edges[1:], counts)
+            ],
+        }
+
+    return {
+        "total_quotes": total,
+        "stages": stages,
+        "conversion": conversion,
+        "time_to_accept_hours": time_to_accept,
+        "revenue": revenue,
+    }
+
+
+async def quote_funnel(db) -> Dict[str, Any]:
+    """Load the columns then run the pandas work off the event loop"""
+    quotes, booked_emails = await load_funnel_frames(db)
+    return await asyncio.to_thread(compute_funnel, quotes, booked_emails)
+
+
+def _records(frame: "pd.DataFrame") -> List[Dict[str, Any]]:
+    frame = frame.round(4).astype(object).where(frame.notna(), None)
+    return frame.to_dict("records")
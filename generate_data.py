@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Générateur de données synthétiques reproductibles (graine) pour toutes les
+collections, jusqu'à plusieurs dizaines de millions de documents, insérés
+par lots insert_many en parallèle
+Usage: python generate_data.py [--scale 1] [--count resource_downloads=20000000]
+                               [--seed 42] [--batch-size 5000] [--concurrency 8] [--drop]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+sys.path.append(str(ROOT_DIR))
+# Sample prices for the generated quotes, unless real tables are configured
+os.environ.setdefault("PRICING_TABLES_PATH", str(ROOT_DIR / "pricing_tables.example.json"))
+
+from storage import db, close as close_storage  # noqa: E402
+from pricing import price_tables  # noqa: E402
+
+# Documents per collection at --scale 1; content collections first, since
+# the event collections reference them
+BASE_COUNTS = {
+    "technologies": 80,
+    "services": 12,
+    "projects": 150,
+    "resources": 200,
+    "testimonials": 300,
+    "blog_posts": 2_000,
+    "quotes": 100_000,
+    "bookings": 40_000,
+    "resource_downloads": 1_000_000,
+    "newsletter_subscriptions": 50_000,
+    "pending_testimonials": 5_000,
+}
+
+FIRST_NAMES = ["Alice", "Bruno", "Camille", "David", "Emma", "Fabien", "Gaëlle", "Hugo", "Inès", "Julien",
+               "Karim", "Léa", "Mathieu", "Nora", "Olivier", "Pauline", "Quentin", "Sarah", "Thomas", "Yasmine"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy", "Moreau",
+              "Simon", "Laurent", "Lefebvre", "Michel", "Garcia", "David", "Bertrand", "Roux", "Vincent", "Fournier"]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises",
+             "Soylent", "Cyberdyne", "Tyrell", "Aperture", "Wonka", None, None]
+DOMAINS = ["example.com", "example.org", "example.net", "mail.example.fr"]
+WORDS = ("sécurité audit python réseau pentest conformité chiffrement automatisation données cloud "
+         "vulnérabilité supervision api incident formation rgpd infrastructure développement analyse").split()
+
+TECH_CATEGORIES = ["Language", "Framework", "Security", "Database", "DevOps", "Network"]
+PROJECT_CATEGORIES = ["Cybersécurité", "Python", "Réseau", "Web", "Automatisation"]
+PROJECT_LEVELS = ["Débutant", "Intermédiaire", "Avancé"]
+PROJECT_STATUSES = ["Terminé", "En cours", "Planifié"]
+RESOURCE_CATEGORIES = ["guide", "checklist", "template", "tool", "whitepaper"]
+RESOURCE_TYPES = ["pdf", "zip", "docx"]
+DIFFICULTIES = ["beginner", "intermediate", "advanced"]
+BLOG_CATEGORIES = ["Cybersécurité", "Python", "Tutoriel", "Actualité"]
+BOOKING_TIMES = ['09:00', '09:30', '10:00', '10:30', '11:00', '11:30',
+                 '14:00', '14:30', '15:00', '15:30', '16:00', '16:30', '17:00']
+
+QUOTE_STATUSES = (["draft", "sent", "accepted", "rejected"], [50, 25, 15, 10])
+BOOKING_STATUSES = (["confirmed", "completed", "cancelled"], [45, 45, 10])
+PENDING_STATUSES = (["pending", "approved", "rejected"], [30, 50, 20])
+
+
+class GenerationContext:
+    """Settings and the ids generated collections refer to"""
+
+    def __init__(self, seed: int, counts: Dict[str, int], days: int):
+        self.seed = seed
+        self.counts = counts
+        # Anchored on midnight so a seed yields the same documents all day
+        self.end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.end - timedelta(days=days)
+        self.ids: Dict[str, List[str]] = {}
+        self.services: List[Dict[str, str]] = []
+        # Emails shared by quotes and bookings so the funnel has conversions
+        self.customers = max(1, int(counts.get("quotes", 0) * 0.6))
+        self.download_counts: Counter = Counter()
+
+    def rng(self, collection: str, batch: int) -> random.Random:
+        """Independent stream per (collection, batch): same data whatever the parallelism"""
+        return random.Random(f"{self.seed}:{collection}:{batch}")
+
+    def moment(self, rng: random.Random) -> datetime:
+        """Random instant, denser in recent months and during office hours"""
+        span = (self.end - self.start).total_seconds()
+        day = self.start + timedelta(seconds=span * rng.random() ** 0.7)
+        hour = min(23, max(0, int(rng.gauss(14, 3))))
+        return day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+
+
+def new_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def person(rng: random.Random, customer: int = None) -> Dict[str, Any]:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    number = customer if customer is not None else rng.getrandbits(40)
+    return {
+        "name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}{number}@{rng.choice(DOMAINS)}",
+        "company": rng.choice(COMPANIES),
+        "phone": f"+33 6 {rng.randrange(10**8):08d}" if rng.random() < 0.6 else None,
+    }
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+# Generators: (context, rng, first index, count) -> documents
+
+def gen_technologies(ctx, rng, first, count):
+    return [{"id": new_id(rng), "name": f"Tech {first + i}", "category": rng.choice(TECH_CATEGORIES),
+             "icon": "Code", "created_at": ctx.moment(rng)} for i in range(count)]
+
+
+def gen_services(ctx, rng, first, count):
+    docs = []
+    for i in range(count):
+        created = ctx.moment(rng)
+        docs.append({"id": new_id(rng), "title": f"Service {first + i}", "icon": "Shield",
+                     "description": sentence(rng, 20), "features": [sentence(rng, 3) for _ in range(4)],
+                     "price": f"À partir de {rng.randrange(5, 50) * 100}€", "duration": f"{rng.randint(1, 10)} jours",
+                     "order_index": first + i, "created_at": created, "updated_at": created})
+    return docs
+
+
+def gen_projects(ctx, rng, first, count):
+    technologies = ["Python", "FastAPI", "Docker", "Nmap", "Wireshark", "React", "MongoDB", "Ansible", "Kali"]
+    docs = []
+    for i in range(count):
+        created = ctx.moment(rng)
+        docs.append({"id": new_id(rng), "title": f"Projet {first + i} - {rng.choice(WORDS)}",
+                     "category": rng.choice(PROJECT_CATEGORIES), "level": rng.choice(PROJECT_LEVELS),
+                     "description": sentence(rng, 40), "technologies": rng.sample(technologies, rng.randint(2, 5)),
+                     "features": [sentence(rng, 4) for _ in range(rng.randint(2, 6))],
+                     "status": rng.choice(PROJECT_STATUSES), "duration": f"{rng.randint(1, 12)} mois",
+                     "github": None, "demo": None, "order_index": first + i,
+                     "created_at": created, "updated_at": created})
+    return docs
+
+
+def gen_resources(ctx, rng, first, count):
+    docs = []
+    for i in range(count):
+        docs.append({"id": new_id(rng), "title": f"Ressource {first + i}", "description": sentence(rng, 25),
+                     "category": rng.choice(RESOURCE_CATEGORIES), "type": rng.choice(RESOURCE_TYPES),
+                     "size": f"{rng.uniform(0.2, 20):.1f} MB", "pages": rng.randint(2, 120),
+                     "downloads": 0, "rating": round(rng.uniform(3, 5), 1), "featured": rng.random() < 0.1,
+                     "tags": rng.sample(WORDS, 3), "difficulty": rng.choice(DIFFICULTIES),
+                     "file_path": None, "trending_weight": 0.0, "created_at": ctx.moment(rng)})
+    return docs
+
+
+def gen_testimonials(ctx, rng, first, count):
+    docs = []
+    for i in range(count):
+        created = ctx.moment(rng)
+        who = person(rng)
+        docs.append({"id": new_id(rng), "name": who["name"], "role": rng.choice(["CTO", "RSSI", "DSI", "CEO"]),
+                     "company": who["company"] or "Indépendant", "content": sentence(rng, 30),
+                     "rating": rng.choices([3, 4, 5], [1, 3, 6])[0], "order_index": first + i,
+                     "featured": rng.random() < 0.05, "created_at": created, "updated_at": created})
+    return docs
+
+
+def gen_blog_posts(ctx, rng, first, count):
+    docs = []
+    for i in range(count):
+        created = ctx.moment(rng)
+        published = rng.random() < 0.8
+        docs.append({"id": new_id(rng), "title": f"Article {first + i} : {sentence(rng, 5)}",
+                     "slug": f"article-{first + i}", "excerpt": sentence(rng, 25),
+                     "content": "\n\n".join(sentence(rng, 60) for _ in range(rng.randint(4, 12))),
+                     "category": rng.choice(BLOG_CATEGORIES), "tags": rng.sample(WORDS, 4),
+                     "featured_image": None, "published": published, "featured": rng.random() < 0.05,
+                     "views": int(rng.paretovariate(1.2) * 50), "reading_time": rng.randint(2, 20),
+                     "author": "Jean Yves", "created_at": created, "updated_at": created,
+                     "published_at": created + timedelta(hours=rng.randint(1, 72)) if published else None})
+    return docs
+
+
+def gen_quotes(ctx, rng, first, count):
+    tables = price_tables.tables
+    features = list(tables["features"])
+    configurations = [{
+        "project_type": rng.choice(list(tables["project_types"])),
+        "complexity": rng.choices(list(tables["complexity"]), [5, 4, 2])[0],
+        "timeline": rng.choices(list(tables["timeline"]), [2, 5, 2, 1])[0],
+        "features": rng.sample(features, rng.randint(0, 5)),
+        "maintenance": rng.random() < 0.4,
+        "training": rng.random() < 0.2,
+        "documentation": rng.random() < 0.3,
+    } for _ in range(count)]
+    prices = price_tables.estimate_many(configurations)
+    docs = []
+    for configuration, price in zip(configurations, prices):
+        created = ctx.moment(rng)
+        status = rng.choices(*QUOTE_STATUSES)[0]
+        updated = created if status == "draft" else created + timedelta(hours=rng.expovariate(1 / 72))
+        contact = person(rng, rng.randrange(ctx.customers))
+        contact["message"] = sentence(rng, 15) if rng.random() < 0.5 else None
+        docs.append({"id": new_id(rng), "quote_data": {**configuration, **price}, "contact_info": contact,
+                     "status": status, "created_at": created, "updated_at": min(updated, ctx.end)})
+    return docs
+
+
+def gen_bookings(ctx, rng, first, count):
+    docs = []
+    for _ in range(count):
+        created = ctx.moment(rng)
+        service = rng.choice(ctx.services) if ctx.services else {"id": "consulting", "title": "Consulting"}
+        # Half of the bookings come from customers who asked for a quote
+        contact = person(rng, rng.randrange(ctx.customers) if rng.random() < 0.5 else None)
+        contact["message"] = None
+        docs.append({"id": new_id(rng), "booking_data": {
+            "service_id": service["id"], "service_name": service["title"],
+            "date": (created + timedelta(days=rng.randint(1, 30))).date().isoformat(),
+            "time": rng.choice(BOOKING_TIMES), "duration": rng.choice(["30min", "1h", "2h"]),
+        }, "contact_info": contact, "status": rng.choices(*BOOKING_STATUSES)[0],
+            "created_at": created, "updated_at": created})
+    return docs
+
+
+def gen_resource_downloads(ctx, rng, first, count):
+    resource_ids = ctx.ids.get("resources") or ["unknown"]
+    # Zipf-like popularity: a few resources get most of the downloads
+    cum_weights = list(_cumulative(1 / (rank + 1) for rank in range(len(resource_ids))))
+    chosen = rng.choices(resource_ids, cum_weights=cum_weights, k=count)
+    ctx.download_counts.update(chosen)
+    return [{"id": new_id(rng), "resource_id": resource_id,
+             "user_email": person(rng)["email"] if rng.random() < 0.3 else None,
+             "ip_address": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+             "downloaded_at": ctx.moment(rng)} for resource_id in chosen]
+
+
+def gen_newsletter_subscriptions(ctx, rng, first, count):
+    # The running number makes every address unique, as the subscribe endpoint
+    # enforces (by lookup: there is no unique index on email)
+    return [{"id": new_id(rng), "email": f"reader{first + i}@{rng.choice(DOMAINS)}",
+             "status": "active" if rng.random() < 0.9 else "unsubscribed",
+             "subscribed_at": ctx.moment(rng)} for i in range(count)]
+
+
+def gen_pending_testimonials(ctx, rng, first, count):
+    docs = []
+    for _ in range(count):
+        submitted = ctx.moment(rng)
+        who = person(rng)
+        status = rng.choices(*PENDING_STATUSES)[0]
+        docs.append({"id": new_id(rng), "name": who["name"], "email": who["email"], "company": who["company"],
+                     "role": rng.choice(["CTO", "RSSI", "DSI", None]), "content": sentence(rng, 30),
+                     "rating": rng.choices([1, 2, 3, 4, 5], [1, 1, 2, 4, 6])[0],
+                     "service_used": rng.choice(ctx.services)["title"] if ctx.services else None,
+                     "status": status, "submitted_at": submitted,
+                     "reviewed_at": None if status == "pending" else submitted + timedelta(days=rng.randint(1, 10))})
+    return docs
+
+
+def _cumulative(values):
+    total = 0.0
+    for value in values:
+        total += value
+        yield total
+
+
+GENERATORS: Dict[str, Callable[..., List[Dict[str, Any]]]] = {
+    "technologies": gen_technologies,
+    "services": gen_services,
+    "projects": gen_projects,
+    "resources": gen_resources,
+    "testimonials": gen_testimonials,
+    "blog_posts": gen_blog_posts,
+    "quotes": gen_quotes,
+    "bookings": gen_bookings,
+    "resource_downloads": gen_resource_downloads,
+    "newsletter_subscriptions": gen_newsletter_subscriptions,
+    "pending_testimonials": gen_pending_testimonials,
+}
+
+
+async def generate_collection(ctx: GenerationContext, collection: str, batch_size: int,
+                              concurrency: int) -> Dict[str, Any]:
+    """Generate and insert one collection, keeping up to concurrency batches in flight"""
+    total = ctx.counts[collection]
+    slots = asyncio.Semaphore(concurrency)
+    pending = set()
+    keep_ids = collection in ("resources", "services")
+    start = time.perf_counter()
+
+    async def insert(documents):
+        try:
+            await db[collection].insert_many(documents, ordered=False)
+        finally:
+            slots.release()
+
+    for batch, first in enumerate(range(0, total, batch_size)):
+        documents = GENERATORS[collection](ctx, ctx.rng(collection, batch), first, min(batch_size, total - first))
+        if keep_ids:
+            ctx.ids.setdefault(collection, []).extend(d["id"] for d in documents)
+            if collection == "services":
+                ctx.services.extend({"id": d["id"], "title": d["title"]} for d in documents)
+        await slots.acquire()
+        task = asyncio.create_task(insert(documents))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        # Let inserts progress between CPU-bound generation steps
+        await asyncio.sleep(0)
+    if pending:
+        await asyncio.gather(*pending)
+
+    elapsed = time.perf_counter() - start
+    return {"collection": collection, "documents": total, "seconds": round(elapsed, 2),
+            "docs_per_second": round(total / elapsed) if elapsed else 0}
+
+
+async def update_derived(ctx: GenerationContext):
+    """Download counters, trending weights, rollup buckets and indexes"""
+    from indexes import ensure_indexes
+    from resource_trending import rebuild_trending_weights
+    from rollups import backfill
+
+    for resource_id, downloads in ctx.download_counts.items():
+        await db.resources.update_one({"id": resource_id}, {"$set": {"downloads": downloads}})
+    await rebuild_trending_weights(db)
+    await ensure_indexes(db)
+    await backfill(db)
+
+
+def parse_counts(scale: float, overrides: List[str]) -> Dict[str, int]:
+    counts = {name: max(1, math.ceil(count * scale)) for name, count in BASE_COUNTS.items()}
+    for override in overrides or []:
+        name, _, value = override.partition("=")
+        if name not in BASE_COUNTS:
+            raise SystemExit(f"Unknown collection: {name}")
+        counts[name] = int(float(value))
+    return {name: count for name, count in counts.items() if count > 0}
+
+
+async def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Generate reproducible synthetic data")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier applied to the base counts")
+    parser.add_argument("--count", action="append", metavar="COLLECTION=N",
+                        help="Exact count for one collection (repeatable, 0 skips it)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=730, help="History covered by the dates")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8, help="insert_many batches in flight")
+    parser.add_argument("--drop", action="store_true", help="Drop the generated collections first")
+    parser.add_argument("--skip-derived", action="store_true",
+                        help="Do not update download counters, trending weights, indexes and rollups")
+    args = parser.parse_args()
+
+    counts = parse_counts(args.scale, args.count)
+    ctx = GenerationContext(args.seed, counts, args.days)
+    print(f"🚀 Generating {sum(counts.values()):,} documents (seed {args.seed}) "
+          f"into {os.environ.get('DB_NAME', 'test_database')} [{os.environ.get('STORAGE_BACKEND', 'mongo')}]")
+
+    try:
+        if args.drop:
+            for collection in counts:
+                await db.drop_collection(collection)
+            print("🗑️  Dropped existing collections")
+
+        total_start = time.perf_counter()
+        for collection in GENERATORS:
+            if collection not in counts:
+                continue
+            report = await generate_collection(ctx, collection, args.batch_size, args.concurrency)
+            print(f"✅ {collection:<26}{report['documents']:>12,} docs {report['seconds']:>9.1f}s "
+                  f"{report['docs_per_second']:>10,} docs/s")
+
+        elapsed = time.perf_counter() - total_start
+        print(f"📊 {sum(counts.values()):,} documents in {elapsed:.1f}s "
+              f"({sum(counts.values()) / elapsed:,.0f} docs/s)")
+
+        if not args.skip_derived:
+            print("🔄 Updating derived data (counters, trending, indexes, rollups)...")
+            derived_start = time.perf_counter()
+            await update_derived(ctx)
+            print(f"✅ Derived data updated in {time.perf_counter() - derived_start:.1f}s")
+    finally:
+        close_storage()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
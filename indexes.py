@@ -0,0 +1,109 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+
+logger = logging.getLogger(__name__)
+
+# collection -> [(keys, options)]
+# Search indexes follow the equality-sort-range rule: the filtered field
+# first, then created_at which serves both the sort and the date range.
+APP_INDEXES: Dict[str, List[Tuple[List[Tuple[str, int]], Dict[str, Any]]]] = {
+    "quotes": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("created_at", DESCENDING)], {}),
+        # Also serves retention (status in draft/rejected, oldest first)
+        ([("status", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("contact_info.email", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("contact_info.company", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("quote_data.project_type", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "bookings": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("created_at", DESCENDING)], {}),
+        ([("status", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("contact_info.email", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("contact_info.company", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("booking_data.service_id", ASCENDING), ("created_at", DESCENDING)], {}),
+        # Availability lookup for a day
+        ([("booking_data.date", ASCENDING), ("status", ASCENDING)], {}),
+    ],
+    "resources": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("trending_weight", DESCENDING)], {}),
+    ],
+    # Event collections: retention and the rollup backfill scan them by date
+    "resource_downloads": [
+        ([("downloaded_at", DESCENDING)], {}),
+    ],
+    "pending_testimonials": [
+        # Moderation queue and retention of the rejected ones
+        ([("status", ASCENDING), ("submitted_at", DESCENDING)], {}),
+        ([("submitted_at", DESCENDING)], {}),
+    ],
+    "analytics_rollups": [
+        ([("metric", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)], {"unique": True}),
+    ],
+}
+
+
+async def ensure_indexes(db, collections: Optional[Iterable[str]] = None):
+    """Create the application indexes (no-op for the ones that exist).
+
+    Raises once every index has been tried if any could not be created
+    (e.g. duplicate ids in legacy data): the app must not report ready
+    without them. Connection errors are raised right away.
+    """
+    failures = []
+    for collection in collections or APP_INDEXES:
+        for keys, options in APP_INDEXES[collection]:
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                logger.error("Could not create index %s on %s: %s", keys, collection, e)
+                failures.append(f"{collection} {keys}")
+    if failures:
+        raise RuntimeError(f"Missing indexes: {', '.join(failures)}")
+
+
+async def explain_find(db, collection: str, filter: Dict[str, Any],
+                       sort: Optional[List[Tuple[str, int]]] = None,
+                       skip: int = 0, limit: int = 0) -> Dict[str, Any]:
+    """Summary of the winning plan MongoDB picks for a find"""
+    command = {"find": collection, "filter": filter}
+    if sort:
+        command["sort"] = dict(sort)
+    if skip:
+        command["skip"] = skip
+    if limit:
+        command["limit"] = limit
+    explain = await db.command("explain", command, verbosity="queryPlanner")
+    return summarize_plan(explain["queryPlanner"]["winningPlan"])
+
+
+def summarize_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Stages, indexes used and whether a collection scan or in-memory sort happens"""
+    stages: List[str] = []
+    indexes: List[str] = []
+
+    def walk(node: Dict[str, Any]):
+        # Slot-based engine plans wrap the classic tree in queryPlan
+        node = node.get("queryPlan", node)
+        stages.append(node.get("stage"))
+        if node.get("indexName"):
+            indexes.append(node["indexName"])
+        for child_key in ("inputStage", "outerStage", "innerStage"):
+            if child_key in node:
+                walk(node[child_key])
+        for child in node.get("inputStages", []):
+            walk(child)
+
+    walk(plan)
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "collection_scan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+    }
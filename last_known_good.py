@@ -0,0 +1,97 @@
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import functools
+import hashlib
+import logging
+import math
+import os
+import tempfile
+import time
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from circuit_breaker import Unavailable, guarded
+from metrics import stale_responses_total
+from shared_cache import PayloadResponse
+
+
+logger = logging.getLogger(__name__)
+
+LAST_KNOWN_GOOD_DIR = Path(os.environ.get("LAST_KNOWN_GOOD_DIR", Path(__file__).parent / "last_known_good"))
+
+
+class LastKnownGood:
+    """Last successfully built body of each public payload, kept on disk to survive restarts"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._entries: Dict[str, Tuple[float, bytes]] = {}  # key -> (saved at, body)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+    def save(self, key: str, body: bytes):
+        previous = self._entries.get(key)
+        self._entries[key] = (time.time(), body)
+        if previous is not None and previous[1] == body:
+            # Unchanged: only written again when it differs
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    handle.write(body)
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as exc:
+            # The in-memory copy still covers this process
+            logger.warning("Could not persist last known good %s: %s", key, exc)
+
+    def load(self, key: str) -> Optional[Tuple[float, bytes]]:
+        """(saved at, body), from memory or from a previous run"""
+        entry = self._entries.get(key)
+        if entry is None:
+            path = self._path(key)
+            try:
+                entry = (path.stat().st_mtime, path.read_bytes())
+            except FileNotFoundError:
+                return None
+            self._entries[key] = entry
+        return entry
+
+    def respond(self, key: str, error: Unavailable) -> PayloadResponse:
+        """Serve the stale payload flagged in the headers, or 503 when there has never been one"""
+        entry = self.load(key)
+        if entry is None:
+            logger.error("No last known good payload for %s: %s", key, error)
+            raise HTTPException(status_code=503, detail="Service temporarily unavailable",
+                                headers={"Retry-After": str(math.ceil(error.retry_after))})
+        saved_at, body = entry
+        logger.warning("Serving stale %s: %s", key, error)
+        stale_responses_total.inc(endpoint=key.partition("?")[0])
+        return PayloadResponse(body, headers={"X-Stale": "true", "Age": str(max(0, int(time.time() - saved_at)))})
+
+
+last_known_good = LastKnownGood(LAST_KNOWN_GOOD_DIR)
+
+
+def fallback(*collections: str):
+    """Guard a parametrized public read, serving the last good payload for the same arguments"""
+    def decorator(endpoint: Callable[..., Awaitable[Any]]):
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs):
+            key = endpoint.__name__ + "?" + "&".join(f"{name}={kwargs[name]}" for name in sorted(kwargs))
+            try:
+                payload = await guarded(collections, lambda: endpoint(**kwargs))
+            except Unavailable as exc:
+                return last_known_good.respond(key, exc)
+            body = JSONResponse(jsonable_encoder(payload)).body
+            last_known_good.save(key, body)
+            return PayloadResponse(body)
+        return wrapper
+    return decorator
@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+Banc de charge de l'API publique et admin : scénarios asyncio exécutés sur
+l'application ASGI en processus (backend mémoire par défaut) ou sur un
+serveur uvicorn local, résultats JSON comparables à une référence
+Usage: python load_benchmark.py [--url http://127.0.0.1:8001] [--scenario portfolio]
+                                [--duration 10] [--concurrency 16]
+                                [--baseline benchmarks/load_baseline.json] [--save-baseline]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT_DIR = Path(__file__).parent
+RESULTS_DIR = ROOT_DIR / "benchmarks" / "results"
+DEFAULT_BASELINE = ROOT_DIR / "benchmarks" / "load_baseline.json"
+
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin123"
+
+
+class Response:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    @property
+    def queries(self) -> Optional[int]:
+        """MongoDB commands reported by the Server-Timing header"""
+        timing = self.headers.get("server-timing", "")
+        for metric in timing.split(","):
+            if metric.strip().startswith("db;") and 'desc="' in metric:
+                return int(metric.split('desc="')[1].split()[0])
+        return None
+
+
+def _encode_body(json_body: Any, headers: Dict[str, str]) -> bytes:
+    if json_body is None:
+        return b""
+    headers.setdefault("content-type", "application/json")
+    return json.dumps(json_body).encode()
+
+
+class ASGIClient:
+    """Calls the ASGI application directly, without sockets"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, json_body: Any = None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        body = _encode_body(json_body, headers)
+        headers["content-length"] = str(len(body))
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"benchmark")] + [(k.encode(), v.encode()) for k, v in headers.items()],
+            "client": ("127.0.0.1", 50000),
+            "server": ("benchmark", 80),
+        }
+        done = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        status = 500
+        response_headers: Dict[str, str] = {}
+        chunks: List[bytes] = []
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.update((k.decode().lower(), v.decode()) for k, v in message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            done.set()
+        return Response(status, response_headers, b"".join(chunks))
+
+    async def close(self):
+        pass
+
+
+@asynccontextmanager
+async def asgi_lifespan(app):
+    """Run the application's startup and shutdown handlers"""
+    inbox: asyncio.Queue = asyncio.Queue()
+    outbox: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, inbox.get, outbox.put))
+    await inbox.put({"type": "lifespan.startup"})
+    message = await outbox.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"Application startup failed: {message.get('message')}")
+    try:
+        yield
+    finally:
+        await inbox.put({"type": "lifespan.shutdown"})
+        await outbox.get()
+        await task
+
+
+class HTTPClient:
+    """Minimal HTTP/1.1 keep-alive client over asyncio streams"""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def request(self, method: str, path: str, json_body: Any = None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        body = _encode_body(json_body, headers)
+        headers.update({"host": f"{self.host}:{self.port}", "content-length": str(len(body)),
+                        "connection": "keep-alive"})
+        head = f"{method} {self.prefix}{path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+
+        reader, writer = self._idle.pop() if self._idle else await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(head.encode() + b"\r\n" + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError("Connection closed by server")
+            status = int(status_line.split()[1])
+            response_headers: Dict[str, str] = {}
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+            payload = await self._read_body(reader, method, status, response_headers)
+        except BaseException:
+            writer.close()
+            raise
+        if response_headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        return Response(status, response_headers, payload)
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, method: str, status: int, headers: Dict[str, str]) -> bytes:
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return b""
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    return b"".join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"]))
+        headers["connection"] = "close"
+        return await reader.read()
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+# Scenarios
+
+class ScenarioContext:
+    """Client, credentials and fixtures shared by the workers of a run"""
+
+    def __init__(self, client, seed: int = 42):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.token: Optional[str] = None
+        self.resource_ids: List[str] = []
+        self.streamable_ids: List[str] = []  # resources with a file behind GET .../download
+        self.service: Dict[str, Any] = {}
+        self.samples: List[Tuple[str, int, float, Optional[int]]] = []  # label, status, seconds, queries
+        self.extra: Dict[str, Any] = {}
+
+    @property
+    def auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def call(self, label: str, method: str, path: str, json_body: Any = None,
+                   headers: Optional[Dict[str, str]] = None) -> Optional[Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, json_body, headers)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            self.samples.append((label, 0, time.perf_counter() - start, None))
+            logging.debug("%s %s failed: %s", method, path, e)
+            return None
+        self.samples.append((label, response.status, time.perf_counter() - start, response.queries))
+        return response
+
+
+PORTFOLIO_PAGES = [
+    "/api/public/personal", "/api/public/skills", "/api/public/technologies",
+    "/api/public/projects", "/api/public/services", "/api/public/testimonials",
+    "/api/public/statistics", "/api/public/social-links", "/api/public/process-steps",
+    "/api/resources",
+]
+BOOKING_TIMES = ["09:00", "09:30", "10:00", "10:30", "11:00", "14:00", "14:30", "15:00"]
+
+
+async def portfolio_page(ctx: ScenarioContext):
+    """Every request the home page fires, concurrently"""
+    await asyncio.gather(*(ctx.call(f"GET {path}", "GET", path) for path in PORTFOLIO_PAGES))
+
+
+async def blog_browsing(ctx: ScenarioContext):
+    """Blog list, then the resource library with a filter and a sort"""
+    await ctx.call("GET /api/public/blog", "GET", "/api/public/blog")
+    # Categories seeded by /api/resources/init
+    category = ctx.rng.choice(["Guide", "Checklist", "Scripts", "Template"])
+    await ctx.call("GET /api/resources/facets", "GET", f"/api/resources/facets?category={category}")
+    await ctx.call("GET /api/resources/trending", "GET", "/api/resources/trending")
+
+
+async def download_burst(ctx: ScenarioContext):
+    """Several downloads of popular resources at once (recorded and streamed)"""
+    ids = [ctx.rng.choice(ctx.resource_ids) for _ in range(4)]
+    streamed = [ctx.rng.choice(ctx.streamable_ids) for _ in range(4)] if ctx.streamable_ids else []
+    await asyncio.gather(*(
+        ctx.call("POST /api/resources/{id}/download", "POST", f"/api/resources/{rid}/download") for rid in ids
+    ), *(
+        ctx.call("GET /api/resources/{id}/download", "GET", f"/api/resources/{rid}/download") for rid in streamed
+    ))
+
+
+async def booking_race(ctx: ScenarioContext):
+    """Check availability then book; many workers compete for few slots"""
+    day = (date.today() + timedelta(days=ctx.rng.randint(1, 3))).isoformat()
+    response = await ctx.call("GET /api/bookings/availability/{date}", "GET", f"/api/bookings/availability/{day}")
+    if response is None or response.status != 200:
+        return
+    slots = [t for t in response.json()["available_slots"] if t in BOOKING_TIMES] or BOOKING_TIMES
+    slot = ctx.rng.choice(slots)
+    booking = {
+        "booking_data": {
+            "service_id": ctx.service.get("id", "consulting"),
+            "service_name": ctx.service.get("title", "Consulting"),
+            "date": day, "time": slot, "duration": "1h",
+        },
+        "contact_info": {"name": "Load Test", "email": f"booker{ctx.rng.randint(0, 10**6)}@example.com"},
+    }
+    response = await ctx.call("POST /api/bookings", "POST", "/api/bookings", booking)
+    if response is not None and response.status < 300:
+        booked = ctx.extra.setdefault("_booked", {})
+        booked[(day, slot)] = booked.get((day, slot), 0) + 1
+
+
+async def quote_submission(ctx: ScenarioContext):
+    """Live estimate while configuring, then the quote itself"""
+    configuration = {
+        "project_type": ctx.rng.choice(["security-audit", "pentest", "web-app", "python-dev", "automation"]),
+        "complexity": ctx.rng.choice(["simple", "medium", "complex"]),
+        "timeline": ctx.rng.choice(["flexible", "normal", "fast", "urgent"]),
+        "features": ctx.rng.sample(["authentication", "api", "database", "reporting", "monitoring"], 2),
+        "maintenance": ctx.rng.random() < 0.5,
+    }
+    await ctx.call("POST /api/quotes/estimate", "POST", "/api/quotes/estimate", configuration)
+    await ctx.call("POST /api/quotes", "POST", "/api/quotes", {
+        "quote_data": configuration,
+        "contact_info": {"name": "Load Test", "email": f"client{ctx.rng.randint(0, 10**5)}@example.com",
+                         "company": ctx.rng.choice(["Acme", "Globex", "Initech", "Umbrella"])},
+    })
+
+
+async def admin_dashboard(ctx: ScenarioContext):
+    """Forced dashboard refresh plus the time series panel"""
+    await ctx.call("GET /api/analytics/dashboard", "GET", "/api/analytics/dashboard?refresh=true", headers=ctx.auth)
+    await ctx.call("GET /api/analytics/timeseries", "GET",
+                   "/api/analytics/timeseries?metric=quotes&metric=bookings&granularity=day", headers=ctx.auth)
+
+
+async def login_burst(ctx: ScenarioContext):
+    """Admin logins (bcrypt on every request)"""
+    await ctx.call("POST /api/auth/login", "POST", "/api/auth/login",
+                   {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+
+
+SCENARIOS: Dict[str, Callable[[ScenarioContext], Awaitable[None]]] = {
+    "portfolio": portfolio_page,
+    "blog": blog_browsing,
+    "downloads": download_burst,
+    "booking_race": booking_race,
+    "quotes": quote_submission,
+    "admin_dashboard": admin_dashboard,
+    "login": login_burst,
+}
+
+
+# Setup
+
+async def prepare(ctx: ScenarioContext, files_dir: Optional[Path] = None,
+                  projects: int = 24, posts: int = 40, file_size: int = 512 * 1024):
+    """Create the admin, log in and seed content through the API if the site is empty.
+
+    With files_dir (the server's RESOURCES_DIR) every resource also gets a
+    file so GET downloads are streamed instead of answered with 404.
+    """
+    from migrate_mock_data import MOCK_DATA
+
+    await ctx.call("setup", "POST", "/api/auth/init-admin")
+    response = await ctx.call("setup", "POST", "/api/auth/login",
+                              {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    if response is None or response.status != 200:
+        raise RuntimeError("Admin login failed: start the server with RATE_LIMIT_ENABLED=false and a default admin")
+    ctx.token = response.json()["access_token"]
+
+    projects_response = await ctx.call("setup", "GET", "/api/public/projects")
+    if projects_response is not None and not projects_response.json():
+        seed = [("/api/admin/personal", MOCK_DATA["personal"])]
+        seed += [("/api/admin/skills", {**skill, "category_key": key}) for key, skill in MOCK_DATA["skills"].items()]
+        for path, key in [("/api/admin/technologies", "technologies"), ("/api/admin/services", "services"),
+                          ("/api/admin/testimonials", "testimonials"), ("/api/admin/statistics", "stats"),
+                          ("/api/admin/social-links", "social"), ("/api/admin/process-steps", "process")]:
+            seed += [(path, item) for item in MOCK_DATA[key]]
+        seed += [("/api/admin/projects", {
+            "title": f"Projet {i}", "category": ctx.rng.choice(["Cybersécurité", "Python", "Réseau"]),
+            "level": ctx.rng.choice(["Débutant", "Intermédiaire", "Avancé"]),
+            "description": "Projet de démonstration pour les tests de charge.",
+            "technologies": ctx.rng.sample(["Python", "FastAPI", "Docker", "Nmap", "Wireshark", "React"], 3),
+            "features": ["Analyse", "Rapport"], "status": ctx.rng.choice(["Terminé", "En cours"]),
+            "duration": "3 mois", "order_index": i,
+        }) for i in range(projects)]
+        seed += [("/api/admin/blog", {
+            "title": f"Article {i}", "slug": f"article-{i}", "excerpt": "Résumé de l'article.",
+            "content": "Contenu de l'article. " * 200, "category": ctx.rng.choice(["Sécurité", "Python"]),
+            "tags": ["benchmark"], "published": i % 5 != 0,
+        }) for i in range(posts)]
+        for path, payload in seed:
+            await ctx.call("setup", "POST", path, payload, headers=ctx.auth)
+
+    await ctx.call("setup", "POST", "/api/resources/init")
+    resources = await ctx.call("setup", "GET", "/api/resources")
+    ctx.resource_ids = [r["id"] for r in resources.json()] if resources is not None else []
+    if files_dir is not None:
+        for resource_id in ctx.resource_ids:
+            (files_dir / f"{resource_id}.pdf").write_bytes(os.urandom(file_size))
+            await ctx.call("setup", "PUT", f"/api/admin/resources/{resource_id}",
+                           {"file_path": f"{resource_id}.pdf"}, headers=ctx.auth)
+    for resource_id in ctx.resource_ids:
+        probe = await ctx.call("setup", "HEAD", f"/api/resources/{resource_id}/download")
+        if probe is not None and probe.status == 200:
+            ctx.streamable_ids.append(resource_id)
+    services = await ctx.call("setup", "GET", "/api/public/services")
+    if services is not None and services.json():
+        ctx.service = services.json()[0]
+    ctx.samples.clear()
+
+
+# Run and report
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: List[Tuple[str, int, float, Optional[int]]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(s[2] * 1000 for s in samples)
+    queries = [s[3] for s in samples if s[3] is not None]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s[1] == 0 or s[1] >= 400),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+async def run_scenario(ctx: ScenarioContext, name: str, concurrency: int, duration: float) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    ctx.samples = []
+    ctx.extra = {}
+    iterations = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal iterations
+        while time.perf_counter() < deadline:
+            await scenario(ctx)
+            iterations += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = {"scenario": name, "concurrency": concurrency, "duration_s": round(elapsed, 2),
+              "iterations": iterations, **summarize(ctx.samples, elapsed), "endpoints": {}}
+    for label in sorted({s[0] for s in ctx.samples}):
+        endpoint_samples = [s for s in ctx.samples if s[0] == label]
+        stats = summarize(endpoint_samples, elapsed)
+        result["endpoints"][label] = {"requests": stats["requests"], "errors": stats["errors"],
+                                      **stats["latency_ms"], "queries_per_request": stats["queries_per_request"]}
+    booked = ctx.extra.pop("_booked", None)
+    if booked is not None:
+        result["double_bookings"] = sum(count - 1 for count in booked.values() if count > 1)
+    return result
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regressions: p95 latency up or throughput down by more than threshold"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if not reference:
+            continue
+        p95, ref_p95 = current["latency_ms"]["p95"], reference["latency_ms"]["p95"]
+        if ref_p95 and p95 > ref_p95 * (1 + threshold):
+            regressions.append(f"{name}: p95 {ref_p95:.1f} -> {p95:.1f} ms")
+        rps, ref_rps = current["throughput_rps"], reference["throughput_rps"]
+        if ref_rps and rps < ref_rps * (1 - threshold):
+            regressions.append(f"{name}: throughput {ref_rps:.1f} -> {rps:.1f} req/s")
+    return regressions
+
+
+def print_table(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    header = f"{'scenario':<16}{'req':>8}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q/req':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results["scenarios"].items():
+        latency = r["latency_ms"]
+        qpr = "-" if r["queries_per_request"] is None else f"{r['queries_per_request']:.1f}"
+        line = (f"{name:<16}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps']:>10.1f}"
+                f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}{qpr:>8}")
+        reference = (baseline or {}).get("scenarios", {}).get(name)
+        if reference and reference["latency_ms"]["p95"]:
+            delta = latency["p95"] / reference["latency_ms"]["p95"] - 1
+            line += f"   p95 {delta:+.0%} vs baseline"
+        print(line)
+
+
+async def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Load-test the public and admin API")
+    parser.add_argument("--url", help="Base URL of a running server (default: run the app in-process)")
+    parser.add_argument("--storage", choices=["memory", "mongo"], default="memory",
+                        help="Storage backend for the in-process app")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual users")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/load-<time>.json)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    files_dir = None
+    if args.url:
+        client = HTTPClient(args.url)
+        lifespan = None
+    else:
+        # Settings are read at import time
+        files_dir = Path(tempfile.mkdtemp(prefix="load-benchmark-"))
+        os.environ.setdefault("RESOURCES_DIR", str(files_dir))
+        os.environ.setdefault("STORAGE_BACKEND", args.storage)
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+        os.environ.setdefault("PRICING_TABLES_PATH", str(ROOT_DIR / "pricing_tables.example.json"))
+        sys.path.insert(0, str(ROOT_DIR))
+        from server import app
+        logging.getLogger("query_budget").setLevel(logging.ERROR)
+        logging.getLogger("rate_limit").setLevel(logging.ERROR)
+        client = ASGIClient(app)
+        lifespan = asgi_lifespan(app)
+
+    results = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "target": args.url or f"in-process ({os.environ.get('STORAGE_BACKEND')})",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+        },
+        "scenarios": {},
+    }
+    try:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        ctx = ScenarioContext(client, args.seed)
+        print("🔄 Preparing fixtures...")
+        await prepare(ctx, files_dir if files_dir and os.environ["RESOURCES_DIR"] == str(files_dir) else None)
+        for name in args.scenario or list(SCENARIOS):
+            print(f"🔄 Running {name} ({args.concurrency} users, {args.duration:.0f}s)...")
+            results["scenarios"][name] = await run_scenario(ctx, name, args.concurrency, args.duration)
+    finally:
+        await client.close()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        if files_dir is not None:
+            shutil.rmtree(files_dir, ignore_errors=True)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    print()
+    print_table(results, baseline)
+
+    output = args.output or RESULTS_DIR / f"load-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\n✅ Results written to {output}")
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"✅ Baseline updated: {args.baseline}")
+    elif baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,997 @@
+"""In-memory implementation of the subset of the Motor API the app uses.
+
+Documents live in per-collection dicts in insertion (natural) order, with
+hash indexes on the first key of every created index for equality and
+``$in`` lookups. Documents are copied on the way in and out, like a real
+round trip, so callers can mutate what they get back.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import functools
+import itertools
+import math
+import re
+import time
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+
+_MISSING = object()
+
+# Callables (collection, command, seconds) told about every operation: the
+# in-memory counterpart of pymongo's command listeners
+command_listeners: List[Callable[[str, str, float], None]] = []
+
+
+def _notify(collection: str, command: str, start: float):
+    if command_listeners:
+        elapsed = time.perf_counter() - start
+        for listener in command_listeners:
+            listener(collection, command, elapsed)
+
+
+# Callables receiving the MongoDB command document equivalent to each read,
+# update and delete (query shape recording, see query_shapes)
+command_recorders: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def _record(command: Dict[str, Any]):
+    for recorder in command_recorders:
+        recorder(command)
+
+
+def _command(name: str):
+    """Report a collection method to the command listeners"""
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                _notify(self.name, name, start)
+        return wrapper
+    return decorator
+
+
+class _Result:
+    """Stand-in for pymongo's *Result classes (same attribute names)"""
+
+    def __init__(self, **fields):
+        self.acknowledged = True
+        self.__dict__.update(fields)
+
+
+def _clone(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+# Paths and values
+
+def _get_path(doc: Any, path: str) -> Any:
+    """Value at a dotted path; arrays along the way yield lists of values"""
+    for part in path.split("."):
+        if isinstance(doc, dict):
+            doc = doc.get(part, _MISSING)
+        elif isinstance(doc, list):
+            if part.isdigit():
+                index = int(part)
+                doc = doc[index] if index < len(doc) else _MISSING
+            else:
+                values = [_get_path(item, part) for item in doc if isinstance(item, dict)]
+                doc = [v for v in values if v is not _MISSING] or _MISSING
+        else:
+            return _MISSING
+        if doc is _MISSING:
+            return _MISSING
+    return doc
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: Dict[str, Any], path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+# BSON comparison order, coarsely: null < numbers < strings < objects < arrays < ... < dates
+def _type_rank(value: Any) -> int:
+    if value is None or value is _MISSING:
+        return 0
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    rank = _type_rank(value)
+    if rank in (0, 3, 4, 10):
+        return rank, str(value) if rank else 0
+    return rank, value
+
+
+def _compare(a: Any, b: Any) -> Optional[int]:
+    """-1/0/1, or None when the types are not comparable (no match in Mongo)"""
+    if _type_rank(a) != _type_rank(b):
+        return None
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        return None
+
+
+_BSON_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "date": lambda v: isinstance(v, datetime),
+    "string": lambda v: isinstance(v, str),
+    "bool": lambda v: isinstance(v, bool),
+    "int": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "long": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "double": lambda v: isinstance(v, float),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+    "objectId": lambda v: isinstance(v, ObjectId),
+}
+
+
+# Query matching
+
+def _candidates(value: Any) -> List[Any]:
+    """A field matches if the value itself or any array element matches"""
+    if isinstance(value, list):
+        return [value, *value]
+    return [value]
+
+
+def _match_operator(value: Any, op: str, arg: Any, spec: Dict[str, Any]) -> bool:
+    if op == "$eq":
+        return _match_equal(value, arg)
+    if op == "$ne":
+        return not _match_equal(value, arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        if value is _MISSING:
+            return False
+        for candidate in _candidates(value):
+            result = _compare(candidate, arg)
+            if result is None:
+                continue
+            if (op == "$gt" and result > 0) or (op == "$gte" and result >= 0) \
+                    or (op == "$lt" and result < 0) or (op == "$lte" and result <= 0):
+                return True
+        return False
+    if op == "$in":
+        return any(_match_equal(value, item) for item in arg)
+    if op == "$nin":
+        return not any(_match_equal(value, item) for item in arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$regex":
+        flags = 0
+        for flag in spec.get("$options", ""):
+            flags |= {"i": re.I, "m": re.M, "s": re.S, "x": re.X}.get(flag, 0)
+        pattern = arg if isinstance(arg, re.Pattern) else re.compile(arg, flags)
+        return any(isinstance(c, str) and pattern.search(c) for c in _candidates(value))
+    if op == "$options":
+        return True
+    if op == "$type":
+        types = arg if isinstance(arg, list) else [arg]
+        return value is not _MISSING and any(
+            _BSON_TYPES[t](c) for t in types for c in _candidates(value))
+    if op == "$not":
+        return not _match_field(value, arg)
+    if op == "$size":
+        return isinstance(value, list) and len(value) == arg
+    if op == "$all":
+        return isinstance(value, list) and all(_match_equal(value, item) for item in arg)
+    if op == "$elemMatch":
+        return isinstance(value, list) and any(
+            isinstance(item, dict) and matches(item, arg) for item in value)
+    raise OperationFailure(f"unknown operator: {op}")
+
+
+def _match_equal(value: Any, expected: Any) -> bool:
+    if isinstance(expected, re.Pattern):
+        return any(isinstance(c, str) and expected.search(c) for c in _candidates(value))
+    if value is _MISSING:
+        return expected is None
+    return any(c == expected for c in _candidates(value))
+
+
+def _match_field(value: Any, spec: Any) -> bool:
+    if isinstance(spec, dict) and spec and all(key.startswith("$") for key in spec):
+        return all(_match_operator(value, op, arg, spec) for op, arg in spec.items())
+    return _match_equal(value, spec)
+
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Whether a document satisfies a MongoDB query filter"""
+    for key, spec in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in spec):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in spec):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, sub) for sub in spec):
+                return False
+        elif key == "$expr":
+            if not _evaluate(spec, doc):
+                return False
+        elif not _match_field(_get_path(doc, key), spec):
+            return False
+    return True
+
+
+# Projection and updates
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return doc
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(v in (0, False) for v in fields.values()):
+        result = doc
+        for path in fields:
+            _unset_path(result, path)
+    elif fields:
+        result = {}
+        for path, spec in fields.items():
+            if spec in (1, True):
+                value = _get_path(doc, path)
+            else:
+                value = _evaluate(spec, doc)
+            if value is not _MISSING:
+                _set_path(result, path, value)
+        if include_id and "_id" in doc:
+            result = {"_id": doc["_id"], **result}
+    else:
+        result = doc
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False):
+    if not any(key.startswith("$") for key in update):
+        # Replacement document
+        _id = doc.get("_id")
+        doc.clear()
+        doc.update(_clone(update))
+        if _id is not None:
+            doc.setdefault("_id", _id)
+        return
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            current = _get_path(doc, path)
+            if op == "$set":
+                _set_path(doc, path, _clone(arg))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(doc, path, _clone(arg))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op == "$mul":
+                _set_path(doc, path, (0 if current is _MISSING else current) * arg)
+            elif op == "$max":
+                if current is _MISSING or _compare(arg, current) == 1:
+                    _set_path(doc, path, arg)
+            elif op == "$min":
+                if current is _MISSING or _compare(arg, current) == -1:
+                    _set_path(doc, path, arg)
+            elif op == "$push":
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                _set_path(doc, path, (current if isinstance(current, list) else []) + _clone(items))
+            elif op == "$addToSet":
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                values = current if isinstance(current, list) else []
+                _set_path(doc, path, values + [_clone(i) for i in items if i not in values])
+            elif op == "$pull":
+                if isinstance(current, list):
+                    _set_path(doc, path, [i for i in current if not _match_field(i, arg)])
+            elif op == "$currentDate":
+                _set_path(doc, path, datetime.utcnow())
+            else:
+                raise OperationFailure(f"Unknown modifier: {op}")
+
+
+def _upsert_seed(query: Dict[str, Any]) -> Dict[str, Any]:
+    """Equality parts of a filter, which an upserted document starts from"""
+    doc: Dict[str, Any] = {}
+    for key, spec in query.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(spec, dict) and spec and all(k.startswith("$") for k in spec):
+            if "$eq" in spec:
+                _set_path(doc, key, _clone(spec["$eq"]))
+            continue
+        _set_path(doc, key, _clone(spec))
+    return doc
+
+
+# Aggregation expressions
+
+def _evaluate(expr: Any, doc: Dict[str, Any]) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get_path(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, list):
+        return [_evaluate(e, doc) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        return {k: _evaluate(v, doc) for k, v in expr.items()}
+
+    op, arg = next(iter(expr.items()))
+    if op == "$literal":
+        return arg
+    if op == "$dateTrunc":
+        return _date_trunc(_evaluate(arg["date"], doc), arg["unit"],
+                           arg.get("binSize", 1), arg.get("startOfWeek", "sunday"))
+    args = _evaluate(arg, doc)
+    if not isinstance(args, list):
+        args = [args]
+    if op == "$toLower":
+        return (args[0] or "").lower() if args[0] is not None else ""
+    if op == "$toUpper":
+        return (args[0] or "").upper() if args[0] is not None else ""
+    if op == "$ifNull":
+        return next((a for a in args if a is not None), args[-1])
+    if op in ("$add", "$multiply", "$subtract", "$divide", "$mod"):
+        if any(a is None for a in args):
+            return None
+        if op == "$add":
+            dates = [a for a in args if isinstance(a, datetime)]
+            total = sum(a for a in args if not isinstance(a, datetime))
+            return dates[0] + timedelta(milliseconds=total) if dates else total
+        if op == "$multiply":
+            return math.prod(args)
+        if op == "$subtract":
+            a, b = args
+            if isinstance(a, datetime) and isinstance(b, datetime):
+                return (a - b) / timedelta(milliseconds=1)
+            if isinstance(a, datetime):
+                return a - timedelta(milliseconds=b)
+            return a - b
+        if op == "$divide":
+            return args[0] / args[1]
+        return args[0] % args[1]
+    if op == "$exp":
+        return None if args[0] is None else math.exp(args[0])
+    if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        result = _compare(args[0], args[1])
+        if result is None:
+            result = (_type_rank(args[0]) > _type_rank(args[1])) - (_type_rank(args[0]) < _type_rank(args[1]))
+        return {"$eq": result == 0, "$ne": result != 0, "$gt": result > 0,
+                "$gte": result >= 0, "$lt": result < 0, "$lte": result <= 0}[op]
+    if op == "$and":
+        return all(args)
+    if op == "$or":
+        return any(args)
+    if op == "$not":
+        return not args[0]
+    if op == "$cond":
+        if isinstance(arg, dict):
+            args = [_evaluate(arg["if"], doc), _evaluate(arg["then"], doc), _evaluate(arg["else"], doc)]
+        return args[1] if args[0] else args[2]
+    if op == "$in":
+        return args[0] in (args[1] or [])
+    if op == "$size":
+        return len(args[0] or [])
+    if op == "$concat":
+        return None if any(a is None for a in args) else "".join(args)
+    raise OperationFailure(f"Unrecognized expression '{op}'")
+
+
+def _date_trunc(value: Optional[datetime], unit: str, bin_size: int = 1,
+                start_of_week: str = "sunday") -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return None
+    if unit == "year":
+        return datetime(value.year, 1, 1)
+    if unit == "quarter":
+        return datetime(value.year, 3 * ((value.month - 1) // 3) + 1, 1)
+    if unit == "month":
+        return datetime(value.year, value.month, 1)
+    if unit == "week":
+        days = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+        first = days.index(start_of_week.lower()[:3])
+        day = datetime(value.year, value.month, value.day)
+        return day - timedelta(days=(day.weekday() - first) % 7)
+    if unit == "day":
+        return datetime(value.year, value.month, value.day)
+    if unit == "hour":
+        return datetime(value.year, value.month, value.day, value.hour)
+    if unit == "minute":
+        return datetime(value.year, value.month, value.day, value.hour, value.minute)
+    raise OperationFailure(f"Unsupported $dateTrunc unit: {unit}")
+
+
+class _Accumulator:
+    def __init__(self, op: str, expr: Any):
+        self.op = op
+        self.expr = expr
+        self.value: Any = {"$sum": 0, "$push": [], "$addToSet": []}.get(op)
+        self.count = 0
+        self.seen = False
+
+    def add(self, doc: Dict[str, Any]):
+        value = _evaluate(self.expr, doc)
+        op = self.op
+        if op == "$sum":
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.value += value
+        elif op == "$avg":
+            if isinstance(value, (int, float)):
+                self.value = (self.value or 0) + value
+                self.count += 1
+        elif op in ("$max", "$min"):
+            if value is not None and (self.value is None or (
+                    _sort_key(value) > _sort_key(self.value) if op == "$max" else _sort_key(value) < _sort_key(self.value))):
+                self.value = value
+        elif op == "$first":
+            if not self.seen:
+                self.value = value
+        elif op == "$last":
+            self.value = value
+        elif op == "$push":
+            self.value.append(value)
+        elif op == "$addToSet":
+            if value not in self.value:
+                self.value.append(value)
+        else:
+            raise OperationFailure(f"unknown group operator '{op}'")
+        self.seen = True
+
+    def result(self) -> Any:
+        if self.op == "$avg":
+            return self.value / self.count if self.count else None
+        return self.value
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple((k, _hashable(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def _sort_documents(documents: List[Dict[str, Any]], spec: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    # Stable sorts from the last key to the first
+    for field, direction in reversed(spec):
+        if field == "$natural":
+            if direction == -1:
+                documents = documents[::-1]
+            continue
+        documents = sorted(documents, key=lambda d: _sort_key(_get_path(d, field)), reverse=direction == -1)
+    return documents
+
+
+def run_pipeline(documents: Iterable[Dict[str, Any]], pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply aggregation stages to (already copied) documents"""
+    docs = list(documents)
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [d for d in docs if matches(d, spec)]
+        elif name in ("$project", "$addFields", "$set"):
+            if name == "$project":
+                docs = [_project(d, spec) for d in docs]
+            else:
+                for d in docs:
+                    for path, expr in [(p, _evaluate(e, d)) for p, e in spec.items()]:
+                        _set_path(d, path, expr)
+        elif name == "$unset":
+            for d in docs:
+                for path in ([spec] if isinstance(spec, str) else spec):
+                    _unset_path(d, path)
+        elif name == "$group":
+            groups: Dict[Any, Tuple[Any, Dict[str, _Accumulator]]] = {}
+            for d in docs:
+                key = _evaluate(spec["_id"], d)
+                entry = groups.get(_hashable(key))
+                if entry is None:
+                    entry = groups[_hashable(key)] = (key, {
+                        field: _Accumulator(*next(iter(acc.items())))
+                        for field, acc in spec.items() if field != "_id"
+                    })
+                for accumulator in entry[1].values():
+                    accumulator.add(d)
+            docs = [{"_id": key, **{f: a.result() for f, a in accs.items()}} for key, accs in groups.values()]
+        elif name == "$sort":
+            docs = _sort_documents(docs, list(spec.items()))
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        elif name == "$unwind":
+            path = (spec if isinstance(spec, str) else spec["path"])[1:]
+            keep_empty = isinstance(spec, dict) and spec.get("preserveNullAndEmptyArrays")
+            unwound = []
+            for d in docs:
+                value = _get_path(d, path)
+                if isinstance(value, list) and value:
+                    for item in value:
+                        copy = _clone(d)
+                        _set_path(copy, path, item)
+                        unwound.append(copy)
+                elif keep_empty or (value is not _MISSING and value is not None and not isinstance(value, list)):
+                    unwound.append(d)
+            docs = unwound
+        else:
+            raise OperationFailure(f"Unrecognized pipeline stage name: '{name}'")
+    return docs
+
+
+# Cursors, collections, database
+
+class MemoryCursor:
+    """find()/aggregate() cursor: chain sort/skip/limit, then to_list or async for"""
+
+    def __init__(self, produce: Callable[["MemoryCursor"], List[Dict[str, Any]]]):
+        self._produce = produce
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[Iterator[Dict[str, Any]]] = None
+
+    def sort(self, key_or_list, direction: Optional[int] = None) -> "MemoryCursor":
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, skip: int) -> "MemoryCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "MemoryCursor":
+        self._limit = limit
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        if self._results is None:
+            self._results = iter(self._produce(self))
+        return list(itertools.islice(self._results, length or None))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        if self._results is None:
+            self._results = iter(self._produce(self))
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class _HashIndex:
+    def __init__(self, name: str, keys: List[Tuple[str, int]], unique: bool, options: Dict[str, Any]):
+        self.name = name
+        self.keys = keys
+        self.field = keys[0][0]
+        self.unique = unique
+        self.options = options
+        self.entries: Dict[Any, Set[int]] = {}  # first key value -> document slots
+
+    def values(self, doc: Dict[str, Any]) -> List[Any]:
+        value = _get_path(doc, self.field)
+        if value is _MISSING:
+            return [None]
+        return [_hashable(v) for v in _candidates(value)]
+
+    def unique_key(self, doc: Dict[str, Any]) -> Tuple:
+        return tuple(_hashable(None if (v := _get_path(doc, f)) is _MISSING else v) for f, _ in self.keys)
+
+    def add(self, slot: int, doc: Dict[str, Any]):
+        for value in self.values(doc):
+            self.entries.setdefault(value, set()).add(slot)
+
+    def discard(self, slot: int, doc: Dict[str, Any]):
+        for value in self.values(doc):
+            slots = self.entries.get(value)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self.entries[value]
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: Dict[int, Dict[str, Any]] = {}  # slot -> document, natural order
+        self._slots = itertools.count()
+        self._indexes: Dict[str, _HashIndex] = {}
+        self._options: Dict[str, Any] = {}
+        self._create_index([("_id", 1)], "_id_", unique=True)
+
+    def __getattr__(self, name: str) -> "MemoryCollection":
+        # db.collection.sub works like Motor (dotted collection names)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.database[f"{self.name}.{name}"]
+
+    # Indexes
+
+    def _create_index(self, keys: List[Tuple[str, int]], name: str, unique: bool = False, **options) -> str:
+        if name in self._indexes:
+            return name
+        index = _HashIndex(name, keys, unique, options)
+        if unique:
+            seen = set()
+            for doc in self._docs.values():
+                key = index.unique_key(doc)
+                if key in seen:
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {name} dup key: {key}")
+                seen.add(key)
+        for slot, doc in self._docs.items():
+            index.add(slot, doc)
+        self._indexes[name] = index
+        return name
+
+    @_command("createIndexes")
+    async def create_index(self, keys, **options) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        keys = list(keys)
+        name = options.pop("name", None) or "_".join(f"{field}_{direction}" for field, direction in keys)
+        return self._create_index(keys, name, **options)
+
+    async def index_information(self) -> Dict[str, Any]:
+        return {name: {"key": index.keys, "unique": index.unique, **index.options}
+                for name, index in self._indexes.items()}
+
+    def _plan(self, query: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[Set[int]]]:
+        """Pick an index for an equality/$in condition; (index name, candidate slots)"""
+        best: Tuple[Optional[str], Optional[Set[int]]] = (None, None)
+        for field, spec in (query or {}).items():
+            if field.startswith("$"):
+                continue
+            if isinstance(spec, dict) and spec and all(k.startswith("$") for k in spec):
+                if "$eq" in spec:
+                    values = [spec["$eq"]]
+                elif "$in" in spec and not any(isinstance(v, re.Pattern) for v in spec["$in"]):
+                    values = list(spec["$in"])
+                else:
+                    continue
+            elif isinstance(spec, re.Pattern):
+                continue
+            else:
+                values = [spec]
+            for index in self._indexes.values():
+                if index.field == field:
+                    slots: Set[int] = set()
+                    for value in values:
+                        slots |= index.entries.get(_hashable(value), set())
+                    if best[1] is None or len(slots) < len(best[1]):
+                        best = (index.name, slots)
+                    break
+        return best
+
+    def _iter_matching(self, query: Optional[Dict[str, Any]]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        _, slots = self._plan(query)
+        if slots is None:
+            items: Iterable[Tuple[int, Dict[str, Any]]] = list(self._docs.items())
+        else:
+            items = [(slot, self._docs[slot]) for slot in sorted(slots)]
+        for slot, doc in items:
+            if matches(doc, query):
+                yield slot, doc
+
+    # Writes
+
+    def _check_unique(self, doc: Dict[str, Any], ignore_slot: Optional[int] = None):
+        for index in self._indexes.values():
+            if not index.unique:
+                continue
+            key = index.unique_key(doc)
+            for value in index.values(doc):
+                for slot in index.entries.get(value, ()):
+                    if slot != ignore_slot and index.unique_key(self._docs[slot]) == key:
+                        raise DuplicateKeyError(
+                            f"E11000 duplicate key error collection: {self.name} index: {index.name} dup key: {key}")
+
+    def _insert(self, doc: Dict[str, Any]) -> Any:
+        doc = _clone(doc)
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        slot = next(self._slots)
+        self._docs[slot] = doc
+        for index in self._indexes.values():
+            index.add(slot, doc)
+        max_docs = self._options.get("max")
+        if self._options.get("capped") and max_docs and len(self._docs) > max_docs:
+            oldest = next(iter(self._docs))
+            self._remove(oldest)
+        return doc["_id"]
+
+    def _replace_slot(self, slot: int, new_doc: Dict[str, Any]):
+        old = self._docs[slot]
+        self._check_unique(new_doc, ignore_slot=slot)
+        for index in self._indexes.values():
+            index.discard(slot, old)
+            index.add(slot, new_doc)
+        self._docs[slot] = new_doc
+
+    def _remove(self, slot: int):
+        doc = self._docs.pop(slot)
+        for index in self._indexes.values():
+            index.discard(slot, doc)
+
+    def _update(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool, multi: bool) -> _Result:
+        matched = modified = 0
+        for slot, doc in list(self._iter_matching(query)):
+            new_doc = _clone(doc)
+            _apply_update(new_doc, update)
+            matched += 1
+            if new_doc != doc:
+                self._replace_slot(slot, new_doc)
+                modified += 1
+            if not multi:
+                break
+        upserted_id = None
+        if not matched and upsert:
+            new_doc = _upsert_seed(query)
+            _apply_update(new_doc, update, inserting=True)
+            upserted_id = self._insert(new_doc)
+        return _Result(matched_count=matched, modified_count=modified, upserted_id=upserted_id)
+
+    @_command("insert")
+    async def insert_one(self, document: Dict[str, Any]) -> _Result:
+        inserted_id = self._insert(document)
+        # Like pymongo, report the generated _id on the caller's document
+        document.setdefault("_id", inserted_id)
+        return _Result(inserted_id=inserted_id)
+
+    @_command("insert")
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True) -> _Result:
+        ids = []
+        for document in documents:
+            ids.append(self._insert(document))
+            document.setdefault("_id", ids[-1])
+        return _Result(inserted_ids=ids)
+
+    @_command("update")
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> _Result:
+        _record({"update": self.name, "updates": [{"q": filter, "multi": False}]})
+        return self._update(filter, update, upsert, multi=False)
+
+    @_command("update")
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> _Result:
+        _record({"update": self.name, "updates": [{"q": filter, "multi": True}]})
+        return self._update(filter, update, upsert, multi=True)
+
+    @_command("update")
+    async def replace_one(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False) -> _Result:
+        _record({"update": self.name, "updates": [{"q": filter, "multi": False}]})
+        return self._update(filter, replacement, upsert, multi=False)
+
+    @_command("delete")
+    async def delete_one(self, filter: Dict[str, Any]) -> _Result:
+        _record({"delete": self.name, "deletes": [{"q": filter, "limit": 1}]})
+        for slot, _ in self._iter_matching(filter):
+            self._remove(slot)
+            return _Result(deleted_count=1)
+        return _Result(deleted_count=0)
+
+    @_command("delete")
+    async def delete_many(self, filter: Dict[str, Any]) -> _Result:
+        _record({"delete": self.name, "deletes": [{"q": filter, "limit": 0}]})
+        slots = [slot for slot, _ in self._iter_matching(filter)]
+        for slot in slots:
+            self._remove(slot)
+        return _Result(deleted_count=len(slots))
+
+    @_command("bulkWrite")
+    async def bulk_write(self, requests: List[Any], ordered: bool = True) -> _Result:
+        counts = {"inserted_count": 0, "matched_count": 0, "modified_count": 0,
+                  "deleted_count": 0, "upserted_count": 0}
+        for request in requests:
+            # pymongo's operation classes keep their arguments in private attributes
+            if isinstance(request, InsertOne):
+                self._insert(request._doc)
+                counts["inserted_count"] += 1
+            elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                result = self._update(request._filter, request._doc, bool(request._upsert),
+                                      multi=isinstance(request, UpdateMany))
+                counts["matched_count"] += result.matched_count
+                counts["modified_count"] += result.modified_count
+                counts["upserted_count"] += result.upserted_id is not None
+            elif isinstance(request, (DeleteOne, DeleteMany)):
+                slots = [slot for slot, _ in self._iter_matching(request._filter)]
+                if isinstance(request, DeleteOne):
+                    slots = slots[:1]
+                for slot in slots:
+                    self._remove(slot)
+                counts["deleted_count"] += len(slots)
+            else:
+                raise TypeError(f"{request!r} is not a valid request")
+        return _Result(**counts)
+
+    # Reads
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> MemoryCursor:
+        def produce(cursor: MemoryCursor) -> List[Dict[str, Any]]:
+            _record({"find": self.name, "filter": filter or {}, "sort": dict(cursor._sort),
+                     "skip": cursor._skip, "limit": cursor._limit})
+            start = time.perf_counter()
+            documents = [doc for _, doc in self._iter_matching(filter)]
+            if cursor._sort:
+                documents = _sort_documents(documents, cursor._sort)
+            documents = documents[cursor._skip:]
+            if cursor._limit:
+                documents = documents[:cursor._limit]
+            documents = [_project(_clone(doc), projection) for doc in documents]
+            _notify(self.name, "find", start)
+            return documents
+        return MemoryCursor(produce)
+
+    @_command("find")
+    async def find_one(self, filter: Optional[Dict[str, Any]] = None,
+                       projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        _record({"find": self.name, "filter": filter or {}, "limit": 1})
+        for _, doc in self._iter_matching(filter):
+            return _project(_clone(doc), projection)
+        return None
+
+    @_command("aggregate")
+    async def count_documents(self, filter: Dict[str, Any]) -> int:
+        _record({"aggregate": self.name, "pipeline": [{"$match": filter}, {"$group": {"_id": 1, "n": {"$sum": 1}}}]})
+        if not filter:
+            return len(self._docs)
+        return sum(1 for _ in self._iter_matching(filter))
+
+    @_command("count")
+    async def estimated_document_count(self) -> int:
+        return len(self._docs)
+
+    @_command("distinct")
+    async def distinct(self, key: str, filter: Optional[Dict[str, Any]] = None) -> List[Any]:
+        _record({"distinct": self.name, "key": key, "query": filter or {}})
+        values: List[Any] = []
+        for _, doc in self._iter_matching(filter):
+            value = _get_path(doc, key)
+            for item in (value if isinstance(value, list) else [value]):
+                if item is not _MISSING and item not in values:
+                    values.append(item)
+        return values
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> MemoryCursor:
+        def produce(cursor: MemoryCursor) -> List[Dict[str, Any]]:
+            _record({"aggregate": self.name, "pipeline": pipeline})
+            start = time.perf_counter()
+            stages = list(pipeline)
+            # A leading $match can use the indexes
+            query = stages.pop(0)["$match"] if stages and "$match" in stages[0] else None
+            documents = run_pipeline([_clone(doc) for _, doc in self._iter_matching(query)], stages)
+            _notify(self.name, "aggregate", start)
+            return documents
+        return MemoryCursor(produce)
+
+    async def options(self) -> Dict[str, Any]:
+        return dict(self._options)
+
+    async def drop(self):
+        self.database._collections.pop(self.name, None)
+
+
+class MemoryDatabase:
+    """Database object with the same access patterns as AsyncIOMotorDatabase"""
+
+    def __init__(self, name: str = "memory"):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **options) -> MemoryCollection:
+        return self[name]
+
+    def with_options(self, **options) -> "MemoryDatabase":
+        return self
+
+    async def list_collection_names(self, filter: Optional[Dict[str, Any]] = None) -> List[str]:
+        return [name for name in self._collections if matches({"name": name}, filter)]
+
+    async def create_collection(self, name: str, **options) -> MemoryCollection:
+        if name in self._collections:
+            raise OperationFailure(f"Collection {self.name}.{name} already exists", code=48)
+        collection = self[name]
+        collection._options = options
+        return collection
+
+    async def drop_collection(self, name: str):
+        self._collections.pop(name, None)
+
+    async def command(self, command, value: Any = 1, **kwargs) -> Dict[str, Any]:
+        if isinstance(command, dict):
+            (command, value), *rest = command.items()
+            kwargs = {**dict(rest), **kwargs}
+        if command in ("ping", "hello", "isMaster"):
+            return {"ok": 1.0}
+        if command == "convertToCapped":
+            self[value]._options = {"capped": True, "size": kwargs.get("size")}
+            return {"ok": 1.0}
+        if command == "collMod":
+            return {"ok": 1.0}
+        if command == "explain":
+            return self._explain(value, kwargs.get("verbosity", "queryPlanner"))
+        raise OperationFailure(f"no such command: '{command}'", code=59)
+
+    def _explain(self, command: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+        """Plan of a find, count, distinct or aggregate (leading $match and $sort)"""
+        name = next(iter(command))
+        collection = self[command[name]]
+        query, sort, limit = command.get("filter") or command.get("query"), command.get("sort"), command.get("limit", 0)
+        if name == "aggregate":
+            stages = list(command["pipeline"])
+            query = stages.pop(0)["$match"] if stages and "$match" in stages[0] else None
+            sort = stages[0]["$sort"] if stages and "$sort" in stages[0] else None
+        index, slots = collection._plan(query)
+        stage = {"stage": "IXSCAN", "indexName": index} if index else {"stage": "COLLSCAN"}
+        plan = {"stage": "FETCH", "inputStage": stage} if index else stage
+        if sort:
+            plan = {"stage": "SORT", "inputStage": plan}
+        result = {"queryPlanner": {"winningPlan": plan}, "ok": 1.0}
+        if verbosity != "queryPlanner":
+            start = time.perf_counter()
+            returned = sum(1 for _ in collection._iter_matching(query))
+            result["executionStats"] = {
+                "nReturned": min(returned, limit) if limit else returned,
+                "totalKeysExamined": len(slots) if index else 0,
+                "totalDocsExamined": len(slots) if index else len(collection._docs),
+                "executionTimeMillis": round((time.perf_counter() - start) * 1000),
+            }
+        return result
+
+    def clear(self):
+        """Drop every collection"""
+        self._collections.clear()
@@ -0,0 +1,316 @@
+from typing import Dict, List, Sequence, Tuple
+import bisect
+import threading
+import time
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import memory_store
+
+
+# Histogram buckets (seconds / bytes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        # Updated from Motor's executor threads as well as the event loop
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests by route, method and status code", ("method", "route", "status"))
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS)
+http_response_size_bytes = Histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS)
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served")
+
+# MongoDB
+mongodb_commands_total = Counter(
+    "mongodb_commands_total", "MongoDB commands by collection, command and outcome",
+    ("collection", "command", "outcome"))
+mongodb_command_duration_seconds = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round-trip time",
+    ("collection", "command"), MONGO_LATENCY_BUCKETS)
+mongodb_pool_connections = Gauge(
+    "mongodb_pool_connections", "Open connections in the driver pools", ("address",))
+mongodb_pool_checked_out_connections = Gauge(
+    "mongodb_pool_checked_out_connections", "Connections currently checked out of the driver pools", ("address",))
+mongodb_pool_max_connections = Gauge(
+    "mongodb_pool_max_connections", "Sum of maxPoolSize over the open driver pools", ("address",))
+mongodb_pool_checkout_failures_total = Counter(
+    "mongodb_pool_checkout_failures_total", "Failed connection checkouts", ("address", "reason"))
+
+# Startup
+startup_phase_duration_seconds = Gauge(
+    "startup_phase_duration_seconds", "Time spent in each application startup phase", ("phase",))
+
+# Caches
+cache_requests_total = Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+
+single_flight_calls_total = Counter(
+    "single_flight_calls_total", "Single-flight calls that ran the computation (leader) or joined one (coalesced)",
+    ("group", "role"))
+
+# Resilience
+circuit_breaker_state = Gauge(
+    "circuit_breaker_state", "Circuit breaker state per collection (0 closed, 1 half-open, 2 open)", ("breaker",))
+circuit_breaker_transitions_total = Counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes by the state entered", ("breaker", "state"))
+stale_responses_total = Counter(
+    "stale_responses_total", "Responses served from the last known good payload", ("endpoint",))
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup"""
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class MetricsMiddleware:
+    """Record count, latency and response size for every HTTP request.
+
+    Requests are labelled with the route template (``/api/quotes/{quote_id}``)
+    so that path parameters do not create new series.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            elif message["type"] == "http.response.zerocopysend":
+                size += message.get("count") or 0
+            await send(message)
+
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress.dec()
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "unmatched")}
+            http_requests_total.inc(status=status, **labels)
+            http_request_duration_seconds.observe(time.perf_counter() - start, **labels)
+            http_response_size_bytes.observe(size, **labels)
+
+
+def _command_collection(event: monitoring.CommandStartedEvent) -> str:
+    target = event.command.get(event.command_name)
+    if isinstance(target, str):
+        return target
+    return event.command.get("collection", "")  # getMore
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Time every command sent by any client created after registration"""
+
+    def __init__(self):
+        # (connection, request id) -> collection of the command in flight
+        self._pending: Dict[Tuple[object, int], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        self._pending[(event.connection_id, event.request_id)] = _command_collection(event)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, "success")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, "failure")
+
+    def _finish(self, event, outcome: str):
+        collection = self._pending.pop((event.connection_id, event.request_id), "")
+        mongodb_commands_total.inc(collection=collection, command=event.command_name, outcome=outcome)
+        mongodb_command_duration_seconds.observe(
+            event.duration_micros / 1e6, collection=collection, command=event.command_name)
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Track open and checked-out connections per server address"""
+
+    def __init__(self):
+        # address -> maxPoolSize of each open pool (close events do not repeat it)
+        self._max_sizes: Dict[str, List[int]] = {}
+
+    def pool_created(self, event):
+        max_size = event.options.get("maxPoolSize", 100)
+        self._max_sizes.setdefault(_address(event), []).append(max_size)
+        mongodb_pool_max_connections.inc(max_size, address=_address(event))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        sizes = self._max_sizes.get(_address(event))
+        if sizes:
+            mongodb_pool_max_connections.dec(sizes.pop(), address=_address(event))
+
+    def connection_created(self, event):
+        mongodb_pool_connections.inc(address=_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongodb_pool_connections.dec(address=_address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        mongodb_pool_checkout_failures_total.inc(address=_address(event), reason=event.reason)
+
+    def connection_checked_out(self, event):
+        mongodb_pool_checked_out_connections.inc(address=_address(event))
+
+    def connection_checked_in(self, event):
+        mongodb_pool_checked_out_connections.dec(address=_address(event))
+
+
+def _record_memory_command(collection: str, command: str, seconds: float):
+    mongodb_commands_total.inc(collection=collection, command=command, outcome="success")
+    mongodb_command_duration_seconds.observe(seconds, collection=collection, command=command)
+
+
+mongo_command_listener = MongoCommandMetrics()
+# Global listeners only apply to clients created afterwards: import this
+# module before any module that creates an AsyncIOMotorClient.
+monitoring.register(mongo_command_listener)
+monitoring.register(MongoPoolMetrics())
+# The in-memory backend reports its operations the same way
+memory_store.command_listeners.append(_record_memory_command)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks des chemins exécutés à chaque requête : construction des
+modèles, sérialisation des payloads publics, JWT, recommandations et
+insights analytics, calcul des créneaux disponibles ; comparaison à une
+référence avec seuil de régression
+Usage: python micro_benchmark.py [--filter models/] [--repeat 7]
+                                 [--baseline benchmarks/micro_baseline.json] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+import typing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pydantic import BaseModel
+
+ROOT_DIR = Path(__file__).parent
+RESULTS_DIR = ROOT_DIR / "benchmarks" / "results"
+DEFAULT_BASELINE = ROOT_DIR / "benchmarks" / "micro_baseline.json"
+
+# Importing the application must not need a database
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("PRICING_TABLES_PATH", str(ROOT_DIR / "pricing_tables.example.json"))
+sys.path.insert(0, str(ROOT_DIR))
+
+import models  # noqa: E402
+import server  # noqa: E402
+from analytics_routes import AutoStatistic, generate_ai_recommendations, generate_insights  # noqa: E402
+from auth import create_access_token, verify_token  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from generate_data import GENERATORS, GenerationContext  # noqa: E402
+
+
+def run_sync(coroutine):
+    """Run a coroutine that never suspends without the cost of an event loop"""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError("Benchmarked coroutine awaited real I/O")
+
+
+def sample_value(name: str, annotation: Any) -> Any:
+    """Plausible value for a model field, from its annotation"""
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is typing.Union:
+        return sample_value(name, next(arg for arg in args if arg is not type(None)))
+    if origin is typing.Literal:
+        return args[0]
+    if origin in (list, List):
+        return [sample_value(name, args[0] if args else str) for _ in range(3)]
+    if origin in (dict, Dict):
+        return {"key": "value"}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return sample_document(annotation)
+    if "email" in name.lower():
+        return "client@example.com"
+    if annotation is bool:
+        return True
+    if annotation is int:
+        return 4
+    if annotation is float:
+        return 4.5
+    if annotation is datetime:
+        return datetime(2024, 5, 17, 14, 30)
+    return f"{name} sample"
+
+
+def sample_document(model: type) -> Dict[str, Any]:
+    """Stored document for a model, with a MongoDB _id like find() returns"""
+    document = {name: sample_value(name, field.annotation) for name, field in model.model_fields.items()}
+    document["_id"] = ObjectId()
+    return document
+
+
+def application_models() -> List[type]:
+    return [obj for module in (models, server) for obj in vars(module).values()
+            if isinstance(obj, type) and issubclass(obj, BaseModel) and obj.__module__ == module.__name__]
+
+
+def generated(collection: str, count: int) -> List[Dict[str, Any]]:
+    """Realistic documents from the data generator, with MongoDB _ids"""
+    ctx = GenerationContext(seed=42, counts={}, days=365)
+    documents = GENERATORS[collection](ctx, ctx.rng(collection, 0), 0, count)
+    for document in documents:
+        document["_id"] = ObjectId()
+    return documents
+
+
+def route_field(path: str):
+    """Response field FastAPI validates the route's return value against"""
+    for route in server.app.routes:
+        if getattr(route, "path", None) == path and "GET" in route.methods:
+            return route.response_field
+    raise LookupError(path)
+
+
+def public_payload(path: str, documents: List[Dict[str, Any]]) -> Callable[[], bytes]:
+    """Strip _id as the public endpoints do, then validate and render like FastAPI"""
+    field = route_field(path)
+
+    def run():
+        content = [{k: v for k, v in document.items() if k != "_id"} for document in documents]
+        return JSONResponse(run_sync(serialize_response(field=field, response_content=content))).body
+    return run
+
+
+def dashboard_statistics() -> List[AutoStatistic]:
+    return [
+        AutoStatistic("Projets Totaux", 4, trend="neutral"),
+        AutoStatistic("Témoignages", 2, trend="negative", description="Peu de retours clients"),
+        AutoStatistic("Taux d'Achèvement", 75, suffix="%", trend="positive"),
+        AutoStatistic("Articles Publiés", 3, trend="neutral", description="Blog peu alimenté"),
+        AutoStatistic("Téléchargements", 42, trend="positive"),
+        AutoStatistic("Activité (30j)", 2, trend="negative", description="Activité en baisse"),
+        AutoStatistic("Abonnés Newsletter", 12, trend="neutral", description="Liste à développer"),
+    ]
+
+
+def build_benchmarks() -> Dict[str, Callable[[], Any]]:
+    benchmarks: Dict[str, Callable[[], Any]] = {}
+
+    for model in application_models():
+        document = sample_document(model)
+        benchmarks[f"models/{model.__module__}.{model.__name__}"] = lambda model=model, document=document: model(**document)
+
+    resources = generated("resources", 100)
+    benchmarks["models/server.Resource x100"] = lambda: [server.Resource(**resource) for resource in resources]
+    benchmarks["payloads/strip_id x100"] = lambda: [{k: v for k, v in r.items() if k != "_id"} for r in resources]
+    benchmarks["payloads/public/projects x100"] = public_payload("/api/public/projects", generated("projects", 100))
+    benchmarks["payloads/public/technologies x100"] = public_payload("/api/public/technologies",
+                                                                     generated("technologies", 100))
+    benchmarks["payloads/public/testimonials x100"] = public_payload("/api/public/testimonials",
+                                                                     generated("testimonials", 100))
+    benchmarks["payloads/resources x100"] = lambda: JSONResponse(run_sync(serialize_response(
+        field=route_field("/api/resources"), response_content=[server.Resource(**r) for r in resources]))).body
+
+    token = create_access_token({"sub": "admin"})
+    benchmarks["auth/create_access_token"] = lambda: create_access_token({"sub": "admin"})
+    benchmarks["auth/verify_token"] = lambda: verify_token(token)
+
+    stats = dashboard_statistics()
+    stat_dicts = [vars(stat) for stat in stats]
+    benchmarks["analytics/generate_ai_recommendations"] = lambda: run_sync(generate_ai_recommendations(stats))
+    benchmarks["analytics/generate_insights"] = lambda: run_sync(generate_insights(stat_dicts))
+
+    rng = random.Random(42)
+    bookings = [{"booking_data": {"time": slot}} for slot in rng.sample(server.BOOKING_SLOTS, 6)]
+    benchmarks["bookings/availability"] = lambda: server.availability("2024-05-17", bookings)
+    return benchmarks
+
+
+def measure(function: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    """Per-call timings over ``repeat`` rounds of at least ``min_time`` seconds"""
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    rounds = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "loops": number,
+        "best_us": round(min(rounds), 3),
+        "median_us": round(statistics.median(rounds), 3),
+        "stdev_us": round(statistics.stdev(rounds), 3) if len(rounds) > 1 else 0.0,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regressions: median time per call up by more than threshold"""
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if reference and current["median_us"] > reference["median_us"] * (1 + threshold):
+            regressions.append(f"{name}: {reference['median_us']:.2f} -> {current['median_us']:.2f} µs")
+    return regressions
+
+
+def print_table(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    header = f"{'benchmark':<52}{'loops':>10}{'best µs':>12}{'median µs':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results["benchmarks"].items():
+        line = f"{name:<52}{r['loops']:>10}{r['best_us']:>12.2f}{r['median_us']:>12.2f}"
+        reference = (baseline or {}).get("benchmarks", {}).get(name)
+        if reference and reference["median_us"]:
+            line += f"   {r['median_us'] / reference['median_us'] - 1:+.0%} vs baseline"
+        print(line)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Microbenchmark the per-request hot paths")
+    parser.add_argument("--filter", action="append", help="Only benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--repeat", type=int, default=7, help="Timing rounds per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Seconds per timing round")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/micro-<time>.json)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    benchmarks = {name: function for name, function in build_benchmarks().items()
+                  if not args.filter or any(pattern in name for pattern in args.filter)}
+    results = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+        },
+        "benchmarks": {},
+    }
+    for name, function in benchmarks.items():
+        results["benchmarks"][name] = measure(function, args.repeat, args.min_time)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    print_table(results, baseline)
+
+    output = args.output or RESULTS_DIR / f"micro-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\n✅ Results written to {output}")
+    if args.save_baseline:
+        # Merge so a filtered run only refreshes the benchmarks it measured
+        merged = baseline or {"benchmarks": {}}
+        merged["meta"] = results["meta"]
+        merged["benchmarks"].update(results["benchmarks"])
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(merged, indent=2, ensure_ascii=False))
+        print(f"✅ Baseline updated: {args.baseline}")
+    elif baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Migration de status_checks vers une collection plafonnée (capped)
+convertToCapped bloque la collection pendant la conversion et ne garde que les
+contrôles les plus récents qui tiennent dans STATUS_CAPPED_SIZE_BYTES :
+à lancer une seule fois, hors trafic, après une sauvegarde
+Usage: python migrate_status_checks.py [--dry-run]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+sys.path.append(str(ROOT_DIR))
+
+from status_monitor import STATUS_CAPPED_SIZE_BYTES, STATUS_COLLECTION, status_monitor  # noqa: E402
+from storage import db, close as close_storage  # noqa: E402
+
+
+async def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Convert status_checks to a capped collection")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the current state")
+    args = parser.parse_args()
+
+    try:
+        if not await db.list_collection_names(filter={"name": STATUS_COLLECTION}):
+            print(f"ℹ️  {STATUS_COLLECTION} does not exist yet: the app creates it capped")
+            return
+        if (await db[STATUS_COLLECTION].options()).get("capped"):
+            print(f"✅ {STATUS_COLLECTION} is already capped")
+            return
+
+        stats = await db.command("collStats", STATUS_COLLECTION)
+        print(f"📊 {stats['count']} checks, {stats['size']} bytes; cap: {STATUS_CAPPED_SIZE_BYTES} bytes")
+        if stats["size"] > STATUS_CAPPED_SIZE_BYTES:
+            print("⚠️  The oldest checks beyond the cap will be discarded")
+        if args.dry_run:
+            return
+
+        print(f"🔄 Converting {STATUS_COLLECTION} (the collection is locked meanwhile)...")
+        await status_monitor.convert_to_capped(db)
+        print(f"✅ {STATUS_COLLECTION} is now capped")
+    finally:
+        close_storage()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -427,4 +427,11 @@ class PendingTestimonial(BaseModel):
     service_used: Optional[str] = None
     status: str = "pending"  # pending, approved, rejected
     submitted_at: datetime = Field(default_factory=datetime.utcnow)
-    reviewed_at: Optional[datetime] = None
\ No newline at end of file
+    reviewed_at: Optional[datetime] = None
+
+
+# Report job request (analytics exports)
+class ReportRequest(BaseModel):
+    report: str = "analytics"  # analytics, funnel, quotes
+    format: str = "json"  # json, csv, xlsx
+    refresh: bool = False  # bypass the cached artifact
@@ -0,0 +1,111 @@
+from typing import Any, Dict, List, Optional, Sequence
+import json
+import os
+
+import numpy as np
+
+
+# The quote wizard's price tables (EUR), exported as JSON. Required: without
+# them quotes cannot be priced and the app does not report ready.
+# pricing_tables.example.json has the structure (sample values, used by the
+# data generator and the benchmarks).
+PRICING_TABLES_PATH = os.environ.get("PRICING_TABLES_PATH")
+
+EXTRAS = ("maintenance", "training", "documentation")
+PRICE_FIELDS = ("base_price", "features_price", "extras_price", "total_price", "min_price", "max_price")
+
+
+class PricingError(ValueError):
+    """Raised when a configuration references an unknown table entry"""
+
+    def __init__(self, field: str, key: Optional[str], row: Optional[int] = None):
+        self.field = field
+        self.key = key
+        self.row = row
+        message = f"unknown {field} '{key}'"
+        super().__init__(f"Configuration {row}: {message}" if row is not None else message.capitalize())
+
+
+class PriceTables:
+    """Price tables compiled once into lookup dicts and NumPy arrays"""
+
+    def __init__(self, tables: Dict[str, Any]):
+        self.tables = tables
+        self.project_types = {key: i for i, key in enumerate(tables["project_types"])}
+        self.complexities = {key: i for i, key in enumerate(tables["complexity"])}
+        self.timelines = {key: i for i, key in enumerate(tables["timeline"])}
+        self.features = {key: i for i, key in enumerate(tables["features"])}
+
+        self.base_prices = np.array(list(tables["project_types"].values()), dtype=np.float64)
+        self.complexity_factors = np.array(list(tables["complexity"].values()), dtype=np.float64)
+        self.timeline_factors = np.array(list(tables["timeline"].values()), dtype=np.float64)
+        # Last slot holds the price of unknown features
+        self.feature_prices = np.array(
+            list(tables["features"].values()) + [tables["default_feature_price"]], dtype=np.float64
+        )
+        self.extra_prices = np.array([tables["extras"][extra] for extra in EXTRAS], dtype=np.float64)
+        self.range_min = float(tables["range"]["min"])
+        self.range_max = float(tables["range"]["max"])
+
+    def estimate_many(self, configurations: Sequence[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """Price a batch of configurations in one vectorized pass"""
+        n = len(configurations)
+        if n == 0:
+            return []
+        project_type = np.empty(n, dtype=np.int64)
+        complexity = np.empty(n, dtype=np.int64)
+        timeline = np.empty(n, dtype=np.int64)
+        extras = np.zeros((n, len(EXTRAS)), dtype=np.float64)
+        feature_rows: List[int] = []
+        feature_ids: List[int] = []
+        unknown_feature = len(self.features)
+
+        for row, config in enumerate(configurations):
+            project_type[row] = self._lookup(self.project_types, config.get("project_type"), "project_type", row)
+            complexity[row] = self._lookup(self.complexities, config.get("complexity"), "complexity", row)
+            timeline[row] = self._lookup(self.timelines, config.get("timeline"), "timeline", row)
+            for feature in config.get("features") or []:
+                feature_rows.append(row)
+                feature_ids.append(self.features.get(feature, unknown_feature))
+            for column, extra in enumerate(EXTRAS):
+                if config.get(extra):
+                    extras[row, column] = 1.0
+
+        factor = self.complexity_factors[complexity]
+        base_price = np.round(self.base_prices[project_type] * factor)
+        features_price = np.round(np.bincount(
+            np.asarray(feature_rows, dtype=np.int64),
+            weights=self.feature_prices[np.asarray(feature_ids, dtype=np.int64)],
+            minlength=n
+        ) * factor)
+        extras_price = extras @ self.extra_prices
+        total_price = np.round((base_price + features_price + extras_price) * self.timeline_factors[timeline])
+        min_price = np.round(total_price * self.range_min)
+        max_price = np.round(total_price * self.range_max)
+
+        columns = np.column_stack([base_price, features_price, extras_price, total_price, min_price, max_price]).tolist()
+        return [dict(zip(PRICE_FIELDS, values)) for values in columns]
+
+    def estimate(self, configuration: Dict[str, Any]) -> Dict[str, float]:
+        try:
+            return self.estimate_many([configuration])[0]
+        except PricingError as e:
+            raise PricingError(e.field, e.key) from None
+
+    @staticmethod
+    def _lookup(table: Dict[str, int], key: Optional[str], field: str, row: int) -> int:
+        try:
+            return table[key]
+        except KeyError:
+            raise PricingError(field, key, row) from None
+
+
+def load_price_tables(path: Optional[str] = PRICING_TABLES_PATH) -> Optional[PriceTables]:
+    """Load and compile the tables (once, at import); None when not configured"""
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return PriceTables(json.load(f))
+
+
+price_tables = load_price_tables()
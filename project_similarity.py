@@ -0,0 +1,199 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+
+import numpy as np
+
+from public_cache import Freshness, public_cache
+from storage import causal_session
+
+
+# Number of neighbours precomputed per project (upper bound for lookups)
+RELATED_TOP_K = 10
+# Rebuild period of each worker's copy (writes made outside the admin API)
+PROJECT_SIMILARITY_TTL = float(os.environ.get("PROJECT_SIMILARITY_TTL", "60"))
+
+
+def project_features(project: dict) -> List[str]:
+    """Feature set of a project: its technologies plus its category"""
+    features = {tech.strip().lower() for tech in project.get("technologies") or [] if tech.strip()}
+    if project.get("category"):
+        features.add(f"category:{project['category'].strip().lower()}")
+    return sorted(features)
+
+
+class ProjectSimilarityIndex:
+    """Jaccard similarity matrix between projects with precomputed top-k.
+
+    Rows are stable slots (freed slots are reused), so a create, update or
+    delete only recomputes one row/column of the matrix and the top-k lists
+    that the change can affect. Lookups read the precomputed list.
+    """
+
+    def __init__(self, top_k: int = RELATED_TOP_K, capacity: int = 32, freshness: Optional[Freshness] = None):
+        capacity = max(capacity, top_k + 1)
+        self.top_k = top_k
+        self.freshness = freshness or Freshness(("projects",), PROJECT_SIMILARITY_TTL)
+        self._features: Dict[str, int] = {}  # feature -> column
+        self._rows: Dict[str, int] = {}  # project id -> row
+        self._projects: Dict[int, dict] = {}  # row -> project document
+        self._free: List[int] = []
+        self._size = 0  # high-water mark of used rows
+        self._vectors = np.zeros((capacity, 16), dtype=np.float32)
+        self._sim = np.full((capacity, capacity), -1.0, dtype=np.float32)
+        self._topk = np.zeros((capacity, top_k), dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._lock = asyncio.Lock()
+        self.loaded = False
+
+    async def ensure_loaded(self, db):
+        """Build the matrix from MongoDB on first use, and again once stale"""
+        if self.freshness.current():
+            return
+        async with self._lock:
+            if not self.freshness.current():
+                version = self.freshness.begin()
+                async with causal_session():
+                    projects = await db.projects.find().to_list(None)
+                self.rebuild(projects)
+                self.freshness.built(version)
+
+    def rebuild(self, projects: List[dict]):
+        """Rebuild the whole matrix in one vectorized pass"""
+        # Same lock: rebuilds also happen while serving
+        lock = self._lock
+        self.__init__(self.top_k, len(projects) + 1, self.freshness)
+        self._lock = lock
+        for project in projects:
+            row = self._allocate(project["id"])
+            self._store(row, project)
+        n = self._size
+        if n:
+            vectors = self._vectors[:n]
+            inter = vectors @ vectors.T
+            sizes = vectors.sum(axis=1)
+            union = sizes[:, None] + sizes[None, :] - inter
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sim = np.where(union > 0, inter / union, 0.0)
+            np.fill_diagonal(sim, -1.0)
+            self._sim[:n, :n] = sim
+            self._refresh_topk(np.arange(n))
+        self.loaded = True
+
+    def upsert(self, project: dict):
+        """Recompute one project's row/column after create or update"""
+        if not self.loaded:
+            return
+        row = self._rows.get(project["id"])
+        if row is None:
+            row = self._allocate(project["id"])
+        self._store(row, project)
+
+        n = self._size
+        vectors = self._vectors[:n]
+        vector = vectors[row]
+        inter = vectors @ vector
+        union = vectors.sum(axis=1) + vector.sum() - inter
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sim = np.where(union > 0, inter / union, 0.0)
+        sim[~self._active[:n]] = -1.0
+        sim[row] = -1.0
+        self._sim[row, :n] = sim
+        self._sim[:n, row] = sim
+
+        self._refresh_topk(self._affected_rows(row, sim))
+
+    def remove(self, project_id: str):
+        """Drop a project from the matrix and from its neighbours' lists"""
+        if not self.loaded:
+            return
+        row = self._rows.pop(project_id, None)
+        if row is None:
+            return
+        n = self._size
+        self._active[row] = False
+        self._vectors[row] = 0.0
+        self._sim[row, :n] = -1.0
+        self._sim[:n, row] = -1.0
+        self._projects.pop(row, None)
+        self._free.append(row)
+
+        affected = np.flatnonzero(self._active[:n] & (self._topk[:n] == row).any(axis=1))
+        self._refresh_topk(affected)
+
+    def related(self, project_id: str, limit: int = 5) -> Optional[List[Tuple[dict, float]]]:
+        """Most similar projects, or None if the project is unknown"""
+        row = self._rows.get(project_id)
+        if row is None:
+            return None
+        related = []
+        for other in self._topk[row, :limit]:
+            score = float(self._sim[row, other])
+            if score <= 0:
+                break
+            related.append((self._projects[int(other)], score))
+        return related
+
+    def _allocate(self, project_id: str) -> int:
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = self._size
+            self._size += 1
+            if row >= len(self._active):
+                self._grow_rows(2 * len(self._active))
+        self._rows[project_id] = row
+        self._active[row] = True
+        return row
+
+    def _store(self, row: int, project: dict):
+        self._projects[row] = {k: v for k, v in project.items() if k != "_id"}
+        self._vectors[row] = 0.0
+        for feature in project_features(project):
+            column = self._features.get(feature)
+            if column is None:
+                column = self._features[feature] = len(self._features)
+                if column >= self._vectors.shape[1]:
+                    self._grow_columns(2 * self._vectors.shape[1])
+            self._vectors[row, column] = 1.0
+
+    def _affected_rows(self, row: int, sim: np.ndarray) -> np.ndarray:
+        """Rows whose top-k may change because row's similarities changed"""
+        n = self._size
+        topk = self._topk[:n]
+        kth_score = self._sim[np.arange(n), topk[:, -1]]
+        affected = self._active[:n] & ((topk == row).any(axis=1) | (sim > kth_score))
+        affected[row] = True
+        return np.flatnonzero(affected)
+
+    def _refresh_topk(self, rows: np.ndarray):
+        if not len(rows):
+            return
+        k = self.top_k
+        block = self._sim[rows, :len(self._active)]
+        candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(block, candidates, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        self._topk[rows] = np.take_along_axis(candidates, order, axis=1)
+
+    def _grow_rows(self, capacity: int):
+        old = len(self._active)
+        vectors = np.zeros((capacity, self._vectors.shape[1]), dtype=np.float32)
+        vectors[:old] = self._vectors
+        sim = np.full((capacity, capacity), -1.0, dtype=np.float32)
+        sim[:old, :old] = self._sim
+        topk = np.zeros((capacity, self.top_k), dtype=np.int64)
+        topk[:old] = self._topk
+        active = np.zeros(capacity, dtype=bool)
+        active[:old] = self._active
+        self._vectors, self._sim, self._topk, self._active = vectors, sim, topk, active
+
+    def _grow_columns(self, width: int):
+        vectors = np.zeros((self._vectors.shape[0], width), dtype=np.float32)
+        vectors[:, :self._vectors.shape[1]] = self._vectors
+        self._vectors = vectors
+
+
+# Shared index used by the public endpoint and the admin write routes; every
+# worker keeps a copy, rebuilt when another one writes to the projects
+similarity_index = ProjectSimilarityIndex(freshness=Freshness(("projects",), PROJECT_SIMILARITY_TTL, public_cache.shared))
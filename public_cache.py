@@ -0,0 +1,172 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple, Union
+import asyncio
+import functools
+import logging
+import os
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from circuit_breaker import Unavailable, guarded
+from last_known_good import last_known_good
+from metrics import record_cache
+from shared_cache import PayloadResponse, SharedPayloadStore, default_directory
+from single_flight import SingleFlight
+from storage import causal_clock, causal_session
+
+
+logger = logging.getLogger(__name__)
+
+# Safety net for data changed outside the admin API (scripts, public writes
+# feeding the statistics); admin writes invalidate immediately
+PUBLIC_CACHE_TTL = float(os.environ.get("PUBLIC_CACHE_TTL", "300"))
+# With several uvicorn workers: one copy per host in memory-mapped files
+# (PUBLIC_CACHE_DIR, /dev/shm by default) instead of one per process
+PUBLIC_CACHE_SHARED = os.environ.get("PUBLIC_CACHE_SHARED", "false").lower() == "true"
+PUBLIC_CACHE_DIR = os.environ.get("PUBLIC_CACHE_DIR") or default_directory()
+
+
+class PublicCache:
+    """Rendered /api/public payloads, dropped when a write touches their collections"""
+
+    def __init__(self, ttl: float = PUBLIC_CACHE_TTL, shared: Optional[SharedPayloadStore] = None):
+        self.ttl = ttl
+        self.shared = shared
+        self._refreshing: Set[asyncio.Task] = set()
+        self._flights = SingleFlight("public")
+        self._entries: Dict[str, Tuple[float, bytes]] = {}  # key -> (built at, JSON body)
+        self._builders: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._collections: Dict[str, Tuple[str, ...]] = {}
+        # Bumped by invalidate(): a build that started before the write is not stored
+        self._generations: Dict[str, int] = {}
+
+    def cached(self, *collections: str):
+        """Serve an argument-less endpoint from the cache, keyed by its name.
+
+        When its collections' breakers are open or the build misses its
+        deadline, the last payload built successfully is served instead.
+        """
+        def decorator(endpoint: Callable[[], Awaitable[Any]]):
+            key = endpoint.__name__
+            self._builders[key] = endpoint
+            self._collections[key] = collections
+
+            @functools.wraps(endpoint)
+            async def wrapper():
+                try:
+                    return PayloadResponse(await self.get(key))
+                except Unavailable as exc:
+                    return last_known_good.respond(key, exc)
+            return wrapper
+        return decorator
+
+    async def get(self, key: str) -> Union[bytes, memoryview]:
+        if self.shared is not None:
+            return await self._get_shared(key)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            record_cache("public", True)
+            return entry[1]
+        record_cache("public", False)
+        built_at, generation = time.monotonic(), self._generations.get(key, 0)
+        body = await self._build(key, generation)
+        if self._generations.get(key, 0) == generation:
+            self._entries[key] = (built_at, body)
+        return body
+
+    async def _get_shared(self, key: str) -> Union[bytes, memoryview]:
+        # Stamp taken before building: a write landing meanwhile makes it stale
+        stamp = self.shared.stamp(self._collections[key])
+        body = self.shared.read(key, stamp, self.ttl)
+        record_cache("public", body is not None)
+        if body is not None:
+            return body
+        # The write behind the bump may come from another worker: read after it
+        causal_clock.merge(*self.shared.causal_times())
+        body = await self._build(key, stamp)
+        self.shared.write(key, stamp, body)
+        return body
+
+    async def _build(self, key: str, version: int) -> bytes:
+        """Render the payload once for all concurrent misses on the same version"""
+        async def compute():
+            # Causal: a payload rebuilt after an admin write includes it
+            async with causal_session():
+                return await self._builders[key]()
+
+        async def render():
+            payload = await guarded(self._collections[key], compute)
+            # Same bytes FastAPI's JSONResponse would send
+            body = JSONResponse(jsonable_encoder(payload)).body
+            last_known_good.save(key, body)
+            return body
+        # Requests arriving after a write must not join a build started before it
+        return await self._flights.do((key, version), render)
+
+    def invalidate(self, *collections: str):
+        """Drop the payloads built from any of these collections"""
+        keys = [key for key, depends_on in self._collections.items() if set(depends_on) & set(collections)]
+        if self.shared is not None:
+            # Every worker sees the new versions, and the times of this
+            # process's writes; this one rebuilds for all
+            self.shared.bump(collections, causal_clock.cluster_time, causal_clock.operation_time)
+            try:
+                task = asyncio.get_running_loop().create_task(self.warm(keys))
+            except RuntimeError:
+                return
+            self._refreshing.add(task)
+            task.add_done_callback(self._refreshing.discard)
+            return
+        for key in keys:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def warm(self, keys: Iterable[str] = ()):
+        """Build every payload concurrently (startup); failures are left to the first request"""
+        keys = list(keys) or list(self._builders)
+        results = await asyncio.gather(*(self.get(key) for key in keys), return_exceptions=True)
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                logger.warning("Could not warm %s: %s", key, result)
+
+
+class Freshness:
+    """When a per-process structure built from some collections must be rebuilt.
+
+    It goes stale after ttl, which also covers changes made by other workers
+    and scripts, and as soon as any worker bumps the shared versions of its
+    collections (PUBLIC_CACHE_SHARED).
+    """
+
+    def __init__(self, collections: Iterable[str], ttl: float, shared: Optional[SharedPayloadStore] = None):
+        self.collections = tuple(collections)
+        self.ttl = ttl
+        self.shared = shared
+        self._built: Optional[Tuple[float, Optional[int]]] = None  # (built at, stamp)
+
+    def _stamp(self) -> Optional[int]:
+        return self.shared.stamp(self.collections) if self.shared is not None else None
+
+    def current(self) -> bool:
+        if self._built is None:
+            return False
+        built_at, stamp = self._built
+        return time.monotonic() - built_at < self.ttl and self._stamp() == stamp
+
+    def begin(self) -> Tuple[float, Optional[int]]:
+        """Start a rebuild: reads made next include the writes of every worker"""
+        # Taken before reading: a write landing meanwhile makes the result stale
+        version = (time.monotonic(), self._stamp())
+        if self.shared is not None:
+            causal_clock.merge(*self.shared.causal_times())
+        return version
+
+    def built(self, version: Tuple[float, Optional[int]]):
+        self._built = version
+
+
+public_cache = PublicCache(shared=SharedPayloadStore(PUBLIC_CACHE_DIR) if PUBLIC_CACHE_SHARED else None)
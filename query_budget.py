@@ -0,0 +1,173 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+import memory_store
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+# MongoDB commands a request may issue before a warning is logged;
+# QUERY_BUDGET_ROUTES='{"/api/public/statistics": 25}' sets per-route budgets.
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "10"))
+ROUTE_QUERY_BUDGETS: Dict[str, int] = json.loads(os.environ.get("QUERY_BUDGET_ROUTES", "{}"))
+# Same command on the same collection this many times in one request looks like N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5"))
+
+
+class QueryStats:
+    """MongoDB commands issued while handling one request"""
+
+    def __init__(self):
+        self.commands = 0
+        self.db_time = 0.0  # seconds
+        self.shapes: Counter = Counter()  # (collection, command) -> count
+        self._lock = threading.Lock()
+
+    def started(self, collection: str, command: str):
+        with self._lock:
+            self.commands += 1
+            self.shapes[(collection, command)] += 1
+
+    def finished(self, seconds: float):
+        with self._lock:
+            self.db_time += seconds
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, str, int]]:
+        """Command shapes issued at least ``threshold`` times"""
+        return [(collection, command, count)
+                for (collection, command), count in self.shapes.most_common() if count >= threshold]
+
+    def summary(self) -> str:
+        shapes = ", ".join(f"{command} {collection or '-'} x{count}"
+                           for (collection, command), count in self.shapes.most_common())
+        return f"{self.commands} commands in {self.db_time * 1000:.1f} ms ({shapes})"
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Callbacks receiving (route, stats) for every finished request
+_observers: List[Callable[[str, QueryStats], None]] = []
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count the commands issued in the current context (Motor carries it into its threads)"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryBudgetListener(monitoring.CommandListener):
+    """Attribute commands to the request whose context issued them"""
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        stats = _current_stats.get()
+        if stats is not None:
+            target = event.command.get(event.command_name)
+            collection = target if isinstance(target, str) else event.command.get("collection", "")
+            stats.started(collection, event.command_name)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event)
+
+    @staticmethod
+    def _finished(event):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.finished(event.duration_micros / 1e6)
+
+
+class QueryBudgetMiddleware:
+    """Track MongoDB usage per request: Server-Timing header and budget warnings"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        with track_queries() as stats:
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    timing = (f'db;dur={stats.db_time * 1000:.1f};desc="{stats.commands} queries", '
+                              f'app;dur={(time.perf_counter() - start) * 1000:.1f}')
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", scope["path"])
+                _check_budget(scope["method"], route, stats)
+                for observer in list(_observers):
+                    observer(route, stats)
+
+
+def _check_budget(method: str, route: str, stats: QueryStats):
+    budget = ROUTE_QUERY_BUDGETS.get(route, QUERY_BUDGET)
+    repeated = stats.repeated()
+    if stats.commands <= budget and not repeated:
+        return
+    reason = "Query budget exceeded" if stats.commands > budget else "Possible N+1 queries"
+    logger.warning("%s: %s", reason, json.dumps({
+        "method": method,
+        "route": route,
+        "commands": stats.commands,
+        "budget": budget,
+        "db_ms": round(stats.db_time * 1000, 1),
+        "repeated": [{"collection": c, "command": cmd, "count": n} for c, cmd, n in repeated],
+    }))
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[List[QueryStats]]:
+    """Fail if the code in the block issues more than ``limit`` MongoDB commands.
+
+    Counts both commands awaited directly in the block and those issued by
+    requests served meanwhile (TestClient runs the app in another thread)::
+
+        with assert_max_queries(3):
+            client.get("/api/public/statistics")
+    """
+    requests: List[QueryStats] = []
+    observer = lambda route, stats: requests.append(stats)
+    _observers.append(observer)
+    try:
+        with track_queries() as direct:
+            yield requests
+    finally:
+        _observers.remove(observer)
+    total = direct.commands + sum(stats.commands for stats in requests)
+    if total > limit:
+        details = "; ".join(stats.summary() for stats in [direct, *requests] if stats.commands)
+        raise AssertionError(f"Expected at most {limit} queries, got {total}: {details}")
+
+
+def _record_memory_command(collection: str, command: str, seconds: float):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.started(collection, command)
+        stats.finished(seconds)
+
+
+# Like metrics, must be imported before the Motor clients are created
+monitoring.register(QueryBudgetListener())
+memory_store.command_listeners.append(_record_memory_command)
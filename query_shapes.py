@@ -0,0 +1,132 @@
+from typing import Any, Dict, List, Optional
+import atexit
+import copy
+import json
+import os
+import threading
+
+from bson import json_util
+from pymongo import monitoring
+
+import memory_store
+
+
+# When set, every distinct query shape the process issues is written there
+# at exit, for explain_audit.py to replay
+QUERY_AUDIT_FILE = os.environ.get("QUERY_AUDIT_FILE")
+
+# Commands carrying a query worth explaining; writes are replayed as the
+# find selecting their documents
+READ_COMMANDS = ("find", "aggregate", "count", "distinct")
+WRITE_COMMANDS = {"update": "updates", "delete": "deletes", "findAndModify": None}
+IGNORED_DATABASES = ("admin", "config", "local")
+
+
+def normalize(value: Any) -> Any:
+    """Query shape: operators and field names kept, literal values replaced by '?'"""
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in/$and lists: the shape does not depend on how many items they hold
+        shapes = []
+        for item in value:
+            shape = normalize(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def queries_of(command: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Explainable queries in a command: one per statement for batched writes"""
+    name = next(iter(command))
+    collection = command[name]
+    if name in READ_COMMANDS:
+        query = {"command": name, "collection": collection}
+        for key in ("filter", "sort", "skip", "limit", "pipeline", "query", "key"):
+            if command.get(key) not in (None, {}, 0):
+                query[key] = command[key]
+        return [query]
+    if name == "findAndModify":
+        return [{"command": "find", "collection": collection, "filter": command.get("query") or {},
+                 "sort": command.get("sort") or {}, "limit": 1, "write": name}]
+    statements = command.get(WRITE_COMMANDS[name], [])
+    return [{"command": "find", "collection": collection, "filter": statement.get("q") or {},
+             "limit": 1 if statement.get("limit") == 1 or statement.get("multi") is False else 0,
+             "write": name} for statement in statements]
+
+
+def shape_key(query: Dict[str, Any]) -> str:
+    shape = {key: (value if key in ("command", "collection", "sort", "key", "write") else normalize(value))
+             for key, value in query.items() if key not in ("skip", "limit")}
+    return json.dumps(shape, sort_keys=True, default=str)
+
+
+class QueryShapeRecorder:
+    """Distinct query shapes, with a count and the first concrete example of each"""
+
+    def __init__(self):
+        self.shapes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, command: Dict[str, Any]):
+        name = next(iter(command), None)
+        if name not in READ_COMMANDS and name not in WRITE_COMMANDS:
+            return
+        if not isinstance(command[name], str):
+            return
+        for query in queries_of(command):
+            key = shape_key(query)
+            with self._lock:
+                entry = self.shapes.get(key)
+                if entry is None:
+                    # Copied: callers may reuse their filter dicts
+                    self.shapes[key] = {"shape": json.loads(key), "count": 1, "example": copy.deepcopy(query)}
+                else:
+                    entry["count"] += 1
+
+    def dump(self, path: str):
+        with self._lock:
+            shapes = sorted(self.shapes.values(), key=lambda entry: -entry["count"])
+        existing = load(path) if os.path.exists(path) else []
+        # Merge with earlier runs written to the same file
+        merged = {shape_key(entry["example"]): entry for entry in existing}
+        for entry in shapes:
+            key = shape_key(entry["example"])
+            if key in merged:
+                merged[key]["count"] += entry["count"]
+            else:
+                merged[key] = entry
+        with open(path, "w") as handle:
+            handle.write(json_util.dumps(list(merged.values()), indent=2))
+
+
+def load(path: str) -> List[Dict[str, Any]]:
+    """Recorded shapes, BSON values (dates, ObjectIds, regexes) restored"""
+    with open(path) as handle:
+        return json_util.loads(handle.read())
+
+
+class QueryShapeListener(monitoring.CommandListener):
+    def __init__(self, recorder: QueryShapeRecorder):
+        self.recorder = recorder
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.database_name not in IGNORED_DATABASES:
+            self.recorder.record(event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        pass
+
+
+recorder: Optional[QueryShapeRecorder] = None
+
+# Like metrics, must be imported before the Motor clients are created
+if QUERY_AUDIT_FILE:
+    recorder = QueryShapeRecorder()
+    monitoring.register(QueryShapeListener(recorder))
+    memory_store.command_recorders.append(recorder.record)
+    atexit.register(recorder.dump, QUERY_AUDIT_FILE)
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+import logging
+import math
+import os
+import time
+
+from fastapi import HTTPException, Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+# Default budgets as (requests, per seconds). RATE_LIMIT_<NAME>="10/60"
+# overrides one, RATE_LIMIT_ENABLED=false turns the per-client limits off.
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[int, float]] = {
+    "status": (60, 60),
+    "quotes": (10, 60),
+    "bookings": (10, 60),
+    "downloads": (30, 60),
+    "newsletter": (5, 60),
+    "testimonials": (5, 600),
+    "login": (5, 60),
+}
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() != "false"
+# Buckets kept in memory; the least recently used clients are forgotten first
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Use the first X-Forwarded-For address (only behind a trusted reverse proxy)
+TRUST_PROXY_HEADERS = os.environ.get("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+# Global in-flight limits; writes get a smaller share so reads keep flowing
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", "256"))
+MAX_IN_FLIGHT_WRITES = int(os.environ.get("MAX_IN_FLIGHT_WRITES", "64"))
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def client_ip(request: Request) -> str:
+    """Client address used for rate limiting and download records"""
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def parse_budget(value: str) -> Tuple[int, float]:
+    """'10/60' -> (10, 60.0)"""
+    count, _, seconds = value.partition("/")
+    return int(count), float(seconds or 1)
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by (route, client), refilled lazily on access"""
+
+    def __init__(self, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.max_clients = max_clients
+        # key -> (tokens, last refill time)
+        self.buckets: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+
+    def acquire(self, key: Tuple[str, str], capacity: int, period: float) -> float:
+        """Take a token; returns 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        rate = capacity / period
+        tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        return retry_after
+
+
+limiter = TokenBucketLimiter()
+
+
+def rate_limit(name: str) -> Callable:
+    """Dependency enforcing the budget called ``name`` per client IP"""
+    capacity, period = DEFAULT_RATE_LIMITS[name]
+    override = os.environ.get(f"RATE_LIMIT_{name.upper()}")
+    if override:
+        capacity, period = parse_budget(override)
+
+    async def dependency(request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+        retry_after = limiter.acquire((name, client_ip(request)), capacity, period)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return dependency
+
+
+UNSHED_PATHS = ("/health/live", "/health/ready", "/metrics")
+
+
+class LoadSheddingMiddleware:
+    """Reject requests with 503 as soon as too many are already in flight"""
+
+    def __init__(self, app: ASGIApp, max_in_flight: int = MAX_IN_FLIGHT,
+                 max_in_flight_writes: int = MAX_IN_FLIGHT_WRITES):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_writes = max_in_flight_writes
+        self.in_flight = 0
+        self.writes_in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Probes and scrapes are never shed: an overloaded worker must not look dead
+        if scope["type"] != "http" or scope["path"] in UNSHED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        is_write = scope["method"] not in READ_METHODS
+        if self.in_flight >= self.max_in_flight or (is_write and self.writes_in_flight >= self.max_in_flight_writes):
+            logger.warning("Shedding %s %s: %d requests in flight", scope["method"], scope["path"], self.in_flight)
+            await _reject(send)
+            return
+
+        self.in_flight += 1
+        self.writes_in_flight += is_write
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self.writes_in_flight -= is_write
+
+
+async def _reject(send: Send):
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"retry-after", b"1"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": b'{"detail":"Server overloaded"}'})
@@ -0,0 +1,229 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import multiprocessing
+import os
+import uuid
+
+from metrics import record_cache
+
+
+# Worker processes for the CPU-heavy report steps
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+# How long finished artifacts (and their jobs) are kept
+REPORT_CACHE_TTL_SECONDS = int(os.environ.get("REPORT_CACHE_TTL_SECONDS", "900"))
+
+REPORT_FORMATS = {
+    "json": ("application/json", "json"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+# ================== RENDERING (runs in worker processes) ==================
+
+def render_report(kind: str, fmt: str, payload: Any) -> bytes:
+    """Aggregate and serialize a report; must stay picklable and importable"""
+    import pandas as pd
+
+    if kind == "funnel":
+        from funnel_analytics import compute_funnel
+        quotes, booked_emails = payload
+        document = compute_funnel(quotes, booked_emails)
+        sections = {"stages": pd.DataFrame(document["stages"])}
+        for dimension, rows in document["conversion"].items():
+            sections[f"by_{dimension}"] = pd.DataFrame(rows)
+        sections["revenue_histogram"] = pd.DataFrame(document["revenue"].get("histogram", []))
+    elif kind == "analytics":
+        document = payload
+        sections = {
+            "statistics": pd.DataFrame(payload["statistics"]),
+            "recommendations": pd.DataFrame(payload["recommendations"]),
+            "insights": pd.DataFrame(
+                [(key, item) for key, items in payload["insights"].items() for item in items],
+                columns=["section", "insight"]
+            ),
+        }
+    elif kind == "quotes":
+        document = {"quotes": payload}
+        sections = {"quotes": pd.json_normalize(payload, sep=".")}
+    else:
+        raise ValueError(f"Unknown report: {kind}")
+
+    if fmt == "json":
+        return json.dumps(document, default=str, ensure_ascii=False, indent=2).encode("utf-8")
+    if fmt == "csv":
+        buffer = io.StringIO()
+        for name, frame in sections.items():
+            if len(sections) > 1:
+                buffer.write(f"# {name}\n")
+            frame.to_csv(buffer, index=False)
+            buffer.write("\n")
+        return buffer.getvalue().encode("utf-8")
+    if fmt == "xlsx":
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer) as writer:
+            for name, frame in sections.items():
+                frame.to_excel(writer, sheet_name=name[:31], index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def xlsx_available() -> bool:
+    """pandas needs openpyxl or XlsxWriter to write .xlsx files"""
+    return any(importlib.util.find_spec(name) for name in ("openpyxl", "xlsxwriter"))
+
+
+# ================== JOB RUNNER ==================
+
+class ReportJob:
+    def __init__(self, kind: str, fmt: str, key: str):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.format = fmt
+        self.key = key
+        self.status = "queued"  # queued, running, completed, failed
+        self.error: Optional[str] = None
+        self.cached = False
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "report": self.kind,
+            "format": self.format,
+            "status": self.status,
+            "error": self.error,
+            "cached": self.cached,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ReportJobRunner:
+    """Runs report jobs: data collection on the event loop, rendering in a
+    process pool, artifacts cached by parameters until they expire.
+
+    Jobs and artifacts live in the memory of the worker process that ran
+    them. With several uvicorn workers, the status and download requests
+    of a job must reach the same worker (sticky sessions); elsewhere they
+    answer 404.
+    """
+
+    def __init__(self, workers: int = REPORT_WORKERS, ttl_seconds: int = REPORT_CACHE_TTL_SECONDS):
+        self.workers = workers
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Process-local, see the class docstring
+        self._jobs: Dict[str, ReportJob] = {}
+        self._running: Dict[str, ReportJob] = {}  # job id -> job in progress
+        self._artifacts: Dict[str, Tuple[bytes, datetime]] = {}  # job id -> (content, expires_at)
+        self._latest: Dict[str, ReportJob] = {}  # cache key -> newest completed job
+
+    def submit(self, kind: str, fmt: str, collect: Callable[[], Awaitable[Any]],
+               params: Optional[Dict[str, Any]] = None, refresh: bool = False) -> ReportJob:
+        """Queue a report; identical in-flight or cached reports are reused"""
+        self._purge()
+        key = _cache_key(kind, fmt, params or {})
+
+        if not refresh:
+            running = [job for job in self._running.values() if job.key == key]
+            if running:
+                return max(running, key=lambda job: job.created_at)
+
+        job = ReportJob(kind, fmt, key)
+        self._jobs[job.id] = job
+        latest = None if refresh else self._latest.get(key)
+        record_cache("reports", latest is not None)
+        if latest is not None:
+            # Same content as the job it was built by, under this job's id
+            self._artifacts[job.id] = self._artifacts[latest.id]
+            job.status = "completed"
+            job.cached = True
+            job.finished_at = datetime.utcnow()
+            return job
+
+        self._running[job.id] = job
+        job.task = asyncio.create_task(self._run(job, collect))
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def artifact(self, job: ReportJob) -> Optional[Tuple[bytes, str, str]]:
+        """Content, media type and file name of a completed job"""
+        entry = self._artifacts.get(job.id)
+        if job.status != "completed" or entry is None:
+            return None
+        media_type, extension = REPORT_FORMATS[job.format]
+        filename = f"{job.kind}-report-{job.created_at:%Y%m%d-%H%M%S}.{extension}"
+        return entry[0], media_type, filename
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _run(self, job: ReportJob, collect: Callable[[], Awaitable[Any]]):
+        job.status = "running"
+        try:
+            payload = await collect()
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(self._executor(), render_report, job.kind, job.format, payload)
+            self._artifacts[job.id] = (content, datetime.utcnow() + self.ttl)
+            job.status = "completed"
+            # A job submitted earlier but finishing later does not replace a newer report
+            latest = self._latest.get(job.key)
+            if latest is None or latest.created_at <= job.created_at:
+                self._latest[job.key] = job
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM): start a fresh pool for the next job
+            logger.error("Report job %s failed: %s", job.id, e)
+            self._pool = None
+            job.status = "failed"
+            job.error = str(e)
+        except Exception as e:
+            logger.exception("Report job %s failed", job.id)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._running.pop(job.id, None)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: never fork a process that holds driver threads and sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _purge(self):
+        now = datetime.utcnow()
+        for job_id in [j for j, (_, expires_at) in self._artifacts.items() if expires_at <= now]:
+            del self._artifacts[job_id]
+        for key in [k for k, job in self._latest.items() if job.id not in self._artifacts]:
+            del self._latest[key]
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at + self.ttl <= now]:
+            del self._jobs[job_id]
+
+
+def _cache_key(kind: str, fmt: str, params: Dict[str, Any]) -> str:
+    raw = json.dumps({"kind": kind, "format": fmt, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+report_runner = ReportJobRunner()
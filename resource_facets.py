@@ -0,0 +1,164 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import os
+
+from public_cache import Freshness, public_cache
+from storage import causal_session
+
+
+# Fields the resources page can filter on
+FACET_FIELDS = ("category", "type", "difficulty", "featured", "tags")
+# Rebuild period of each worker's copy (download counters, external writes)
+FACET_INDEX_TTL = float(os.environ.get("FACET_INDEX_TTL", "60"))
+
+
+class ResourceFacetIndex:
+    """In-memory facet index over the resources library.
+
+    Every resource gets a bit position; each facet value keeps an integer
+    bitset of the resources carrying it, so any filter combination is a
+    handful of AND/OR operations and facet counts are popcounts.
+    """
+
+    def __init__(self, freshness: Optional[Freshness] = None):
+        self.freshness = freshness or Freshness(("resources",), FACET_INDEX_TTL)
+        self._slots: Dict[str, int] = {}  # resource id -> bit position
+        self._docs: List[Optional[dict]] = []  # bit position -> resource
+        self._free: List[int] = []
+        self._bitsets: Dict[str, Dict[Any, int]] = {field: {} for field in FACET_FIELDS}
+        self._all = 0
+        self._lock = asyncio.Lock()
+        self.loaded = False
+
+    async def ensure_loaded(self, db):
+        """Build the index from MongoDB on first use, and again once stale"""
+        if self.freshness.current():
+            return
+        async with self._lock:
+            if not self.freshness.current():
+                version = self.freshness.begin()
+                async with causal_session():
+                    resources = await db.resources.find().to_list(None)
+                self.rebuild(resources)
+                self.freshness.built(version)
+
+    def rebuild(self, resources: Iterable[dict]):
+        """Rebuild the whole index from a list of resource documents"""
+        self._slots = {}
+        self._docs = []
+        self._free = []
+        self._bitsets = {field: {} for field in FACET_FIELDS}
+        self._all = 0
+        for resource in resources:
+            self._add(resource)
+        self.loaded = True
+
+    def upsert(self, resource: dict):
+        """Insert or refresh a resource after create/update"""
+        if not self.loaded:
+            return
+        self.remove(resource["id"])
+        self._add(resource)
+
+    def remove(self, resource_id: str):
+        """Drop a resource from every bitset"""
+        if not self.loaded:
+            return
+        slot = self._slots.pop(resource_id, None)
+        if slot is None:
+            return
+        bit = 1 << slot
+        for values in self._bitsets.values():
+            for value in [v for v, bits in values.items() if bits & bit]:
+                values[value] &= ~bit
+                if not values[value]:
+                    del values[value]
+        self._all &= ~bit
+        self._docs[slot] = None
+        self._free.append(slot)
+
+    def assign(self, resource_id: str, fields: Dict[str, Any]):
+        """Mirror a $set applied to a resource on MongoDB"""
+        slot = self._slots.get(resource_id)
+        if slot is not None:
+            self._docs[slot].update(fields)
+
+    def increment(self, resource_id: str, increments: Dict[str, float]):
+        """Mirror an $inc applied to a resource on MongoDB"""
+        slot = self._slots.get(resource_id)
+        if slot is not None:
+            doc = self._docs[slot]
+            for field, delta in increments.items():
+                doc[field] = doc.get(field, 0) + delta
+
+    def query(self, filters: Dict[str, List[Any]]) -> Tuple[List[dict], Dict[str, Dict[Any, int]]]:
+        """Return the matching resources and the count per facet value.
+
+        Values inside one facet are OR-ed, facets are AND-ed together. The
+        counts of a facet are computed against every *other* active filter,
+        so the page can show how many results each option would give.
+        """
+        masks = {}
+        for field, values in filters.items():
+            if not values:
+                continue
+            mask = 0
+            for value in values:
+                mask |= self._bitsets[field].get(value, 0)
+            masks[field] = mask
+
+        matched = self._all
+        for mask in masks.values():
+            matched &= mask
+
+        facets = {}
+        for field in FACET_FIELDS:
+            base = self._all
+            for other, mask in masks.items():
+                if other != field:
+                    base &= mask
+            facets[field] = {
+                value: count
+                for value, bits in self._bitsets[field].items()
+                if (count := (bits & base).bit_count())
+            }
+
+        return self._resolve(matched), facets
+
+    def _add(self, resource: dict):
+        doc = {k: v for k, v in resource.items() if k != "_id"}
+        slot = self._free.pop() if self._free else len(self._docs)
+        if slot == len(self._docs):
+            self._docs.append(doc)
+        else:
+            self._docs[slot] = doc
+        self._slots[doc["id"]] = slot
+
+        bit = 1 << slot
+        self._all |= bit
+        for field in FACET_FIELDS:
+            for value in _facet_values(doc, field):
+                values = self._bitsets[field]
+                values[value] = values.get(value, 0) | bit
+
+    def _resolve(self, mask: int) -> List[dict]:
+        docs = []
+        while mask:
+            low = mask & -mask
+            docs.append(self._docs[low.bit_length() - 1])
+            mask ^= low
+        return docs
+
+
+def _facet_values(resource: dict, field: str) -> List[Any]:
+    value = resource.get(field)
+    if field == "tags":
+        return list(value or [])
+    if field == "featured":
+        return [bool(value)]
+    return [] if value is None else [value]
+
+
+# Shared index used by the public endpoint and the admin write routes; every
+# worker keeps a copy, rebuilt when another one writes to the resources
+facet_index = ResourceFacetIndex(Freshness(("resources",), FACET_INDEX_TTL, public_cache.shared))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Score de tendance des ressources (téléchargements avec décroissance exponentielle)
+Usage: python resource_trending.py   # recalcule les poids depuis resource_downloads
+"""
+
+import asyncio
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Half-life of a download's contribution to the trending score
+TRENDING_HALF_LIFE_DAYS = float(os.environ.get("TRENDING_HALF_LIFE_DAYS", "7"))
+if not TRENDING_HALF_LIFE_DAYS > 0:
+    raise ValueError(f"TRENDING_HALF_LIFE_DAYS must be positive, got {TRENDING_HALF_LIFE_DAYS}")
+DECAY_RATE = math.log(2) / (TRENDING_HALF_LIFE_DAYS * 86400)
+
+# Weights are expressed relative to an epoch so that a single $inc per
+# download keeps the stored value exact and rank-preserving: the decayed score
+# at any instant is the stored weight times one common factor. The epoch moves
+# forward every TRENDING_ERA_HALF_LIVES half-lives and stored weights are
+# rescaled to it, so a download never weighs more than 2**64 whatever the
+# half-life. Each resource records the epoch of its weight (trending_epoch);
+# weights stored without one are relative to TRENDING_ORIGIN.
+TRENDING_ORIGIN = datetime(2024, 1, 1)
+TRENDING_ERA_HALF_LIVES = 64
+# Whole seconds: epochs must survive the millisecond precision of BSON dates
+TRENDING_ERA = timedelta(seconds=round(TRENDING_HALF_LIFE_DAYS * 86400 * TRENDING_ERA_HALF_LIVES))
+
+# Epoch this process last rescaled the stored weights to
+_normalized_epoch: Optional[datetime] = None
+
+
+def current_epoch(now: Optional[datetime] = None) -> datetime:
+    """Start of the era containing now (the same for every process)"""
+    now = now or datetime.utcnow()
+    return TRENDING_ORIGIN + TRENDING_ERA * ((now - TRENDING_ORIGIN) // TRENDING_ERA)
+
+
+def download_weight(downloaded_at: datetime, epoch: datetime) -> float:
+    """Weight added to trending_weight for one download"""
+    return math.exp(DECAY_RATE * (downloaded_at - epoch).total_seconds())
+
+
+def rescale(weight: float, from_epoch: datetime, to_epoch: datetime) -> float:
+    """The same weight relative to another epoch"""
+    return weight * math.exp(-DECAY_RATE * (to_epoch - from_epoch).total_seconds())
+
+
+def trending_score(weight: float, epoch: Optional[datetime] = None, now: Optional[datetime] = None) -> float:
+    """Decayed score (downloads "worth" at instant now) for a stored weight"""
+    now = now or datetime.utcnow()
+    return weight * math.exp(-DECAY_RATE * (now - (epoch or TRENDING_ORIGIN)).total_seconds())
+
+
+async def _move_to_epoch(db, resource: Dict[str, Any], epoch: datetime) -> Optional[Dict[str, Any]]:
+    """Rescale one resource's weight to epoch unless it changed meanwhile; the fields set, or None"""
+    fields = {
+        "trending_weight": rescale(resource.get("trending_weight") or 0.0,
+                                   resource.get("trending_epoch") or TRENDING_ORIGIN, epoch),
+        "trending_epoch": epoch,
+    }
+    result = await db.resources.update_one(
+        {"id": resource["id"], "trending_weight": resource.get("trending_weight"),
+         "trending_epoch": resource.get("trending_epoch")},
+        {"$set": fields}
+    )
+    return fields if result.modified_count else None
+
+
+async def record_download_weight(db, resource_id: str, downloaded_at: datetime) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Count a download on the resource: ($set fields applied first, $inc applied).
+
+    The common case is a single $inc on a resource already on the current
+    epoch; otherwise the resource is first moved to the current epoch, or
+    left on a later one set by a process whose clock is ahead.
+    """
+    epoch = current_epoch(downloaded_at)
+    assigned: Dict[str, Any] = {}
+    for _ in range(5):
+        increments = {"downloads": 1, "trending_weight": download_weight(downloaded_at, epoch)}
+        result = await db.resources.update_one({"id": resource_id, "trending_epoch": epoch}, {"$inc": increments})
+        if result.matched_count:
+            return assigned, increments
+        resource = await db.resources.find_one({"id": resource_id}, {"id": 1, "trending_weight": 1, "trending_epoch": 1})
+        if resource is None:
+            return assigned, {}
+        stored_epoch = resource.get("trending_epoch") or TRENDING_ORIGIN
+        if stored_epoch > epoch:
+            epoch = stored_epoch
+        else:
+            assigned = await _move_to_epoch(db, resource, epoch) or assigned
+    # Keeps losing races: count the download, the weight is rebuilt later
+    await db.resources.update_one({"id": resource_id}, {"$inc": {"downloads": 1}})
+    return assigned, {"downloads": 1}
+
+
+async def renormalize_trending_weights(db, epoch: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+    """Move every weight stored on an earlier epoch to the current one; the fields set per resource"""
+    global _normalized_epoch
+    epoch = epoch or current_epoch()
+    moved: Dict[str, Dict[str, Any]] = {}
+    stale = await db.resources.find(
+        {"trending_weight": {"$gt": 0}, "trending_epoch": {"$ne": epoch}},
+        {"id": 1, "trending_weight": 1, "trending_epoch": 1}
+    ).to_list(None)
+    for resource in stale:
+        if (resource.get("trending_epoch") or TRENDING_ORIGIN) < epoch:
+            fields = await _move_to_epoch(db, resource, epoch)
+            if fields is not None:
+                moved[resource["id"]] = fields
+    _normalized_epoch = epoch
+    return moved
+
+
+def needs_renormalization(resources: List[Dict[str, Any]] = ()) -> bool:
+    """True at the start of a new era, or when weights on an earlier epoch show up"""
+    epoch = current_epoch()
+    return _normalized_epoch != epoch or any(
+        (resource.get("trending_epoch") or TRENDING_ORIGIN) < epoch for resource in resources)
+
+
+async def rebuild_trending_weights(db) -> int:
+    """Recompute every trending_weight from the resource_downloads history"""
+    global _normalized_epoch
+    epoch = current_epoch()
+    pipeline = [
+        {"$group": {
+            "_id": "$resource_id",
+            "weight": {"$sum": {"$exp": {"$multiply": [
+                DECAY_RATE,
+                {"$divide": [{"$subtract": ["$downloaded_at", epoch]}, 1000]}
+            ]}}}
+        }}
+    ]
+    weights = await db.resource_downloads.aggregate(pipeline).to_list(None)
+
+    await db.resources.update_many({}, {"$set": {"trending_weight": 0.0, "trending_epoch": epoch}})
+    for entry in weights:
+        await db.resources.update_one(
+            {"id": entry["_id"]},
+            {"$set": {"trending_weight": entry["weight"]}}
+        )
+    _normalized_epoch = epoch
+    return len(weights)
+
+
+async def main():
+    """Backfill trending weights for downloads recorded before the score existed"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    try:
+        print("🔄 Rebuilding trending weights...")
+        count = await rebuild_trending_weights(db)
+        print(f"✅ Trending weights rebuilt for {count} resources")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Rétention des collections d'événements : compaction en agrégats journaliers
+et archivage NDJSON compressé avant suppression
+Usage: python retention.py run [--dry-run] [--collection resource_downloads]
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+
+from rollups import backfill, mark_compacted
+
+# Where archived documents are written (one .ndjson.gz file per run and collection)
+ARCHIVE_DIR = Path(os.environ.get("ARCHIVE_DIR", Path(__file__).parent / "archives"))
+ARCHIVE_BATCH_SIZE = 1000
+
+
+class RetentionPolicy:
+    def __init__(self, collection: str, time_field: str, days: int,
+                 filter: Optional[Dict[str, Any]] = None, rollup_metric: Optional[str] = None):
+        self.collection = collection
+        self.time_field = time_field
+        # RETENTION_<COLLECTION>_DAYS overrides the default age limit
+        self.days = int(os.environ.get(f"RETENTION_{collection.upper()}_DAYS", days))
+        self.filter = filter or {}
+        self.rollup_metric = rollup_metric
+
+    def expired_filter(self, cutoff: datetime) -> Dict[str, Any]:
+        return {**self.filter, self.time_field: {"$lt": cutoff}}
+
+
+# Their filters and sorts are served by indexes declared in indexes.APP_INDEXES
+RETENTION_POLICIES = [
+    RetentionPolicy("resource_downloads", "downloaded_at", 180, rollup_metric="downloads"),
+    RetentionPolicy("pending_testimonials", "submitted_at", 90,
+                    filter={"status": "rejected"}, rollup_metric="testimonials"),
+    RetentionPolicy("quotes", "created_at", 730,
+                    filter={"status": {"$in": ["draft", "rejected"]}}, rollup_metric="quotes"),
+]
+
+
+async def apply_policy(db, policy: RetentionPolicy, dry_run: bool = False,
+                       now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Apply one policy and report what was (or would be) removed"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=policy.days)
+    query = policy.expired_filter(cutoff)
+    report = {
+        "collection": policy.collection,
+        "cutoff": cutoff.isoformat(),
+        "expired": await db[policy.collection].count_documents(query),
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        return report
+
+    if policy.rollup_metric:
+        # Make sure the buckets hold these events before the raw documents go
+        await backfill(db, [policy.rollup_metric], until=cutoff)
+        await mark_compacted(db, policy.rollup_metric, cutoff)
+
+    archive_path = None
+    archived = deleted = 0
+    if report["expired"]:
+        archive_path = ARCHIVE_DIR / policy.collection / f"{policy.collection}-{datetime.utcnow():%Y%m%dT%H%M%S}.ndjson.gz"
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        archive = await asyncio.to_thread(gzip.open, archive_path, "wt", encoding="utf-8")
+        try:
+            batch: List[dict] = []
+            async for document in db[policy.collection].find(query).sort(policy.time_field, 1):
+                batch.append(document)
+                if len(batch) >= ARCHIVE_BATCH_SIZE:
+                    deleted += await _archive_batch(db, policy, archive, batch)
+                    archived += len(batch)
+                    batch = []
+            if batch:
+                deleted += await _archive_batch(db, policy, archive, batch)
+                archived += len(batch)
+        finally:
+            await asyncio.to_thread(archive.close)
+
+    report.update({
+        "archived": archived,
+        "deleted": deleted,
+        "archive_file": str(archive_path) if archive_path else None,
+    })
+    return report
+
+
+async def _archive_batch(db, policy: RetentionPolicy, archive, batch: List[dict]) -> int:
+    """Write a batch to the archive, flush it, then delete exactly those documents"""
+    lines = "".join(json_util.dumps(document) + "\n" for document in batch)
+
+    def write():
+        archive.write(lines)
+        archive.flush()
+        os.fsync(archive.fileno())
+
+    await asyncio.to_thread(write)
+    result = await db[policy.collection].delete_many({"_id": {"$in": [d["_id"] for d in batch]}})
+    return result.deleted_count
+
+
+async def run_retention(db, dry_run: bool = False, collections: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Apply every (or the selected) retention policy"""
+    reports = []
+    for policy in RETENTION_POLICIES:
+        if collections and policy.collection not in collections:
+            continue
+        reports.append(await apply_policy(db, policy, dry_run))
+    return reports
+
+
+async def main():
+    """Command line entry point"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Apply retention policies")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument("--collection", action="append",
+                        choices=[p.collection for p in RETENTION_POLICIES],
+                        help="Collection to process (repeatable, default: all)")
+    args = parser.parse_args()
+
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    try:
+        print(f"🔄 Applying retention policies{' (dry run)' if args.dry_run else ''}...")
+        for report in await run_retention(db, args.dry_run, args.collection):
+            print(json.dumps(report, ensure_ascii=False))
+        print("✅ Retention completed")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Agrégats temporels (jour / semaine / mois) des collections d'événements
+Usage: python rollups.py backfill [--metric bookings] [--since 2024-01-01]
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+# metric -> (raw collection, timestamp field)
+ROLLUP_METRICS = {
+    "bookings": ("bookings", "created_at"),
+    "quotes": ("quotes", "created_at"),
+    "downloads": ("resource_downloads", "downloaded_at"),
+    "subscriptions": ("newsletter_subscriptions", "subscribed_at"),
+    "testimonials": ("pending_testimonials", "submitted_at"),
+}
+
+GRANULARITIES = ("day", "week", "month")
+
+ROLLUP_COLLECTION = "analytics_rollups"
+
+# metric -> date before which raw events may have been purged by retention
+COMPACTION_COLLECTION = "rollup_compactions"
+
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing at (weeks start on Monday)"""
+    day = datetime(at.year, at.month, at.day)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return datetime(at.year, at.month, 1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def next_bucket(start: datetime, granularity: str) -> datetime:
+    """Start of the bucket following start"""
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(weeks=1)
+    if start.month == 12:
+        return datetime(start.year + 1, 1, 1)
+    return datetime(start.year, start.month + 1, 1)
+
+
+async def record_event(db, metric: str, at: Optional[datetime] = None):
+    """Increment the day, week and month buckets for one event"""
+    at = at or datetime.utcnow()
+    await db[ROLLUP_COLLECTION].bulk_write([
+        UpdateOne(
+            {"metric": metric, "granularity": granularity, "bucket": bucket_start(at, granularity)},
+            {"$inc": {"count": 1}},
+            upsert=True
+        )
+        for granularity in GRANULARITIES
+    ], ordered=False)
+
+
+async def get_timeseries(db, metrics: List[str], granularity: str,
+                         start: datetime, end: datetime) -> Dict[str, List[dict]]:
+    """Bucket counts for [start, end) in one query, missing buckets filled with 0"""
+    first = bucket_start(start, granularity)
+    buckets = await db[ROLLUP_COLLECTION].find(
+        {
+            "metric": {"$in": metrics},
+            "granularity": granularity,
+            "bucket": {"$gte": first, "$lt": end}
+        },
+        {"_id": 0, "metric": 1, "bucket": 1, "count": 1}
+    ).to_list(None)
+    counts = {(b["metric"], b["bucket"]): b["count"] for b in buckets}
+
+    series = {metric: [] for metric in metrics}
+    current = first
+    while current < end:
+        for metric in metrics:
+            series[metric].append({
+                "bucket": current.date().isoformat(),
+                "count": counts.get((metric, current), 0)
+            })
+        current = next_bucket(current, granularity)
+    return series
+
+
+async def compacted_until(db, metric: str) -> Optional[datetime]:
+    """Date before which raw events of metric may no longer exist"""
+    state = await db[COMPACTION_COLLECTION].find_one({"_id": metric})
+    return state["compacted_until"] if state else None
+
+
+async def mark_compacted(db, metric: str, until: datetime):
+    """Record that raw events before until may be purged"""
+    await db[COMPACTION_COLLECTION].update_one(
+        {"_id": metric},
+        {"$max": {"compacted_until": until}},
+        upsert=True
+    )
+
+
+async def backfill(db, metrics: Optional[List[str]] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None) -> Dict[str, int]:
+    """Rebuild buckets from the raw collections (idempotent, uses $set).
+
+    Buckets up to the one containing the compaction date are never rebuilt:
+    their raw events may have been purged, so only the stored counts are
+    complete.
+    """
+    written = {}
+    for metric in metrics or list(ROLLUP_METRICS):
+        collection, field = ROLLUP_METRICS[metric]
+        compacted = await compacted_until(db, metric)
+        operations = []
+        for granularity in GRANULARITIES:
+            # Align on bucket boundaries so every rebuilt bucket is complete
+            lower = bucket_start(since, granularity) if since else None
+            if compacted is not None:
+                floor = next_bucket(bucket_start(compacted, granularity), granularity)
+                lower = max(lower, floor) if lower else floor
+            upper = next_bucket(bucket_start(until, granularity), granularity) if until else None
+
+            match = {field: {"$type": "date"}}
+            if lower is not None:
+                match[field]["$gte"] = lower
+            if upper is not None:
+                match[field]["$lt"] = upper
+            unit = {"date": f"${field}", "unit": granularity}
+            if granularity == "week":
+                unit["startOfWeek"] = "monday"
+            pipeline = [
+                {"$match": match},
+                {"$group": {"_id": {"$dateTrunc": unit}, "count": {"$sum": 1}}}
+            ]
+            async for bucket in db[collection].aggregate(pipeline):
+                operations.append(UpdateOne(
+                    {"metric": metric, "granularity": granularity, "bucket": bucket["_id"]},
+                    {"$set": {"count": bucket["count"]}},
+                    upsert=True
+                ))
+        if operations:
+            await db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+        written[metric] = len(operations)
+    return written
+
+
+async def main():
+    """Command line entry point"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from indexes import ensure_indexes
+
+    parser = argparse.ArgumentParser(description="Maintain analytics rollup buckets")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--metric", action="append", choices=list(ROLLUP_METRICS),
+                        help="Metric to rebuild (repeatable, default: all)")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="Only rebuild buckets from this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    try:
+        print("🔄 Backfilling analytics rollups...")
+        await ensure_indexes(db, [ROLLUP_COLLECTION])
+        written = await backfill(db, args.metric, args.since)
+        for metric, count in written.items():
+            print(f"✅ {metric}: {count} buckets written")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,31 +1,104 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Depends, Query, Request
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 import uuid
 from datetime import datetime
 
+ROOT_DIR = Path(__file__).parent
+# Before the local imports: they read their settings (MONGO_URL, ...) at import
+load_dotenv(ROOT_DIR / '.env')
+
+# Metrics first: their MongoDB listeners only see clients created after import
+from metrics import MetricsMiddleware, render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from query_budget import QueryBudgetMiddleware
+import query_shapes  # noqa: F401  (records query shapes when QUERY_AUDIT_FILE is set)
+
 # Import admin routes, auth routes and analytics routes
 from admin_routes import admin_router
 from auth_routes import auth_router
-from analytics_routes import analytics_router
+from analytics_routes import analytics_router, dashboard_snapshot
+from resource_facets import facet_index
+from resource_trending import (
+    record_download_weight, renormalize_trending_weights, needs_renormalization, trending_score
+)
+from project_similarity import similarity_index, RELATED_TOP_K
+from rollups import record_event
+from indexes import ensure_indexes
+from report_jobs import report_runner
+from pricing import price_tables, PricingError, PRICE_FIELDS
+from status_monitor import status_monitor
+from rate_limit import rate_limit, client_ip, LoadSheddingMiddleware
+from public_cache import public_cache
+from last_known_good import fallback
+from startup import startup_state
+from file_delivery import (
+    ResourceFileResponse, resolve_resource_file, content_hash,
+    acquire_download_slot, download_slots
+)
+# Shared database handle (MongoDB or the in-memory backend, see STORAGE_BACKEND)
+from storage import db, secondary_db, close as close_storage
 
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+# Without these the app must not receive traffic; the other phases only warm caches
+REQUIRED_STARTUP_PHASES = ("indexes", "status_log", "pricing")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect, prepare the database and warm the caches, then report ready"""
+    startup_state.begin()
+    await startup_state.run("connect", db.command("ping"))
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+    async def prepare_status_log():
+        await status_monitor.ensure_capped(db)
+        await status_monitor.load(db)
+
+    async def check_pricing():
+        if price_tables is None:
+            raise RuntimeError("PRICING_TABLES_PATH is not set")
+
+    # Index builds are no-ops once they exist: warm up alongside them
+    phases = {
+        "pricing": check_pricing(),
+        "indexes": ensure_indexes(db),
+        "status_log": prepare_status_log(),
+        "public_cache": public_cache.warm(),
+        "resource_facets": facet_index.ensure_loaded(db),
+        "project_similarity": similarity_index.ensure_loaded(db),
+    }
+    results = await asyncio.gather(
+        *(startup_state.run(name, phase) for name, phase in phases.items()),
+        return_exceptions=True
+    )
+    failed = {name: result for name, result in zip(phases, results) if isinstance(result, Exception)}
+    for name, error in failed.items():
+        logger.error("Startup phase %s failed: %s", name, error)
+    dashboard_snapshot.start()
+    required_failures = [name for name in failed if name in REQUIRED_STARTUP_PHASES]
+    if required_failures:
+        # Keep answering 503 on /health/ready: the error says why
+        startup_state.error = "; ".join(f"{name}: {failed[name]}" for name in required_failures)
+    else:
+        # Caches still load on first use; keep serving
+        startup_state.mark_ready()
+    try:
+        yield
+    finally:
+        startup_state.ready = False
+        await dashboard_snapshot.stop()
+        report_runner.shutdown()
+        close_storage()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -41,7 +114,7 @@ class StatusCheckCreate(BaseModel):
     client_name: str
 
 # Quote Models
-class QuoteData(BaseModel):
+class QuoteConfiguration(BaseModel):
     project_type: str
     complexity: str
     timeline: str
@@ -49,12 +122,20 @@ class QuoteData(BaseModel):
     maintenance: bool = False
     training: bool = False
     documentation: bool = False
-    base_price: float
-    features_price: float
-    extras_price: float
-    total_price: float
-    min_price: float
-    max_price: float
+
+class QuoteData(QuoteConfiguration):
+    # Computed server-side by the pricing engine, client values are ignored.
+    # None (with needs_pricing) when the tables do not cover the configuration.
+    base_price: Optional[float] = None
+    features_price: Optional[float] = None
+    extras_price: Optional[float] = None
+    total_price: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    needs_pricing: bool = False
+
+class QuoteEstimateBatch(BaseModel):
+    configurations: List[QuoteConfiguration] = Field(max_length=5000)
 
 class ContactInfo(BaseModel):
     name: str
@@ -165,24 +246,80 @@ class PendingTestimonial(BaseModel):
 async def root():
     return {"message": "Hello World"}
 
-@api_router.post("/status", response_model=StatusCheck)
+@api_router.post("/status", response_model=StatusCheck, dependencies=[Depends(rate_limit("status"))])
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
     _ = await db.status_checks.insert_one(status_obj.dict())
+    status_monitor.record(status_obj.dict())
     return status_obj
 
-@api_router.get("/status", response_model=List[StatusCheck])
+@api_router.get("/status", responses={200: {"model": List[StatusCheck]}})
 async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+    """Recent status checks, served from the in-memory ring buffer"""
+    return JSONResponse(status_monitor.recent_checks())
+
+@api_router.get("/status/clients")
+async def get_status_clients():
+    """Last status check time and check count per client_name"""
+    return status_monitor.client_summary()
 
 # Quote endpoints
-@api_router.post("/quotes", response_model=Quote)
+def require_price_tables():
+    """The pricing tables, or 503 when PRICING_TABLES_PATH is not configured"""
+    from fastapi import HTTPException
+    if price_tables is None:
+        raise HTTPException(status_code=503, detail="Quote pricing is not configured")
+    return price_tables
+
+def price_quote_data(quote_data: dict, stored: Optional[dict] = None) -> dict:
+    """Replace client-side prices with the pricing engine's.
+
+    A configuration the tables do not cover is never priced by the client:
+    it keeps the prices already stored for the quote (updates of legacy
+    quotes), or none at all, and is flagged for manual pricing.
+    """
+    tables = require_price_tables()
+    try:
+        quote_data.update(tables.estimate(quote_data), needs_pricing=False)
+    except PricingError as e:
+        logger.warning("Quote left for manual pricing: %s", e)
+        stored = stored or {}
+        quote_data.update({field: stored.get(field) for field in PRICE_FIELDS})
+        quote_data["needs_pricing"] = stored.get("total_price") is None
+    return quote_data
+
+@api_router.get("/quotes/pricing")
+async def get_quote_pricing():
+    """Price tables used by the quote wizard"""
+    return require_price_tables().tables
+
+@api_router.post("/quotes/estimate")
+async def estimate_quote(configuration: QuoteConfiguration):
+    """Price a single quote configuration"""
+    from fastapi import HTTPException
+    try:
+        return require_price_tables().estimate(configuration.dict())
+    except PricingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/quotes/estimate/batch")
+async def estimate_quotes_batch(batch: QuoteEstimateBatch):
+    """Price many configurations in one call (live preview of the quote wizard)"""
+    from fastapi import HTTPException
+    try:
+        estimates = require_price_tables().estimate_many([config.dict() for config in batch.configurations])
+    except PricingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(estimates), "estimates": estimates}
+
+@api_router.post("/quotes", response_model=Quote, dependencies=[Depends(rate_limit("quotes"))])
 async def create_quote(quote_input: QuoteCreate):
     quote_dict = quote_input.dict()
+    price_quote_data(quote_dict["quote_data"])
     quote_obj = Quote(**quote_dict)
     _ = await db.quotes.insert_one(quote_obj.dict())
+    await record_event(db, "quotes", quote_obj.created_at)
     return quote_obj
 
 @api_router.get("/quotes", response_model=List[Quote])
@@ -200,7 +337,12 @@ async def get_quote(quote_id: str):
 
 @api_router.put("/quotes/{quote_id}", response_model=Quote)
 async def update_quote(quote_id: str, quote_input: QuoteCreate):
+    from fastapi import HTTPException
+    existing = await db.quotes.find_one({"id": quote_id}, {"quote_data": 1})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Quote not found")
     quote_dict = quote_input.dict()
+    price_quote_data(quote_dict["quote_data"], stored=existing.get("quote_data"))
     quote_dict["updated_at"] = datetime.utcnow()
     
     result = await db.quotes.update_one(
@@ -209,18 +351,18 @@ async def update_quote(quote_id: str, quote_input: QuoteCreate):
     )
     
     if result.matched_count == 0:
-        from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Quote not found")
     
     updated_quote = await db.quotes.find_one({"id": quote_id})
     return Quote(**updated_quote)
 
 # Booking endpoints
-@api_router.post("/bookings", response_model=Booking)
+@api_router.post("/bookings", response_model=Booking, dependencies=[Depends(rate_limit("bookings"))])
 async def create_booking(booking_input: BookingCreate):
     booking_dict = booking_input.dict()
     booking_obj = Booking(**booking_dict)
     _ = await db.bookings.insert_one(booking_obj.dict())
+    await record_event(db, "bookings", booking_obj.created_at)
     return booking_obj
 
 @api_router.get("/bookings", response_model=List[Booking])
@@ -244,28 +386,109 @@ async def get_availability(date: str):
         "status": {"$ne": "cancelled"}
     }).to_list(100)
     
+    return availability(date, bookings)
+
+# All possible time slots
+BOOKING_SLOTS = (
+    '09:00', '09:30', '10:00', '10:30', '11:00', '11:30',
+    '14:00', '14:30', '15:00', '15:30', '16:00', '16:30', '17:00'
+)
+
+def availability(date: str, bookings: List[dict]) -> dict:
+    """Split the day's slots into available and booked ones"""
     booked_times = [booking["booking_data"]["time"] for booking in bookings]
-    
-    # All possible time slots
-    all_slots = [
-        '09:00', '09:30', '10:00', '10:30', '11:00', '11:30',
-        '14:00', '14:30', '15:00', '15:30', '16:00', '16:30', '17:00'
-    ]
-    
-    available_slots = [slot for slot in all_slots if slot not in booked_times]
-    
+    booked = set(booked_times)
     return {
         "date": date,
-        "available_slots": available_slots,
+        "available_slots": [slot for slot in BOOKING_SLOTS if slot not in booked],
         "booked_slots": booked_times
     }
 
 # Resource endpoints
+RESOURCE_SORTS = {
+    "recent": "created_at",
+    "trending": "trending_weight",
+    "downloads": "downloads",
+    "rating": "rating"
+}
+ResourceSort = Literal["recent", "trending", "downloads", "rating"]
+
 @api_router.get("/resources", response_model=List[Resource])
-async def get_resources():
-    resources = await db.resources.find().sort("created_at", -1).to_list(100)
+@fallback("resources")
+async def get_resources(sort: ResourceSort = "recent"):
+    if sort == "trending":
+        resources = await find_trending_resources({}, 100)
+    else:
+        resources = await db.resources.find().sort(RESOURCE_SORTS[sort], -1).to_list(100)
     return [Resource(**resource) for resource in resources]
 
+async def find_trending_resources(filter: dict, limit: int) -> List[dict]:
+    """Resources by trending weight, once the weights are all on the current epoch"""
+    if needs_renormalization():
+        await renormalize_resource_weights()
+    resources = await db.resources.find(filter).sort("trending_weight", -1).to_list(limit)
+    # Weights another process stored on an earlier epoch would rank too high
+    if needs_renormalization(resources):
+        await renormalize_resource_weights()
+        resources = await db.resources.find(filter).sort("trending_weight", -1).to_list(limit)
+    return resources
+
+@api_router.get("/resources/trending", response_model=List[dict])
+@fallback("resources")
+async def get_trending_resources(limit: int = Query(10, ge=1, le=100)):
+    """Get resources ranked by exponentially decayed download activity"""
+    resources = await find_trending_resources({"trending_weight": {"$gt": 0}}, limit)
+    
+    now = datetime.utcnow()
+    trending = []
+    for resource in resources:
+        resource.pop("_id", None)
+        resource["trending_score"] = round(
+            trending_score(resource["trending_weight"], resource.get("trending_epoch"), now), 3)
+        trending.append(resource)
+    return trending
+
+@api_router.get("/resources/facets")
+async def get_resource_facets(
+    category: Optional[List[str]] = Query(None),
+    type: Optional[List[str]] = Query(None),
+    difficulty: Optional[List[str]] = Query(None),
+    tags: Optional[List[str]] = Query(None),
+    featured: Optional[bool] = None,
+    sort: ResourceSort = "recent",
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """Filter resources and return the count per facet value"""
+    await facet_index.ensure_loaded(db)
+    
+    filters = {
+        "category": category,
+        "type": type,
+        "difficulty": difficulty,
+        "tags": tags,
+        "featured": None if featured is None else [featured]
+    }
+    matched, facets = facet_index.query(filters)
+    sort_field = RESOURCE_SORTS[sort]
+    if sort == "trending":
+        # Weights may be on different epochs: compare the decayed scores
+        now = datetime.utcnow()
+        matched.sort(key=lambda resource: trending_score(
+            resource.get("trending_weight") or 0.0, resource.get("trending_epoch"), now), reverse=True)
+    else:
+        default = datetime.min if sort_field == "created_at" else 0
+        matched.sort(key=lambda resource: resource.get(sort_field) or default, reverse=True)
+    
+    # JSON object keys must be strings
+    facets["featured"] = {str(value).lower(): count for value, count in facets["featured"].items()}
+    
+    return {
+        "total": len(matched),
+        "resources": matched[skip:skip + limit],
+        "facets": facets
+    }
+
 @api_router.get("/resources/{resource_id}", response_model=Resource)
 async def get_resource(resource_id: str):
     resource = await db.resources.find_one({"id": resource_id})
@@ -274,33 +497,81 @@ async def get_resource(resource_id: str):
         raise HTTPException(status_code=404, detail="Resource not found")
     return Resource(**resource)
 
-@api_router.post("/resources/{resource_id}/download")
-async def download_resource(resource_id: str, user_email: Optional[str] = None):
-    from fastapi import Request, HTTPException
+async def record_resource_download(resource_id: str, user_email: Optional[str], ip_address: Optional[str]):
+    """Store the download event and bump the resource counters"""
+    download_record = ResourceDownload(
+        resource_id=resource_id,
+        user_email=user_email,
+        ip_address=ip_address
+    )
+    await db.resource_downloads.insert_one(download_record.dict())
+    await record_event(db, "downloads", download_record.downloaded_at)
+    
+    # Increment download count and decayed trending weight
+    if needs_renormalization():
+        await renormalize_resource_weights()
+    assigned, increments = await record_download_weight(db, resource_id, download_record.downloaded_at)
+    facet_index.assign(resource_id, assigned)
+    facet_index.increment(resource_id, increments)
+
+async def renormalize_resource_weights():
+    """Move the stored trending weights to the current epoch (start of an era)"""
+    for resource_id, fields in (await renormalize_trending_weights(db)).items():
+        facet_index.assign(resource_id, fields)
+
+@api_router.post("/resources/{resource_id}/download", dependencies=[Depends(rate_limit("downloads"))])
+async def download_resource(resource_id: str, request: Request, user_email: Optional[str] = None):
+    from fastapi import HTTPException
     
     # Check if resource exists
     resource = await db.resources.find_one({"id": resource_id})
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
     
-    # Record download
-    download_record = ResourceDownload(
-        resource_id=resource_id,
-        user_email=user_email
-    )
-    await db.resource_downloads.insert_one(download_record.dict())
-    
-    # Increment download count
-    await db.resources.update_one(
-        {"id": resource_id},
-        {"$inc": {"downloads": 1}}
-    )
+    await record_resource_download(resource_id, user_email, client_ip(request))
     
     # Return clean resource data without MongoDB ObjectId
     clean_resource = Resource(**resource)
     return {"message": "Download recorded", "resource": clean_resource.dict()}
 
-@api_router.post("/newsletter/subscribe")
+@api_router.get("/resources/{resource_id}/download", dependencies=[Depends(rate_limit("downloads"))])
+@api_router.head("/resources/{resource_id}/download")
+async def stream_resource_file(resource_id: str, request: Request, user_email: Optional[str] = None):
+    """Serve the resource file (Range, conditional requests, zero-copy when available)"""
+    from fastapi import HTTPException
+    from fastapi.responses import RedirectResponse
+    
+    resource = await db.resources.find_one({"id": resource_id})
+    if not resource:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    
+    path = resolve_resource_file(resource.get("file_path"))
+    if path is None:
+        if resource.get("download_url"):
+            return RedirectResponse(resource["download_url"], status_code=307)
+        raise HTTPException(status_code=404, detail="File not available")
+    
+    if not await acquire_download_slot():
+        raise HTTPException(status_code=503, detail="Too many downloads in progress", headers={"Retry-After": "5"})
+    
+    # Until the response is handed over (it releases the slot once sent),
+    # any failure or cancellation must give the slot back
+    try:
+        stat_result = path.stat()
+        etag = f'"{await content_hash(path, stat_result)}"'
+        response = ResourceFileResponse(
+            path, stat_result, etag, path.name, request.headers,
+            method=request.method, on_complete=download_slots.release
+        )
+        # Count a download once, not for every chunk, probe or revalidation
+        if request.method == "GET" and response.is_full_download:
+            await record_resource_download(resource_id, user_email, client_ip(request))
+        return response
+    except BaseException:
+        download_slots.release()
+        raise
+
+@api_router.post("/newsletter/subscribe", dependencies=[Depends(rate_limit("newsletter"))])
 async def subscribe_newsletter(subscription: NewsletterSubscribe):
     # Check if already subscribed
     existing = await db.newsletter_subscriptions.find_one({"email": subscription.email})
@@ -311,15 +582,17 @@ async def subscribe_newsletter(subscription: NewsletterSubscribe):
     # Create new subscription
     sub_record = NewsletterSubscription(email=subscription.email)
     await db.newsletter_subscriptions.insert_one(sub_record.dict())
+    await record_event(db, "subscriptions", sub_record.subscribed_at)
     
     return {"message": "Successfully subscribed to newsletter", "status": "new"}
 
-@api_router.post("/testimonials/submit")
+@api_router.post("/testimonials/submit", dependencies=[Depends(rate_limit("testimonials"))])
 async def submit_testimonial(testimonial: PublicTestimonialSubmission):
     """Submit a testimonial from public user"""
     testimonial_dict = testimonial.dict()
     testimonial_obj = PendingTestimonial(**testimonial_dict)
     await db.pending_testimonials.insert_one(testimonial_obj.dict())
+    await record_event(db, "testimonials", testimonial_obj.submitted_at)
     
     return {"message": "Témoignage soumis avec succès. Il sera examiné avant publication.", "status": "submitted"}
 
@@ -408,6 +681,9 @@ async def init_default_resources():
         resources_to_insert.append(resource.dict())
     
     result = await db.resources.insert_many(resources_to_insert)
+    for resource in resources_to_insert:
+        facet_index.upsert(resource)
+    public_cache.invalidate("resources")
     
     return {
         "message": "Default resources initialized successfully",
@@ -424,9 +700,10 @@ api_router.include_router(analytics_router)
 # These endpoints are used to feed the public portfolio
 
 @api_router.get("/public/personal", response_model=dict)
+@public_cache.cached("personal_info")
 async def get_public_personal_info():
     """Get personal information for public portfolio"""
-    personal = await db.personal_info.find_one()
+    personal = await secondary_db.personal_info.find_one()
     if not personal:
         return {}
     # Remove MongoDB _id field for JSON serialization
@@ -434,173 +711,125 @@ async def get_public_personal_info():
     return personal
 
 @api_router.get("/public/skills", response_model=List[dict])
+@public_cache.cached("skill_categories")
 async def get_public_skills():
     """Get skills for public portfolio"""
-    skills = await db.skill_categories.find().to_list(100)
+    skills = await secondary_db.skill_categories.find().to_list(100)
     # Remove MongoDB _id fields
     return [{k: v for k, v in skill.items() if k != "_id"} for skill in skills]
 
 @api_router.get("/public/technologies", response_model=List[dict])
+@public_cache.cached("technologies")
 async def get_public_technologies():
     """Get technologies for public portfolio"""
-    techs = await db.technologies.find().sort("name", 1).to_list(100)
+    techs = await secondary_db.technologies.find().sort("name", 1).to_list(100)
     return [{k: v for k, v in tech.items() if k != "_id"} for tech in techs]
 
 @api_router.get("/public/projects", response_model=List[dict])
+@public_cache.cached("projects")
 async def get_public_projects():
     """Get projects for public portfolio"""
-    projects = await db.projects.find().sort("order_index", 1).to_list(100)
+    projects = await secondary_db.projects.find().sort("order_index", 1).to_list(100)
     return [{k: v for k, v in project.items() if k != "_id"} for project in projects]
 
+@api_router.get("/public/projects/{project_id}/related", response_model=List[dict])
+async def get_related_projects(project_id: str, limit: int = Query(3, ge=1, le=RELATED_TOP_K)):
+    """Get the projects most similar to a project (technologies and category)"""
+    from fastapi import HTTPException
+    
+    await similarity_index.ensure_loaded(secondary_db)
+    related = similarity_index.related(project_id, limit)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return [{**project, "similarity": round(score, 3)} for project, score in related]
+
 @api_router.get("/public/services", response_model=List[dict])
+@public_cache.cached("services")
 async def get_public_services():
     """Get services for public portfolio"""
-    services = await db.services.find().sort("order_index", 1).to_list(100)
+    services = await secondary_db.services.find().sort("order_index", 1).to_list(100)
     return [{k: v for k, v in service.items() if k != "_id"} for service in services]
 
 @api_router.get("/public/testimonials", response_model=List[dict])
+@public_cache.cached("testimonials")
 async def get_public_testimonials():
     """Get testimonials for public portfolio"""
-    testimonials = await db.testimonials.find().sort("order_index", 1).to_list(100)
+    testimonials = await secondary_db.testimonials.find().sort("order_index", 1).to_list(100)
     return [{k: v for k, v in testimonial.items() if k != "_id"} for testimonial in testimonials]
 
 @api_router.get("/public/statistics", response_model=List[dict])
+@public_cache.cached(
+    # Every collection the analytics calculators read
+    "projects", "blog_posts", "technologies", "testimonials", "pending_testimonials", "resources",
+    "services", "skill_categories", "bookings", "quotes", "newsletter_subscriptions"
+)
 async def get_public_statistics():
     """Get curated statistics for public portfolio - only the most impressive ones"""
-    try:
-        # Import analytics functions
-        from analytics_routes import (
-            calculate_content_stats, 
-            calculate_engagement_stats, 
-            calculate_technical_stats, 
-            calculate_business_stats
-        )
-        
-        # Calculate all statistics
-        all_stats = []
-        try:
-            content_stats = await calculate_content_stats()
-            all_stats.extend(content_stats)
-        except:
-            pass
-            
-        try:
-            engagement_stats = await calculate_engagement_stats()
-            all_stats.extend(engagement_stats)
-        except:
-            pass
-            
-        try:
-            technical_stats = await calculate_technical_stats()
-            all_stats.extend(technical_stats)
-        except:
-            pass
-            
-        try:
-            business_stats = await calculate_business_stats()
-            all_stats.extend(business_stats)
-        except:
-            pass
-        
-        # Select only the most impressive statistics for public display
-        public_worthy_stats = []
-        
-        for stat in all_stats:
-            value = int(stat.value) if stat.value.isdigit() else 0
-            
-            # Criteria for public display - only show impressive numbers
-            show_stat = False
-            
-            if stat.title == "Projets Totaux" and value >= 1:
-                show_stat = True
-            elif stat.title == "Taux d'Achèvement" and value >= 85:
-                show_stat = True
-            elif stat.title == "Articles Publiés" and value >= 3:
-                show_stat = True
-            elif stat.title == "Technologies" and value >= 5:
-                show_stat = True
-            elif stat.title == "Témoignages" and value >= 3:
-                show_stat = True
-            elif stat.title == "Niveau Expert" and value >= 1:
-                show_stat = True
-            elif stat.title == "Services" and value >= 2:
-                show_stat = True
-            elif stat.title == "Téléchargements" and value >= 100:
-                show_stat = True
-            elif stat.title == "Réservations" and value >= 5:
-                show_stat = True
-            elif stat.title == "Note Moyenne" and value >= 4:
-                show_stat = True
-            elif stat.title == "Abonnés Newsletter" and value >= 50:
-                show_stat = True
-            elif stat.title == "Compétences" and value >= 10:
-                show_stat = True
-            
-            if show_stat:
-                public_worthy_stats.append({
-                    "title": stat.title,
-                    "value": stat.value,
-                    "suffix": stat.suffix,
-                    "description": stat.description,
-                    "icon": stat.icon,
-                    "color": stat.color,
-                    "order_index": len(public_worthy_stats)
-                })
+    # Import analytics functions
+    from analytics_routes import (
+        calculate_content_stats, 
+        calculate_engagement_stats, 
+        calculate_technical_stats, 
+        calculate_business_stats
+    )
+    
+    # Calculate all statistics; a failing query is left to the circuit breakers,
+    # which serve the last good payload instead of partial numbers
+    all_stats = []
+    all_stats.extend(await calculate_content_stats())
+    all_stats.extend(await calculate_engagement_stats())
+    all_stats.extend(await calculate_technical_stats())
+    all_stats.extend(await calculate_business_stats())
+    
+    # Select only the most impressive statistics for public display
+    public_worthy_stats = []
+    
+    for stat in all_stats:
+        value = int(stat.value) if stat.value.isdigit() else 0
         
-        # If we don't have enough impressive stats, add some default professional ones
-        if len(public_worthy_stats) < 3:
-            # Add some baseline professional stats
-            default_stats = [
-                {
-                    "title": "Années d'Expérience",
-                    "value": "5",
-                    "suffix": "+",
-                    "description": "Années d'expertise en cybersécurité",
-                    "icon": "Award",
-                    "color": "#10b981",
-                    "order_index": 0
-                },
-                {
-                    "title": "Projets Sécurisés", 
-                    "value": "20",
-                    "suffix": "+",
-                    "description": "Infrastructures sécurisées avec succès",
-                    "icon": "Shield",
-                    "color": "#3b82f6",
-                    "order_index": 1
-                },
-                {
-                    "title": "Certifications",
-                    "value": "3",
-                    "suffix": "",
-                    "description": "Certifications professionnelles obtenues",
-                    "icon": "Award",
-                    "color": "#f59e0b",
-                    "order_index": 2
-                },
-                {
-                    "title": "Satisfaction Client",
-                    "value": "100",
-                    "suffix": "%",
-                    "description": "Taux de satisfaction des clients",
-                    "icon": "Star",
-                    "color": "#10b981",
-                    "order_index": 3
-                }
-            ]
-            
-            # Merge with existing stats, avoiding duplicates
-            existing_titles = {stat["title"] for stat in public_worthy_stats}
-            for default_stat in default_stats:
-                if default_stat["title"] not in existing_titles and len(public_worthy_stats) < 4:
-                    public_worthy_stats.append(default_stat)
+        # Criteria for public display - only show impressive numbers
+        show_stat = False
         
-        # Limit to top 4 most impressive stats for clean display
-        return public_worthy_stats[:4]
+        if stat.title == "Projets Totaux" and value >= 1:
+            show_stat = True
+        elif stat.title == "Taux d'Achèvement" and value >= 85:
+            show_stat = True
+        elif stat.title == "Articles Publiés" and value >= 3:
+            show_stat = True
+        elif stat.title == "Technologies" and value >= 5:
+            show_stat = True
+        elif stat.title == "Témoignages" and value >= 3:
+            show_stat = True
+        elif stat.title == "Niveau Expert" and value >= 1:
+            show_stat = True
+        elif stat.title == "Services" and value >= 2:
+            show_stat = True
+        elif stat.title == "Téléchargements" and value >= 100:
+            show_stat = True
+        elif stat.title == "Réservations" and value >= 5:
+            show_stat = True
+        elif stat.title == "Note Moyenne" and value >= 4:
+            show_stat = True
+        elif stat.title == "Abonnés Newsletter" and value >= 50:
+            show_stat = True
+        elif stat.title == "Compétences" and value >= 10:
+            show_stat = True
         
-    except Exception as e:
-        # Fallback to professional default stats if there's an error
-        return [
+        if show_stat:
+            public_worthy_stats.append({
+                "title": stat.title,
+                "value": stat.value,
+                "suffix": stat.suffix,
+                "description": stat.description,
+                "icon": stat.icon,
+                "color": stat.color,
+                "order_index": len(public_worthy_stats)
+            })
+    
+    # If we don't have enough impressive stats, add some default professional ones
+    if len(public_worthy_stats) < 3:
+        # Add some baseline professional stats
+        default_stats = [
             {
                 "title": "Années d'Expérience",
                 "value": "5",
@@ -611,8 +840,8 @@ async def get_public_statistics():
                 "order_index": 0
             },
             {
-                "title": "Projets Sécurisés",
-                "value": "20", 
+                "title": "Projets Sécurisés", 
+                "value": "20",
                 "suffix": "+",
                 "description": "Infrastructures sécurisées avec succès",
                 "icon": "Shield",
@@ -623,7 +852,7 @@ async def get_public_statistics():
                 "title": "Certifications",
                 "value": "3",
                 "suffix": "",
-                "description": "Certifications professionnelles obtenues", 
+                "description": "Certifications professionnelles obtenues",
                 "icon": "Award",
                 "color": "#f59e0b",
                 "order_index": 2
@@ -633,30 +862,45 @@ async def get_public_statistics():
                 "value": "100",
                 "suffix": "%",
                 "description": "Taux de satisfaction des clients",
-                "icon": "Star", 
+                "icon": "Star",
                 "color": "#10b981",
                 "order_index": 3
             }
         ]
+        
+        # Merge with existing stats, avoiding duplicates
+        existing_titles = {stat["title"] for stat in public_worthy_stats}
+        for default_stat in default_stats:
+            if default_stat["title"] not in existing_titles and len(public_worthy_stats) < 4:
+                public_worthy_stats.append(default_stat)
+    
+    # Limit to top 4 most impressive stats for clean display
+    return public_worthy_stats[:4]
 
 @api_router.get("/public/social-links", response_model=List[dict])
+@public_cache.cached("social_links")
 async def get_public_social_links():
     """Get social links for public portfolio"""
-    links = await db.social_links.find().sort("order_index", 1).to_list(100)
+    links = await secondary_db.social_links.find().sort("order_index", 1).to_list(100)
     return [{k: v for k, v in link.items() if k != "_id"} for link in links]
 
 @api_router.get("/public/process-steps", response_model=List[dict])
+@public_cache.cached("process_steps")
 async def get_public_process_steps():
     """Get process steps for public portfolio"""
-    steps = await db.process_steps.find().sort("step", 1).to_list(100)
+    steps = await secondary_db.process_steps.find().sort("step", 1).to_list(100)
     return [{k: v for k, v in step.items() if k != "_id"} for step in steps]
 
 @api_router.get("/public/blog", response_model=List[dict])
+@public_cache.cached("blog_posts")
 async def get_public_blog_posts():
     """Get published blog posts for public blog"""
-    posts = await db.blog_posts.find({"published": True}).sort("created_at", -1).to_list(100)
+    posts = await secondary_db.blog_posts.find({"published": True}).sort("created_at", -1).to_list(100)
     return [{k: v for k, v in post.items() if k != "_id"} for post in posts]
 
+# Shed load before any work is done; added first so CORS still wraps the 503s
+app.add_middleware(LoadSheddingMiddleware)
+
 # Configure CORS middleware BEFORE including routers (CRITICAL FIX)
 app.add_middleware(
     CORSMiddleware,
@@ -666,9 +910,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request MongoDB command count and time (Server-Timing, budget warnings)
+app.add_middleware(QueryBudgetMiddleware)
+
+# Outermost, so shed and CORS-rejected requests are measured too
+app.add_middleware(MetricsMiddleware)
+
 # Include the router in the main app AFTER CORS configuration
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus scrape endpoint (bearer METRICS_TOKEN when set)"""
+    from fastapi import HTTPException
+    from fastapi.responses import Response
+
+    token = os.environ.get("METRICS_TOKEN")
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -676,6 +937,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    """The process is up (no dependency is checked)"""
+    return {"status": "alive"}
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness():
+    """Ready once connected, with indexes ensured and caches warm"""
+    if not startup_state.ready:
+        status = "failed" if startup_state.error else "starting"
+        return JSONResponse(status_code=503, content={"status": status, **startup_state.report()})
+    return {"status": "ready", **startup_state.report()}
@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+import bson
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+# Collections hash into this many version counters; a collision only costs
+# an extra rebuild
+VERSION_SLOTS = 256
+VERSION = struct.Struct("<Q")
+# magic, stamp (sum of the dependencies' versions), built at (epoch), body length
+HEADER = struct.Struct("<4sQdQ")
+MAGIC = b"PCv1"
+
+
+def default_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"{os.environ.get('DB_NAME', 'test_database')}-public-cache")
+
+
+class PayloadResponse(Response):
+    """Pre-rendered JSON body (bytes or a view on a shared mapping), sent without copying"""
+
+    media_type = "application/json"
+
+    def __init__(self, body: Union[bytes, memoryview], status_code: int = 200,
+                 headers: Optional[Dict[str, str]] = None, background: Optional[BackgroundTask] = None):
+        # Response.render() only takes str/bytes: set the body directly
+        self.status_code = status_code
+        self.background = background
+        self.body = body
+        self.init_headers(headers)
+
+
+class SharedPayloadStore:
+    """Serialized payloads in memory-mapped files shared by every worker of a host.
+
+    Each payload file starts with the stamp of the collection versions it
+    was built from. Writers bump the versions (one mmap'd counter file, under
+    flock), so every worker sees a write at its next read; payloads are
+    replaced atomically with rename, and readers keep serving the mapping
+    they opened until they notice the new stamp. A bump also records the
+    writer's cluster and operation times, which any worker rebuilding the
+    payload must read after.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "versions")
+        self._versions_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._exclusive():
+            if os.fstat(self._versions_fd).st_size < VERSION_SLOTS * VERSION.size:
+                os.ftruncate(self._versions_fd, VERSION_SLOTS * VERSION.size)
+        self._versions = mmap.mmap(self._versions_fd, VERSION_SLOTS * VERSION.size)
+        # key -> ((inode, mtime), mapping): reopened only when the file was replaced
+        self._mappings: Dict[str, Tuple[Tuple[int, int], mmap.mmap]] = {}
+
+    @contextmanager
+    def _exclusive(self):
+        fcntl.flock(self._versions_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._versions_fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _slot(collection: str) -> int:
+        return zlib.crc32(collection.encode()) % VERSION_SLOTS
+
+    def stamp(self, collections: Iterable[str]) -> int:
+        """Versions only grow, so their sum changes whenever one of them does"""
+        slots = {self._slot(collection) for collection in collections}
+        return sum(VERSION.unpack_from(self._versions, slot * VERSION.size)[0] for slot in slots)
+
+    def bump(self, collections: Iterable[str], cluster_time: Optional[Dict[str, Any]] = None, operation_time=None):
+        """Invalidate, for every worker, the payloads built from these collections"""
+        with self._exclusive():
+            if cluster_time is not None or operation_time is not None:
+                self._write_causal_times(cluster_time, operation_time)
+            for slot in {self._slot(collection) for collection in collections}:
+                offset = slot * VERSION.size
+                VERSION.pack_into(self._versions, offset, VERSION.unpack_from(self._versions, offset)[0] + 1)
+
+    def _write_causal_times(self, cluster_time: Optional[Dict[str, Any]], operation_time):
+        # Under the lock: keep the later times of the stored ones and these
+        stored_cluster_time, stored_operation_time = self.causal_times()
+        if stored_cluster_time is not None and (
+                cluster_time is None or stored_cluster_time["clusterTime"] > cluster_time["clusterTime"]):
+            cluster_time = stored_cluster_time
+        if stored_operation_time is not None and (operation_time is None or stored_operation_time > operation_time):
+            operation_time = stored_operation_time
+        self._replace("causal", bson.encode({"cluster_time": cluster_time, "operation_time": operation_time}))
+
+    def causal_times(self) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """(cluster time, operation time) of the latest write that bumped the versions"""
+        try:
+            with open(os.path.join(self.directory, "causal"), "rb") as handle:
+                times = bson.decode(handle.read())
+        except FileNotFoundError:
+            return None, None
+        return times.get("cluster_time"), times.get("operation_time")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.payload")
+
+    def read(self, key: str, stamp: int, ttl: float) -> Optional[memoryview]:
+        """The payload's bytes if built from these versions less than ttl ago"""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        cached = self._mappings.get(key)
+        if cached is None or cached[0] != identity:
+            with open(path, "rb") as handle:
+                mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            # The previous mapping is released with the last response using it
+            self._mappings[key] = cached = (identity, mapping)
+        mapping = cached[1]
+        magic, payload_stamp, built_at, length = HEADER.unpack_from(mapping)
+        if magic != MAGIC or payload_stamp != stamp or time.time() - built_at >= ttl:
+            return None
+        return memoryview(mapping)[HEADER.size:HEADER.size + length]
+
+    def write(self, key: str, stamp: int, body: bytes):
+        """Publish a payload built from the given versions"""
+        self._replace(f"{key}.payload", HEADER.pack(MAGIC, stamp, time.time(), len(body)) + body)
+
+    def _replace(self, name: str, content: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{name}.")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(content)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
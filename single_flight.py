@@ -0,0 +1,35 @@
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+
+from metrics import single_flight_calls_total
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight computation.
+
+    The first caller starts the computation as a task; callers arriving
+    before it finishes await the same task instead of recomputing. A caller
+    that is cancelled does not cancel the computation for the others, and
+    nothing is kept once it is done (caching is the caller's business).
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            single_flight_calls_total.inc(group=self.group, role="leader")
+            task = asyncio.ensure_future(compute())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            single_flight_calls_total.inc(group=self.group, role="coalesced")
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,53 @@
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Dict, Optional
+import logging
+import time
+
+from metrics import startup_phase_duration_seconds
+
+
+logger = logging.getLogger(__name__)
+
+
+class StartupState:
+    """Startup phases, their timings and whether the app is ready for traffic"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}  # phase -> seconds
+        self.started_at = time.monotonic()
+        self.ready = False
+        self.ready_after: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def begin(self):
+        self.__init__()
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.phases[name] = round(elapsed, 4)
+            startup_phase_duration_seconds.set(elapsed, phase=name)
+            logger.info("Startup phase %s: %.1f ms", name, elapsed * 1000)
+
+    async def run(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        async with self.phase(name):
+            return await awaitable
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_after = round(time.monotonic() - self.started_at, 4)
+        logger.info("Ready after %.1f ms (%s)", self.ready_after * 1000,
+                    ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items()))
+
+    def report(self) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"ready": self.ready, "ready_after_s": self.ready_after, "phases_s": self.phases}
+        if self.error:
+            report["error"] = self.error
+        return report
+
+
+startup_state = StartupState()
@@ -0,0 +1,96 @@
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List
+import logging
+import os
+
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import OperationFailure
+
+
+# Capped collection bounds: the oldest checks are overwritten in place
+STATUS_CAPPED_SIZE_BYTES = int(os.environ.get("STATUS_CAPPED_SIZE_BYTES", str(16 * 1024 * 1024)))
+STATUS_CAPPED_MAX_DOCS = int(os.environ.get("STATUS_CAPPED_MAX_DOCS", "100000"))
+# Recent checks kept in memory for GET /status
+STATUS_RING_SIZE = int(os.environ.get("STATUS_RING_SIZE", "1000"))
+
+STATUS_COLLECTION = "status_checks"
+
+logger = logging.getLogger(__name__)
+
+
+class StatusMonitor:
+    """Ring buffer of recent status checks plus last-seen per client.
+
+    Each worker process keeps its own buffer, primed from the capped
+    collection at startup and fed by the checks it records.
+    """
+
+    def __init__(self, size: int = STATUS_RING_SIZE):
+        # Kept JSON-ready: GET /status sends the buffer as is
+        self.recent: deque = deque(maxlen=size)
+        self.clients: Dict[str, Dict[str, Any]] = {}
+
+    async def ensure_capped(self, db):
+        """Create status_checks as a capped collection (a legacy one is left to migrate_status_checks.py)"""
+        names = await db.list_collection_names(filter={"name": STATUS_COLLECTION})
+        if not names:
+            try:
+                await db.create_collection(
+                    STATUS_COLLECTION, capped=True,
+                    size=STATUS_CAPPED_SIZE_BYTES, max=STATUS_CAPPED_MAX_DOCS
+                )
+            except OperationFailure as e:
+                # NamespaceExists: another worker created it first
+                if e.code != 48:
+                    raise
+            return
+        options = await db[STATUS_COLLECTION].options()
+        if not options.get("capped"):
+            logger.warning("%s is not capped: run migrate_status_checks.py to convert it", STATUS_COLLECTION)
+
+    async def convert_to_capped(self, db):
+        """Convert a legacy status_checks collection; only the newest checks that fit are kept"""
+        await db.command("convertToCapped", STATUS_COLLECTION, size=STATUS_CAPPED_SIZE_BYTES)
+
+    async def load(self, db):
+        """Prime the buffer and the per-client summary from MongoDB"""
+        maxlen = self.recent.maxlen
+        latest = await db[STATUS_COLLECTION].find({}, {"_id": 0}).sort("$natural", -1).to_list(maxlen)
+        self.recent.clear()
+        self.recent.extend(jsonable_encoder(latest[::-1]))
+
+        clients = await db[STATUS_COLLECTION].aggregate([
+            {"$group": {
+                "_id": "$client_name",
+                "last_seen": {"$max": "$timestamp"},
+                "count": {"$sum": 1}
+            }}
+        ]).to_list(None)
+        self.clients = {
+            c["_id"]: {"client_name": c["_id"], "last_seen": c["last_seen"], "count": c["count"]}
+            for c in clients
+        }
+
+    def record(self, check: Dict[str, Any]):
+        """Add a freshly inserted check"""
+        self.recent.append(jsonable_encoder(check))
+        client = self.clients.get(check["client_name"])
+        if client is None:
+            client = self.clients[check["client_name"]] = {
+                "client_name": check["client_name"], "last_seen": None, "count": 0
+            }
+        client["count"] += 1
+        if client["last_seen"] is None or check["timestamp"] > client["last_seen"]:
+            client["last_seen"] = check["timestamp"]
+
+    def recent_checks(self) -> List[Dict[str, Any]]:
+        """Recent checks, oldest first, JSON-ready"""
+        return list(self.recent)
+
+    def client_summary(self) -> List[Dict[str, Any]]:
+        """Last check per client, most recently seen first"""
+        return sorted(self.clients.values(), key=lambda c: c["last_seen"] or datetime.min, reverse=True)
+
+
+status_monitor = StatusMonitor()
@@ -0,0 +1,225 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Protocol
+import functools
+import os
+
+from pymongo import ReadPreference, WriteConcern
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import SecondaryPreferred
+
+
+# mongo: Motor on MONGO_URL/DB_NAME; memory: in-process engine (tests, benchmarks)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mongo")
+# How far behind the primary a secondary may be to serve public and analytics
+# reads (MongoDB accepts 90 seconds at least)
+READ_MAX_STALENESS_SECONDS = int(os.environ.get("READ_MAX_STALENESS_SECONDS", "90"))
+# false: every read goes to the primary, as with a single node
+READ_ROUTING_ENABLED = os.environ.get("READ_ROUTING_ENABLED", "true").lower() != "false"
+
+
+class Cursor(Protocol):
+    def sort(self, key_or_list, direction: Optional[int] = None) -> "Cursor": ...
+    def skip(self, skip: int) -> "Cursor": ...
+    def limit(self, limit: int) -> "Cursor": ...
+    async def to_list(self, length: Optional[int]) -> List[Dict[str, Any]]: ...
+    def __aiter__(self): ...
+
+
+class Collection(Protocol):
+    """Collection operations the application relies on"""
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> Cursor: ...
+    async def find_one(self, filter: Optional[Dict[str, Any]] = None,
+                       projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]: ...
+    async def insert_one(self, document: Dict[str, Any]) -> Any: ...
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True) -> Any: ...
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> Any: ...
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> Any: ...
+    async def delete_one(self, filter: Dict[str, Any]) -> Any: ...
+    async def delete_many(self, filter: Dict[str, Any]) -> Any: ...
+    async def count_documents(self, filter: Dict[str, Any]) -> int: ...
+    async def bulk_write(self, requests: List[Any], ordered: bool = True) -> Any: ...
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> Cursor: ...
+    async def create_index(self, keys, **options) -> str: ...
+    async def options(self) -> Dict[str, Any]: ...
+
+
+class Database(Protocol):
+    """Database handle: collections by attribute or item, plus a few commands"""
+
+    def __getattr__(self, name: str) -> Collection: ...
+    def __getitem__(self, name: str) -> Collection: ...
+    async def list_collection_names(self, filter: Optional[Dict[str, Any]] = None) -> List[str]: ...
+    async def create_collection(self, name: str, **options) -> Collection: ...
+    async def command(self, command, value: Any = 1, **kwargs) -> Dict[str, Any]: ...
+    def with_options(self, **options) -> "Database": ...
+
+
+_client = None
+
+
+def create_database(backend: str = STORAGE_BACKEND) -> Database:
+    """Open the configured backend"""
+    global _client
+    if backend == "memory":
+        from memory_store import MemoryDatabase
+        return MemoryDatabase(os.environ.get('DB_NAME', 'test_database'))
+    if backend == "mongo":
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+        # Connects on first use: the app's startup ping, not the import
+        _client = AsyncIOMotorClient(mongo_url, connect=False)
+        return _client[os.environ.get('DB_NAME', 'test_database')]
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+def close():
+    """Close the MongoDB client, if any"""
+    if _client is not None:
+        _client.close()
+
+
+# Options per workload. Majority reads and writes are what makes causal
+# sessions guarantee read-your-writes across members.
+READ_ROUTES: Dict[str, Dict[str, Any]] = {
+    # Admin and auth: editors see the current data
+    "primary": {
+        "read_preference": ReadPreference.PRIMARY,
+        "read_concern": ReadConcern("majority"),
+        "write_concern": WriteConcern("majority"),
+    },
+    # Public pages and analytics: keep visitors off the primary
+    "secondary": {
+        "read_preference": SecondaryPreferred(max_staleness=READ_MAX_STALENESS_SECONDS)
+        if READ_ROUTING_ENABLED else ReadPreference.PRIMARY,
+        "read_concern": ReadConcern("majority"),
+    },
+}
+
+SESSION_READS = ("find", "find_one", "count_documents", "distinct", "aggregate")
+SESSION_WRITES = ("insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one",
+                  "delete_many", "bulk_write", "find_one_and_update", "find_one_and_replace", "find_one_and_delete")
+
+_session: ContextVar[Optional[Any]] = ContextVar("mongo_session", default=None)
+
+
+class CausalClock:
+    """Cluster and operation times of this process's latest write"""
+
+    def __init__(self):
+        self.cluster_time: Optional[Dict[str, Any]] = None
+        self.operation_time = None
+
+    def observe(self, session):
+        self.merge(session.cluster_time, session.operation_time)
+
+    def merge(self, cluster_time: Optional[Dict[str, Any]], operation_time):
+        """Keep the later of the known times and these (from a session or another process)"""
+        if cluster_time is not None and (
+                self.cluster_time is None or cluster_time["clusterTime"] > self.cluster_time["clusterTime"]):
+            self.cluster_time = cluster_time
+        if operation_time is not None and (self.operation_time is None or operation_time > self.operation_time):
+            self.operation_time = operation_time
+
+    def advance(self, session):
+        if self.cluster_time is not None:
+            session.advance_cluster_time(self.cluster_time)
+        if self.operation_time is not None:
+            session.advance_operation_time(self.operation_time)
+
+
+causal_clock = CausalClock()
+
+
+@asynccontextmanager
+async def causal_session():
+    """Run the operations of the current context in one causally consistent session.
+
+    The session starts after this process's latest write, so a secondary
+    only answers once it has replicated it. A session serves one operation
+    at a time: the code paths using it must not fan out with gather().
+    """
+    if _client is None:
+        yield None
+        return
+    async with await _client.start_session(causal_consistency=True) as session:
+        causal_clock.advance(session)
+        token = _session.set(session)
+        try:
+            yield session
+        finally:
+            _session.reset(token)
+
+
+async def causal_request_session():
+    """Dependency: the operations of a request share one causally consistent session"""
+    async with causal_session():
+        yield
+
+
+class _SessionCollection:
+    """Collection whose operations join the session of the current context"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._collection, name)
+        if name in SESSION_READS:
+            @functools.wraps(attr)
+            def call(*args, **kwargs):
+                session = _session.get()
+                if session is not None:
+                    kwargs.setdefault("session", session)
+                return attr(*args, **kwargs)
+        elif name in SESSION_WRITES:
+            @functools.wraps(attr)
+            async def call(*args, **kwargs):
+                session = _session.get()
+                if session is None:
+                    return await attr(*args, **kwargs)
+                kwargs.setdefault("session", session)
+                result = await attr(*args, **kwargs)
+                # Later sessions of this process start after this write
+                causal_clock.observe(kwargs["session"])
+                return result
+        else:
+            return attr
+        setattr(self, name, call)
+        return call
+
+
+class _SessionDatabase:
+    """Database handle handing out session-aware collections"""
+
+    def __init__(self, database):
+        self._database = database
+        self._collections: Dict[str, _SessionCollection] = {}
+
+    def __getitem__(self, name: str) -> _SessionCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = _SessionCollection(self._database[name])
+        return collection
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        # Database methods (command, list_collection_names...) pass through
+        if hasattr(type(self._database), name):
+            return getattr(self._database, name)
+        return self[name]
+
+
+def routed(database: Database, workload: str) -> Database:
+    """The database with the read preference and concerns of a workload"""
+    if _client is None:
+        return database
+    return _SessionDatabase(database.with_options(**READ_ROUTES[workload]))
+
+
+# Shared by every module of the application (one connection pool per process)
+db = create_database()
+primary_db = routed(db, "primary")
+secondary_db = routed(db, "secondary")
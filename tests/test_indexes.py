@@ -0,0 +1,75 @@
+import asyncio
+
+from project_similarity import ProjectSimilarityIndex
+from public_cache import Freshness
+from resource_facets import ResourceFacetIndex
+from shared_cache import SharedPayloadStore
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length):
+        return list(self.documents)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+        self.finds = 0
+
+    def find(self):
+        self.finds += 1
+        return FakeCursor(self.documents)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.resources = FakeCollection()
+        self.projects = FakeCollection()
+
+
+def test_freshness_expires_with_the_ttl():
+    freshness = Freshness(["resources"], ttl=0)
+    assert not freshness.current()
+    freshness.built(freshness.begin())
+    assert not freshness.current()
+
+    freshness = Freshness(["resources"], ttl=60)
+    freshness.built(freshness.begin())
+    assert freshness.current()
+
+
+def test_facet_index_rebuilds_after_a_write_from_another_worker(tmp_path):
+    this_worker, other_worker = SharedPayloadStore(str(tmp_path)), SharedPayloadStore(str(tmp_path))
+    index = ResourceFacetIndex(Freshness(["resources"], ttl=60, shared=this_worker))
+    db = FakeDatabase()
+    db.resources.documents = [{"id": "r1", "category": "security"}]
+
+    asyncio.run(index.ensure_loaded(db))
+    asyncio.run(index.ensure_loaded(db))
+    assert db.resources.finds == 1
+
+    db.resources.documents.append({"id": "r2", "category": "python"})
+    other_worker.bump(["resources"])
+    asyncio.run(index.ensure_loaded(db))
+    assert db.resources.finds == 2
+    matched, facets = index.query({})
+    assert [resource["id"] for resource in matched] == ["r1", "r2"]
+    assert facets["category"] == {"security": 1, "python": 1}
+
+
+def test_similarity_index_finds_projects_created_by_another_worker(tmp_path):
+    this_worker, other_worker = SharedPayloadStore(str(tmp_path)), SharedPayloadStore(str(tmp_path))
+    index = ProjectSimilarityIndex(freshness=Freshness(["projects"], ttl=60, shared=this_worker))
+    db = FakeDatabase()
+    db.projects.documents = [{"id": "p1", "technologies": ["Python", "FastAPI"]}]
+
+    asyncio.run(index.ensure_loaded(db))
+    assert index.related("p2") is None
+
+    db.projects.documents.append({"id": "p2", "technologies": ["Python"]})
+    other_worker.bump(["projects"])
+    asyncio.run(index.ensure_loaded(db))
+    assert [(project["id"], score) for project, score in index.related("p2")] == [("p1", 0.5)]
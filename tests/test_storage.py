@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from bson import Timestamp
+
+import storage
+from shared_cache import SharedPayloadStore
+
+
+class FakeSession:
+    """Stands in for a Motor session: records the times it is advanced to"""
+
+    def __init__(self):
+        self.cluster_time = None
+        self.operation_time = None
+        self.advanced = []
+
+    def advance_cluster_time(self, cluster_time):
+        self.advanced.append(("cluster_time", cluster_time))
+
+    def advance_operation_time(self, operation_time):
+        self.advanced.append(("operation_time", operation_time))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeClient:
+    def __init__(self):
+        self.sessions = []
+
+    async def start_session(self, causal_consistency):
+        assert causal_consistency
+        self.sessions.append(FakeSession())
+        return self.sessions[-1]
+
+
+class FakeCollection:
+    def find(self, filter=None, session=None):
+        return session
+
+    async def insert_one(self, document, session=None):
+        # The server reports the write's times on the session
+        session.cluster_time = {"clusterTime": Timestamp(100, 1)}
+        session.operation_time = Timestamp(100, 1)
+
+
+class FakeDatabase:
+    def __getitem__(self, name):
+        return FakeCollection()
+
+    def with_options(self, **options):
+        self.options = options
+        return self
+
+    def command(self, command):
+        return command
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(storage, "_client", client)
+    monkeypatch.setattr(storage, "causal_clock", storage.CausalClock())
+    return client
+
+
+def test_operations_join_the_session_of_the_context(client):
+    database = storage.routed(FakeDatabase(), "secondary")
+
+    async def run():
+        assert database.projects.find({}) is None
+        async with storage.causal_session() as session:
+            assert database.projects.find({}) is session
+        assert database.projects.find({}) is None
+
+    asyncio.run(run())
+    assert database.command("ping") == "ping"
+
+
+def test_later_sessions_start_after_the_last_write(client):
+    primary = storage.routed(FakeDatabase(), "primary")
+
+    async def run():
+        async with storage.causal_session() as session:
+            assert session.advanced == []
+            await primary.projects.insert_one({"id": "p1"})
+        async with storage.causal_session() as session:
+            return session.advanced
+
+    assert asyncio.run(run()) == [
+        ("cluster_time", {"clusterTime": Timestamp(100, 1)}),
+        ("operation_time", Timestamp(100, 1)),
+    ]
+
+
+def test_shared_store_hands_write_times_to_other_workers(tmp_path):
+    writer, reader = SharedPayloadStore(str(tmp_path)), SharedPayloadStore(str(tmp_path))
+    assert reader.causal_times() == (None, None)
+
+    writer.bump(["projects"], {"clusterTime": Timestamp(200, 1)}, Timestamp(200, 1))
+    # An older write bumping later does not move the times back
+    writer.bump(["projects"], {"clusterTime": Timestamp(150, 1)}, Timestamp(150, 1))
+
+    clock = storage.CausalClock()
+    clock.merge(*reader.causal_times())
+    assert clock.cluster_time == {"clusterTime": Timestamp(200, 1)}
+    assert clock.operation_time == Timestamp(200, 1)